@@ -0,0 +1,83 @@
+"""Entry script for a walk forward backtest of the buy sell signals on a CSV list of stocks."""
+import argparse
+import time
+
+import pandas as pd
+
+from utils.backtest_utils import backtest_stocks, summarise_backtest
+from utils.cluster_utils import CLUSTER_BACKENDS
+from utils.config_utils import DAYS, PERIOD, WITHIN_SUPPORT_PERCENTAGE
+from utils.data_source_utils import LocalDataSource, YahooDataSource
+from utils.stock_data_utils import get_dates_for_backtesting, iter_stock_data_bulk
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments of the script.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--csv_file_path", type=str, help="CSV file containing list of stocks.", default="ind_niftylist.csv"
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        help="Read stock data from <data_dir>/<symbol>.csv instead of yahoo finance.",
+        default=None,
+    )
+    parser.add_argument("--num_periods", type=int, help="Number of evaluation dates.", default=100)
+    parser.add_argument("--step_days", type=int, help="Calendar days between evaluation dates.", default=7)
+    parser.add_argument(
+        "--horizons", type=int, nargs="+", help="Bars after a signal at which returns are measured.", default=[5, 20]
+    )
+    parser.add_argument("--fetch_workers", type=int, help="Number of stocks fetched concurrently.", default=8)
+    parser.add_argument("--workers", type=int, help="Number of processes running the backtest.", default=1)
+    parser.add_argument(
+        "--cluster_backend",
+        type=str,
+        choices=CLUSTER_BACKENDS,
+        help="Clustering implementation, sklearn is the reference and numpy is faster.",
+        default="sklearn",
+    )
+    parser.add_argument(
+        "--output", type=str, help="CSV file to write every evaluation to.", default="backtest_evaluations.csv"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Backtest the signals of every stock of the CSV file and print their statistics."""
+    args = parse_args()
+    symbols = list(pd.read_csv(args.csv_file_path, index_col=0)["Symbol"])
+    evaluation_dates = get_dates_for_backtesting(args.num_periods, days=args.step_days)[::-1]
+
+    # One fetch covers the windows of every evaluation date and the returns after the last one.
+    source = LocalDataSource(args.data_dir) if args.data_dir else YahooDataSource()
+    history_days = DAYS + args.num_periods * args.step_days + 1
+    stock_data = iter_stock_data_bulk(
+        symbols, days=history_days, interval="1d", max_workers=args.fetch_workers, source=source
+    )
+
+    start = time.perf_counter()
+    evaluations = backtest_stocks(
+        stock_data,
+        evaluation_dates,
+        days=DAYS,
+        period=PERIOD,
+        within_support_percentage=WITHIN_SUPPORT_PERCENTAGE,
+        horizons=args.horizons,
+        workers=args.workers,
+        cluster_backend=args.cluster_backend,
+    )
+    evaluations.to_csv(args.output, index=False)
+    print(
+        f"Backtested {len(symbols)} stocks on {len(evaluation_dates)} dates in {time.perf_counter() - start:.1f} s, "
+        f"evaluations saved to {args.output}"
+    )
+    print(summarise_backtest(evaluations, horizons=args.horizons).T.to_string())
+
+
+if __name__ == "__main__":
+    main()
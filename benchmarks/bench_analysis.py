@@ -0,0 +1,28 @@
+"""Benchmark serial against process pool analysis of many stocks."""
+import argparse
+import os
+import time
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stocks
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--symbols", type=int, help="Number of stocks to analyse.", default=64)
+parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=140)
+parser.add_argument("--workers", type=int, nargs="+", help="Worker counts to compare.", default=[1, os.cpu_count()])
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    stock_data = [
+        (symbol, make_ohlcv(args.bars, seed=seed), None) for seed, symbol in enumerate(symbol_names(args.symbols))
+    ]
+    baseline = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = [result for _, _, result in analyse_stocks(stock_data, workers=workers)]
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(
+            f"{workers:>3} workers: {elapsed:6.2f}s  {args.symbols / elapsed:7.1f} stocks/s  "
+            f"speedup {baseline / elapsed:4.1f}x  errors {sum(result.error is not None for result in results)}"
+        )
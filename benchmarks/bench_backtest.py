@@ -0,0 +1,47 @@
+"""Benchmark the walk forward backtest against rerunning the analysis on every date."""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.backtest_utils import backtest_stocks, get_window_bounds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks.", default=20)
+    parser.add_argument("--bars", type=int, help="Number of bars of history per stock.", default=1250)
+    parser.add_argument("--step_days", type=int, help="Calendar days between evaluation dates.", default=7)
+    parser.add_argument("--workers", type=int, help="Number of backtest processes.", default=1)
+    parser.add_argument("--cluster_backend", type=str, help="Clustering backend.", default="numpy")
+    args = parser.parse_args()
+
+    stock_data = [
+        (symbol, make_ohlcv(args.bars, seed=seed, start_price=100 + seed), None)
+        for seed, symbol in enumerate(symbol_names(args.symbols))
+    ]
+    index = stock_data[0][1].index
+    evaluation_dates = list(pd.date_range(index[0] + pd.DateOffset(200), index[-1], freq=f"{args.step_days}D"))
+
+    start = time.perf_counter()
+    evaluations = backtest_stocks(
+        stock_data, evaluation_dates, workers=args.workers, cluster_backend=args.cluster_backend
+    )
+    backtest_time = time.perf_counter() - start
+
+    # Rerun the analysis on the window of every date, as a loop over the pipeline would.
+    start = time.perf_counter()
+    expected = []
+    for symbol, data_stock, _ in stock_data:
+        ohlc = to_ohlc_array(data_stock)
+        for first, stop in get_window_bounds(data_stock.index, evaluation_dates, 200):
+            result = analyse_stock(symbol, ohlc[:, first:stop], 5, 2, args.cluster_backend)
+            if result.error is None:
+                expected.append((bool(result.buy), bool(result.sell)))
+    rerun_time = time.perf_counter() - start
+
+    assert expected == list(zip(evaluations["buy"], evaluations["sell"]))
+    print(f"{args.symbols} stocks x {args.bars} bars, {len(evaluation_dates)} dates, {args.cluster_backend} clustering")
+    print(f"rerun analysis: {rerun_time:7.2f} s")
+    print(f"backtest:       {backtest_time:7.2f} s")
@@ -0,0 +1,37 @@
+"""Benchmark get_cluster_max_prices and get_cluster_min_prices against the original code."""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import legacy
+from benchmarks.synthetic import make_ohlcv
+from utils import stock_data_utils
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sizes", type=int, nargs="+", help="Number of bars to benchmark.", default=[200, 2000, 20000])
+parser.add_argument("--period", type=int, help="Window period.", default=5)
+args = parser.parse_args()
+
+
+def best_time(func, data, repeats):
+    """Get the best wall time of a few calls, and the result of the last one."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(data, period=args.period)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+for n_bars in args.sizes:
+    data = make_ohlcv(n_bars)
+    repeats = 5 if n_bars <= 2000 else 1
+    for name in ["get_cluster_max_prices", "get_cluster_min_prices"]:
+        legacy_time, expected = best_time(getattr(legacy, name), data, repeats)
+        new_time, result = best_time(getattr(stock_data_utils, name), data, repeats)
+        assert np.array_equal(expected, result), f"{name} differs at {n_bars} bars"
+        print(
+            f"{name} {n_bars:>6} bars: legacy {legacy_time * 1e3:9.1f} ms  new {new_time * 1e3:8.1f} ms  "
+            f"speedup {legacy_time / new_time:6.1f}x"
+        )
@@ -0,0 +1,42 @@
+"""Benchmark the numpy clustering backend against sklearn.
+
+For every synthetic stock the support resistance levels from get_cluster_max_prices,
+get_cluster_min_prices and support_resistance are computed with both backends, and the
+mean fit time per stock of each backend is reported. That both backends give the same
+levels, but where a mean lands exactly one bandwidth from a value, is checked by
+tests/test_cluster_utils.py.
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_ohlcv
+from utils.stock_data_utils import get_cluster_max_prices, get_cluster_min_prices, support_resistance
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--symbols", type=int, help="Number of stocks per size.", default=50)
+parser.add_argument("--sizes", type=int, nargs="+", help="Number of bars per stock.", default=[140, 500, 2000])
+args = parser.parse_args()
+
+
+def levels(data, backend):
+    """Compute every level of the pipeline, ignoring stocks with too few levels."""
+    for func, period in [(get_cluster_max_prices, 5), (get_cluster_min_prices, 5), (support_resistance, 30)]:
+        try:
+            func(data, period=period, backend=backend)
+        except (ValueError, IndexError):
+            pass
+
+
+for n_bars in args.sizes:
+    timings = {"sklearn": 0.0, "numpy": 0.0}
+    for seed in range(args.symbols):
+        data = make_ohlcv(n_bars, seed=seed)
+        for backend in timings:
+            start = time.perf_counter()
+            levels(data, backend)
+            timings[backend] += time.perf_counter() - start
+    print(
+        f"{n_bars:>6} bars: sklearn {timings['sklearn'] / args.symbols * 1e3:8.2f} ms/stock  "
+        f"numpy {timings['numpy'] / args.symbols * 1e3:7.2f} ms/stock  "
+        f"speedup {timings['sklearn'] / timings['numpy']:5.1f}x"
+    )
@@ -0,0 +1,56 @@
+"""Benchmark the scanner daemon: first scan, rescan without new bars and API query latency."""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from benchmarks.synthetic import write_fixtures
+from utils.daemon_utils import Scanner
+from utils.data_source_utils import LocalDataSource
+
+
+async def request(port: int, method: str, path: str) -> bytes:
+    """Send one HTTP request to the API and get the response."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def run(args: argparse.Namespace, data_dir: str, symbols: list) -> None:
+    """Scan twice and time queries against the running API."""
+    scanner = Scanner(symbols, LocalDataSource(data_dir), cluster_backend=args.cluster_backend)
+    server = await asyncio.start_server(scanner.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        first = await scanner.scan()
+        second = await scanner.scan()
+        latencies = {}
+        for path in ["/signals", f"/symbols/{symbols[0]}", "/signals?kind=buy"]:
+            times = []
+            for _ in range(args.queries):
+                start = time.perf_counter()
+                await request(port, "GET", path)
+                times.append(time.perf_counter() - start)
+            latencies[path] = times
+    scanner.close()
+
+    print(f"{args.symbols} stocks, {args.cluster_backend} clustering")
+    print(f"first scan:               {first['seconds']:7.2f} s, {first['analysed']} stocks analysed")
+    print(f"rescan without new bars:  {second['seconds']:7.2f} s, {second['analysed']} stocks analysed")
+    for path, times in latencies.items():
+        print(f"GET {path:22s} median {statistics.median(times) * 1e3:6.2f} ms, max {max(times) * 1e3:6.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks.", default=200)
+    parser.add_argument("--queries", type=int, help="Number of requests per endpoint.", default=200)
+    parser.add_argument("--cluster_backend", type=str, help="Clustering backend.", default="numpy")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as data_dir:
+        symbols = write_fixtures(data_dir, n_symbols=args.symbols, n_bars=200)
+        asyncio.run(run(args, data_dir, symbols))
@@ -0,0 +1,76 @@
+"""Benchmark sending the report email over pooled connections against one connection per recipient."""
+import argparse
+import os
+import smtplib
+import tempfile
+import time
+
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from benchmarks.local_smtp import LocalSMTPServer
+from utils.email_utils import prepare_attachment, send_email_to_people
+
+SENDER = "sender@example.com"
+PASSWORD = "secret"
+
+
+def send_per_recipient(port: int, receipients: list, path: str) -> None:
+    """Send the email the way the original code did, logging in and serializing once per recipient."""
+    part = prepare_attachment(path)
+    for receiver_email in receipients:
+        message = MIMEMultipart()
+        message["From"] = SENDER
+        message["To"] = receiver_email
+        message["Subject"] = "subject"
+        message["Bcc"] = receiver_email
+        message.attach(MIMEText("body", "plain"))
+        message.attach(part)
+        text = message.as_string()
+        with smtplib.SMTP("127.0.0.1", port) as server:
+            server.login(SENDER, PASSWORD)
+            server.sendmail(SENDER, receiver_email, text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recipients", type=int, help="Number of recipients.", default=200)
+    parser.add_argument("--attachment_kb", type=int, help="Size of the PDF attachment in KB.", default=1024)
+    parser.add_argument("--connections", type=int, help="Number of pooled connections.", default=4)
+    parser.add_argument("--login_latency", type=float, help="Seconds per connection and login.", default=0.05)
+    parser.add_argument("--message_latency", type=float, help="Seconds per message.", default=0.005)
+    args = parser.parse_args()
+
+    receipients = [f"user{num}@example.com" for num in range(args.recipients)]
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "report.pdf")
+        with open(path, "wb") as file:
+            file.write(os.urandom(args.attachment_kb * 1024))
+
+        runs = {
+            "per recipient": lambda port: send_per_recipient(port, receipients, path),
+            "pooled, 1 connection": lambda port: send_email_to_people(
+                SENDER, receipients, path, password=PASSWORD, host="127.0.0.1", port=port, use_ssl=False
+            ),
+            f"pooled, {args.connections} connections": lambda port: send_email_to_people(
+                SENDER,
+                receipients,
+                path,
+                password=PASSWORD,
+                host="127.0.0.1",
+                port=port,
+                use_ssl=False,
+                connections=args.connections,
+            ),
+        }
+        print(f"{args.recipients} recipients, {args.attachment_kb} KB attachment")
+        for name, run in runs.items():
+            server = LocalSMTPServer(
+                password=PASSWORD, login_latency=args.login_latency, message_latency=args.message_latency
+            )
+            start = time.perf_counter()
+            run(server.port)
+            seconds = time.perf_counter() - start
+            server.stop()
+            assert server.messages == args.recipients
+            print(f"{name:24s} {seconds:6.2f} s  {args.recipients / seconds:7.1f} emails/s  {server.logins:4d} logins")
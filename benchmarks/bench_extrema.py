@@ -0,0 +1,33 @@
+"""Benchmark the windowed extrema kernel against the original per-window pandas slices."""
+import argparse
+import timeit
+
+import numpy as np
+
+from benchmarks.synthetic import make_ohlcv
+from utils.stock_data_utils import windowed_extrema
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sizes", type=int, nargs="+", help="Number of bars to benchmark.", default=[200, 1250, 20000])
+parser.add_argument("--period", type=int, help="Window period.", default=5)
+args = parser.parse_args()
+
+for n_bars in args.sizes:
+    data = make_ohlcv(n_bars, freq="B" if n_bars < 50000 else "15min")
+    period = args.period
+    num_windows = len(data["Close"]) - period - 1
+
+    def legacy():
+        return np.asarray([max(data["High"][i : period + i]) for i in range(num_windows)])
+
+    def kernel():
+        return windowed_extrema(data["High"].to_numpy(), period, num_windows, kind="max")
+
+    assert np.array_equal(legacy(), kernel())
+    repeats = max(1, 2000 // n_bars)
+    legacy_time = min(timeit.repeat(legacy, number=repeats, repeat=3)) / repeats
+    kernel_time = min(timeit.repeat(kernel, number=100, repeat=3)) / 100
+    print(
+        f"{n_bars:>6} bars: legacy {legacy_time * 1e3:9.3f} ms  kernel {kernel_time * 1e6:9.1f} us  "
+        f"speedup {legacy_time / kernel_time:8.0f}x"
+    )
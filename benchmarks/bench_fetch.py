@@ -0,0 +1,29 @@
+"""Benchmark serial against concurrent fetching of stock data."""
+import argparse
+import tempfile
+import time
+
+from benchmarks.synthetic import write_fixtures
+from utils.data_source_utils import LocalDataSource
+from utils.stock_data_utils import get_stock_data, get_stock_data_bulk
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--symbols", type=int, help="Number of stocks to fetch.", default=100)
+parser.add_argument("--latency", type=float, help="Simulated seconds per request.", default=0.05)
+parser.add_argument("--workers", type=int, help="Number of concurrent requests.", default=8)
+args = parser.parse_args()
+
+with tempfile.TemporaryDirectory() as data_dir:
+    symbols = write_fixtures(data_dir, n_symbols=args.symbols, n_bars=200)
+    source = LocalDataSource(data_dir, delay=args.latency)
+
+    start = time.perf_counter()
+    for symbol in symbols:
+        get_stock_data(symbol, days=200, interval="1d", source=source)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    get_stock_data_bulk(symbols, days=200, interval="1d", max_workers=args.workers, source=source)
+    bulk = time.perf_counter() - start
+
+print(f"serial: {serial:.2f}s  bulk({args.workers} workers): {bulk:.2f}s  speedup: {serial / bulk:.1f}x")
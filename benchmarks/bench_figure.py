@@ -0,0 +1,75 @@
+"""Benchmark the size and render time of the signal charts against the original figure code."""
+import argparse
+import os
+import tempfile
+import time
+
+import plotly.graph_objs as go
+import plotly.io as pio
+
+from benchmarks import legacy
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.plot_utils import get_data, get_layout, images_for_stocks_to_buy
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks charted.", default=10)
+    parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=200)
+    args = parser.parse_args()
+
+    charts = []
+    for seed, symbol in enumerate(symbol_names(args.symbols)):
+        data_stock = make_ohlcv(args.bars, seed=seed, start_price=100 + seed)
+        result = analyse_stock(symbol, to_ohlc_array(data_stock), 5, 2)
+        if result.error is None:
+            # A delta of 100 times the close makes the buy signal trigger for every stock.
+            close_last = result.close_last
+            charts.append(
+                (
+                    close_last,
+                    100 * close_last,
+                    result.cluster_min_prices,
+                    result.cluster_max_prices,
+                    data_stock.assign(rsi=result.rsi),
+                    symbol,
+                )
+            )
+
+    implementations = {
+        "original": (legacy.images_for_stocks_to_buy, legacy.get_data),
+        "compact": (images_for_stocks_to_buy, get_data),
+    }
+
+    # Capture the figures instead of writing them to measure their size.
+    write_image = go.Figure.write_image
+    figures = {name: [] for name in implementations}
+    for name, (images, get_chart_data) in implementations.items():
+        go.Figure.write_image = lambda figure, *args, **kwargs: figures[name].append(figure)
+        for chart in charts:
+            data_stock, symbol = chart[4], chart[5]
+            images(*chart, get_chart_data(data_stock), get_layout(title=symbol), "end")
+    go.Figure.write_image = write_image
+
+    pio.to_image(figures["compact"][0], format="png", engine="kaleido")
+    timings = {}
+    with tempfile.TemporaryDirectory() as folder:
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            for name, (images, get_chart_data) in implementations.items():
+                start = time.perf_counter()
+                for chart in charts:
+                    data_stock, symbol = chart[4], chart[5]
+                    os.makedirs(f"buy_sell_images/{symbol}", exist_ok=True)
+                    images(*chart, get_chart_data(data_stock), get_layout(title=symbol), "end")
+                timings[name] = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    print(f"{len(charts)} charts x {args.bars} bars")
+    for name in implementations:
+        size = sum(len(pio.to_json(figure, validate=False)) for figure in figures[name]) / len(charts)
+        print(
+            f"{name:9s} figure JSON: {size / 1024:7.1f} KiB  build and render: {timings[name] / len(charts) * 1e3:6.1f} ms"
+        )
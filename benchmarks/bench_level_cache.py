@@ -0,0 +1,42 @@
+"""Benchmark daily runs with and without the level cache, checking that the levels match."""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.level_cache_utils import LevelCache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks.", default=20)
+    parser.add_argument("--runs", type=int, help="Number of daily runs, each with one more bar.", default=20)
+    parser.add_argument("--bars", type=int, help="Number of bars analysed by every run.", default=140)
+    parser.add_argument("--cluster_backend", type=str, help="Clustering backend.", default="sklearn")
+    args = parser.parse_args()
+
+    stocks = [
+        (symbol, make_ohlcv(args.bars + args.runs, seed=seed, start_price=100 + seed))
+        for seed, symbol in enumerate(symbol_names(args.symbols))
+    ]
+    level_cache = LevelCache()
+    timings = {"uncached": 0.0, "cached": 0.0, "repeated": 0.0}
+    for run in range(args.runs):
+        for symbol, data_stock in stocks:
+            ohlc = to_ohlc_array(data_stock.iloc[run : run + args.bars])
+            start = time.perf_counter()
+            expected = analyse_stock(symbol, ohlc, 5, 2, args.cluster_backend)
+            timings["uncached"] += time.perf_counter() - start
+            for name in ("cached", "repeated"):
+                start = time.perf_counter()
+                result = analyse_stock(symbol, ohlc, 5, 2, args.cluster_backend, level_cache)
+                timings[name] += time.perf_counter() - start
+                assert np.array_equal(result.cluster_min_prices, expected.cluster_min_prices), symbol
+                assert np.array_equal(result.cluster_max_prices, expected.cluster_max_prices), symbol
+
+    analyses = args.symbols * args.runs
+    print(f"{analyses} analyses of {args.bars} bars, {args.cluster_backend} backend, levels match")
+    for name, seconds in timings.items():
+        print(f"{name:10s} {seconds * 1e3 / analyses:8.2f} ms per stock")
+    print(level_cache.report())
@@ -0,0 +1,62 @@
+"""Benchmark memory use and scan time of the columnar panel against one dataframe per stock."""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.panel_utils import OHLCVPanel
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--symbols", type=int, help="Number of stocks.", default=750)
+parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=200)
+parser.add_argument("--cluster_backend", type=str, help="Clustering backend.", default="numpy")
+args = parser.parse_args()
+
+frames = {
+    symbol: make_ohlcv(args.bars, seed=seed, start_price=100 + seed)
+    for seed, symbol in enumerate(symbol_names(args.symbols))
+}
+
+start = time.perf_counter()
+results = {
+    symbol: analyse_stock(symbol, to_ohlc_array(data), 5, 2, args.cluster_backend) for symbol, data in frames.items()
+}
+frames_time = time.perf_counter() - start
+
+start = time.perf_counter()
+panel = OHLCVPanel.from_frames(frames)
+build_time = time.perf_counter() - start
+start = time.perf_counter()
+rsi = panel.rsi()
+levels = panel.levels(backend=args.cluster_backend)
+signals = panel.signals(levels, 2)
+panel_time = time.perf_counter() - start
+
+for row, (symbol, result) in enumerate(results.items()):
+    if result.error is None:
+        assert np.array_equal(levels[symbol][0], result.cluster_min_prices)
+        assert np.array_equal(levels[symbol][1], result.cluster_max_prices)
+        assert np.array_equal(rsi[row], result.rsi)
+        assert signals.loc[symbol, "buy"] == bool(result.buy) and signals.loc[symbol, "sell"] == bool(result.sell)
+    else:
+        assert symbol not in levels
+
+frames_bytes = sum(data.memory_usage(deep=True).sum() for data in frames.values())
+panel32 = OHLCVPanel.from_frames(frames, dtype=np.float32)
+
+start = time.perf_counter()
+for field in ("High", "Low"):
+    panel.cluster_windows(field)
+windows_time = time.perf_counter() - start
+
+print(f"{args.symbols} stocks x {args.bars} bars, {args.cluster_backend} clustering")
+print(f"dataframes memory:      {frames_bytes / 2**20:8.2f} MiB")
+print(f"panel memory (float64): {panel.nbytes / 2**20:8.2f} MiB")
+print(f"panel memory (float32): {panel32.nbytes / 2**20:8.2f} MiB")
+print(f"per stock scan:         {frames_time * 1e3:8.1f} ms")
+print(f"panel build:            {build_time * 1e3:8.1f} ms")
+print(f"panel scan:             {panel_time * 1e3:8.1f} ms")
+print(f"panel windowed extrema: {windows_time * 1e3:8.1f} ms")
+print(f"signals: {int(signals['buy'].sum())} buy, {int(signals['sell'].sum())} sell")
@@ -0,0 +1,55 @@
+"""Benchmark the signal pre-screen against the full analysis, checking that it never drops a flagged stock.
+
+The pre-screen is timed on the stocks stacked into one array and on an OHLCVPanel built from their
+dataframes, which is how analyse_stocks runs it, and both must agree.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, prescreen_panel, prescreen_signals, to_ohlc_array
+from utils.panel_utils import OHLCVPanel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks.", default=500)
+    parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=140)
+    parser.add_argument("--cluster_backend", type=str, help="Clustering backend.", default="sklearn")
+    parser.add_argument(
+        "--percentages", type=float, nargs="+", help="Values of within_support_percentage.", default=[1, 2, 5]
+    )
+    args = parser.parse_args()
+
+    frames = {
+        symbol: make_ohlcv(args.bars, seed=seed, start_price=100 + seed)
+        for seed, symbol in enumerate(symbol_names(args.symbols))
+    }
+    ohlc = np.stack([to_ohlc_array(data_stock) for data_stock in frames.values()])
+    for within_support_percentage in args.percentages:
+        start = time.perf_counter()
+        may_buy, may_sell = prescreen_signals(ohlc, 5, within_support_percentage)
+        screen_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        panel_may_buy, panel_may_sell = prescreen_panel(OHLCVPanel.from_frames(frames), 5, within_support_percentage)
+        panel_time = time.perf_counter() - start
+        assert np.array_equal(may_buy, panel_may_buy) and np.array_equal(may_sell, panel_may_sell)
+
+        start = time.perf_counter()
+        results = [
+            analyse_stock(symbol, ohlc[num], 5, within_support_percentage, args.cluster_backend)
+            for num, symbol in enumerate(symbol_names(args.symbols))
+        ]
+        analysis_time = time.perf_counter() - start
+
+        buy = np.array([bool(result.buy) for result in results])
+        sell = np.array([bool(result.sell) for result in results])
+        assert not (buy & ~may_buy).any() and not (sell & ~may_sell).any(), "a flagged stock was ruled out"
+        kept = may_buy | may_sell
+        print(
+            f"{within_support_percentage}%: kept {kept.sum()} of {args.symbols} stocks, {(buy | sell).sum()} flagged, "
+            f"screen {screen_time * 1e3:.1f} ms, with the panel {panel_time * 1e3:.1f} ms, "
+            f"full analysis {analysis_time * 1e3:.0f} ms"
+        )
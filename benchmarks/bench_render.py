@@ -0,0 +1,70 @@
+"""Benchmark chart rendering per side against batched rendering through ChartRenderer."""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.plot_utils import get_data, get_layout, images_for_stocks_to_buy, images_for_stocks_to_sell
+from utils.render_utils import ChartRenderer, signal_chart_job
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks charted.", default=12)
+    parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=200)
+    parser.add_argument("--workers", type=int, help="Number of rendering processes.", default=2)
+    args = parser.parse_args()
+
+    stocks = []
+    for seed, symbol in enumerate(symbol_names(args.symbols)):
+        data_stock = make_ohlcv(args.bars, seed=seed, start_price=100 + seed)
+        result = analyse_stock(symbol, to_ohlc_array(data_stock), 5, 2)
+        if result.error is None:
+            stocks.append((symbol, data_stock.assign(rsi=result.rsi), result))
+
+    def charts(folder):
+        """Yield the arguments of every chart, with a delta wide enough for both signals to trigger."""
+        for symbol, data_stock, result in stocks:
+            os.makedirs(f"{folder}/{symbol}", exist_ok=True)
+            delta = 100 * result.close_last
+            yield (
+                result.close_last,
+                delta,
+                result.cluster_min_prices,
+                result.cluster_max_prices,
+                data_stock,
+                symbol,
+                get_data(data_stock),
+                get_layout(title=symbol),
+                "end",
+            )
+
+    with tempfile.TemporaryDirectory() as folder:
+        cwd = os.getcwd()
+        os.chdir(folder)
+        try:
+            # Start the renderer of this process, so that no timing pays for it.
+            ChartRenderer().submit(signal_chart_job(*next(charts("warmup")), folder="warmup"))
+
+            start = time.perf_counter()
+            for chart in charts("buy_sell_images"):
+                images_for_stocks_to_buy(*chart)
+                images_for_stocks_to_sell(*chart)
+            per_side_time = time.perf_counter() - start
+
+            timings = {}
+            for workers in sorted({1, args.workers}):
+                start = time.perf_counter()
+                with ChartRenderer(workers=workers) as renderer:
+                    for chart in charts(f"batched_{workers}"):
+                        renderer.submit(signal_chart_job(*chart, folder=f"batched_{workers}"))
+                timings[workers] = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    images = 2 * len(stocks)
+    print(f"{len(stocks)} stocks x {args.bars} bars, {images} images")
+    print(f"per side write_image:   {per_side_time:6.2f} s  {images / per_side_time:6.2f} images/s")
+    for workers, seconds in timings.items():
+        print(f"ChartRenderer({workers} proc): {seconds:6.2f} s  {images / seconds:6.2f} images/s")
@@ -0,0 +1,86 @@
+"""Benchmark reruns of chart rendering with the render cache: a cold cache, an unchanged rerun and a rerun in
+which one stock has a new bar."""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.plot_utils import get_data, get_layout
+from utils.render_cache_utils import RenderCache
+from utils.render_utils import ChartRenderer, signal_chart_job
+
+
+def chart_jobs(stocks: dict, folder: str) -> list:
+    """Get the chart job of every stock, with a delta wide enough for both signals to trigger."""
+    jobs = []
+    for symbol, data_stock in stocks.items():
+        result = analyse_stock(symbol, to_ohlc_array(data_stock), 5, 2)
+        if result.error is not None:
+            continue
+        data_stock = data_stock.assign(rsi=result.rsi)
+        jobs.append(
+            signal_chart_job(
+                result.close_last,
+                100 * result.close_last,
+                result.cluster_min_prices,
+                result.cluster_max_prices,
+                data_stock,
+                symbol,
+                get_data(data_stock),
+                get_layout(title=symbol),
+                "end",
+                folder=folder,
+            )
+        )
+    return jobs
+
+
+def disk_usage(folder: str) -> tuple:
+    """Get the number of files of a folder and the bytes they use, counting hard links once."""
+    files, inodes = 0, {}
+    for directory, _, names in os.walk(folder):
+        for name in names:
+            stat = os.stat(os.path.join(directory, name))
+            files += 1
+            inodes[(stat.st_dev, stat.st_ino)] = stat.st_size
+    return files, sum(inodes.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks charted.", default=12)
+    parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=200)
+    parser.add_argument("--workers", type=int, help="Number of rendering processes.", default=1)
+    args = parser.parse_args()
+
+    stocks = {
+        symbol: make_ohlcv(args.bars, seed=seed, start_price=100 + seed)
+        for seed, symbol in enumerate(symbol_names(args.symbols))
+    }
+    # The last run sees one more bar of the first stock, so only its chart changes.
+    updated = dict(stocks)
+    first = next(iter(stocks))
+    updated[first] = make_ohlcv(args.bars + 1, seed=0, start_price=100).iloc[1:]
+
+    with tempfile.TemporaryDirectory() as root:
+        images = os.path.join(root, "buy_sell_images")
+        cache = RenderCache(os.path.join(root, "render_cache"))
+        # Start the renderer of this process, so that no timing pays for it.
+        ChartRenderer().submit(chart_jobs({first: stocks[first]}, os.path.join(root, "warmup"))[0])
+
+        for run, run_stocks in (("cold cache", stocks), ("unchanged", stocks), ("1 stock updated", updated)):
+            jobs = chart_jobs(run_stocks, images)
+            hits = cache.counters["hits"]
+            start = time.perf_counter()
+            with ChartRenderer(workers=args.workers, cache=cache) as renderer:
+                for job in jobs:
+                    renderer.submit(job)
+            seconds = time.perf_counter() - start
+            print(
+                f"{run:>16}: {len(jobs)} charts in {seconds:6.3f} s, "
+                f"{cache.counters['hits'] - hits} from the cache, {renderer.images} images written"
+            )
+        files, used = disk_usage(images)
+        print(f"{files} image files using {used / 1024:.0f} KB, {cache.report()}")
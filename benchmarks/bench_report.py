@@ -0,0 +1,128 @@
+"""Benchmark building the PDF report from many charts, in time and peak memory."""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+from benchmarks.synthetic import symbol_names
+from utils.pdf_utils import create_report, find_images
+
+
+def write_charts(folder: str, n_charts: int, n_rendered: int) -> dict:
+    """Render a few charts and copy them, each with a unique pixel so that no two images are identical."""
+    # Imported here so that the processes measuring the reports do not load the plotting code.
+    from benchmarks.synthetic import make_ohlcv
+    from utils.analysis_utils import analyse_stock, to_ohlc_array
+    from utils.plot_utils import get_data, get_layout
+    from utils.render_utils import ChartRenderer, signal_chart_job
+
+    buy_sell_stock = {}
+    with ChartRenderer() as renderer:
+        for seed, symbol in enumerate(symbol_names(n_rendered)):
+            data_stock = make_ohlcv(200, seed=seed, start_price=100 + seed)
+            result = analyse_stock(symbol, to_ohlc_array(data_stock), 5, 2)
+            data_stock = data_stock.assign(rsi=result.rsi)
+            close_last = result.close_last
+            renderer.submit(
+                signal_chart_job(
+                    close_last,
+                    100 * close_last,
+                    result.cluster_min_prices,
+                    result.cluster_max_prices,
+                    data_stock,
+                    symbol,
+                    get_data(data_stock),
+                    get_layout(title=symbol),
+                    "end",
+                    folder=folder,
+                )
+            )
+    rendered = find_images(folder)
+    for num, symbol in enumerate(symbol_names(n_charts)):
+        os.makedirs(os.path.join(folder, symbol), exist_ok=True)
+        path = os.path.join(folder, symbol, f"BUY_end_{num}.png")
+        if path not in rendered:
+            with Image.open(rendered[num % len(rendered)]) as image:
+                pixels = np.array(image)
+            pixels[0, 0, 0] = num % 256
+            pixels[0, 1, 0] = num // 256
+            Image.fromarray(pixels).save(path)
+        buy_sell_stock[symbol] = {"buy": [float(num)], "sell": []}
+    return buy_sell_stock
+
+
+def original(folder: str, pdf_file_path: str) -> None:
+    """Draw every PNG as is on one canvas, as the original code meant to."""
+    pdf_file = canvas.Canvas(pdf_file_path)
+    for image_path in find_images(folder):
+        pdf_file.drawImage(image_path, 0, 200, 20 * cm, 18 * cm)
+        pdf_file.showPage()
+    pdf_file.save()
+
+
+def peak_memory_mb() -> float:
+    """Get the peak resident memory of this process, since it started running Python."""
+    # ru_maxrss carries over from the parent process on Linux, VmHWM does not.
+    if os.path.exists("/proc/self/status"):
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(queue, function, *args, **kwargs) -> None:
+    """Run a report builder and report its time and peak memory."""
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    queue.put((time.perf_counter() - start, peak_memory_mb()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--charts", type=int, help="Number of charts in the report.", default=300)
+    parser.add_argument("--workers", type=int, help="Number of processes preparing images.", default=2)
+    parser.add_argument("--max_part_mb", type=int, help="Image budget of one PDF part in MB.", default=16)
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp()
+    try:
+        images = os.path.join(folder, "buy_sell_images")
+        buy_sell_stock = write_charts(images, args.charts, min(args.charts, 10))
+        image_bytes = sum(os.path.getsize(path) for path in find_images(images))
+        runs = {
+            "original PNG": (original, (images, os.path.join(folder, "original.pdf")), {}),
+            "report, 1 proc": (
+                create_report,
+                (images, os.path.join(folder, "report.pdf"), buy_sell_stock),
+                dict(max_part_bytes=args.max_part_mb * 2**20),
+            ),
+            f"report, {args.workers} procs": (
+                create_report,
+                (images, os.path.join(folder, "report.pdf"), buy_sell_stock),
+                dict(workers=args.workers, max_part_bytes=args.max_part_mb * 2**20),
+            ),
+        }
+        print(f"{args.charts} charts, {image_bytes / 2**20:.1f} MiB of PNG, {args.max_part_mb} MiB parts")
+        context = multiprocessing.get_context("spawn")
+        for name, (function, function_args, kwargs) in runs.items():
+            queue = context.Queue()
+            process = context.Process(target=measure, args=(queue, function, *function_args), kwargs=kwargs)
+            process.start()
+            seconds, peak = queue.get()
+            process.join()
+            pdfs = [name for name in os.listdir(folder) if name.endswith(".pdf")]
+            pdf_bytes = sum(os.path.getsize(os.path.join(folder, name)) for name in pdfs)
+            print(f"{name:16s} {seconds:6.2f} s  peak {peak:6.1f} MiB  {len(pdfs)} files {pdf_bytes / 2**20:6.1f} MiB")
+            for name in pdfs:
+                os.remove(os.path.join(folder, name))
+    finally:
+        shutil.rmtree(folder)
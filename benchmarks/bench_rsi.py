@@ -0,0 +1,46 @@
+"""Benchmark add_rsi, the streaming RSI update and the whole panel RSI."""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import legacy
+from benchmarks.synthetic import make_ohlcv
+from utils.stock_data_utils import add_rsi
+from utils.streaming_utils import RollingRSI, rsi_panel
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--symbols", type=int, help="Number of stocks.", default=750)
+parser.add_argument("--bars", type=int, help="Number of bars per stock.", default=200)
+args = parser.parse_args()
+
+frames = [make_ohlcv(args.bars, seed=seed) for seed in range(args.symbols)]
+close = np.stack([data["Close"].to_numpy() for data in frames])
+
+start = time.perf_counter()
+expected = [legacy.add_rsi(data.copy())["rsi"].to_numpy() for data in frames]
+legacy_time = time.perf_counter() - start
+
+start = time.perf_counter()
+computed = [add_rsi(data)["rsi"].to_numpy() for data in frames]
+add_rsi_time = time.perf_counter() - start
+
+start = time.perf_counter()
+panel = rsi_panel(close)
+panel_time = time.perf_counter() - start
+
+state = RollingRSI(args.symbols)
+for bar in range(args.bars - 1):
+    state.update(close[:, bar])
+start = time.perf_counter()
+last = state.update(close[:, -1])
+update_time = time.perf_counter() - start
+
+assert all(np.array_equal(e, c) for e, c in zip(expected, computed))
+assert np.array_equal(np.stack(expected), panel)
+assert np.array_equal(panel[:, -1], last)
+print(f"{args.symbols} stocks x {args.bars} bars")
+print(f"legacy add_rsi loop: {legacy_time * 1e3:8.1f} ms")
+print(f"add_rsi loop:        {add_rsi_time * 1e3:8.1f} ms")
+print(f"rsi_panel:           {panel_time * 1e3:8.1f} ms")
+print(f"one streaming bar:   {update_time * 1e3:8.3f} ms for all stocks")
@@ -0,0 +1,70 @@
+"""Benchmark the per task overhead of sending prices to worker processes: pickled dataframes, pickled arrays
+and shared memory."""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import OHLC_COLUMNS, analyse_stocks, to_ohlc_array
+from utils.shared_memory_utils import SharedArray, SharedOHLCStore
+
+
+def close_sum(prices) -> float:
+    """Read every close of the prices, which is all the work of a task."""
+    if isinstance(prices, pd.DataFrame):
+        return float(prices["Close"].to_numpy().sum())
+    if isinstance(prices, SharedArray):
+        prices = prices.view()
+    return float(prices[3].sum())
+
+
+def time_tasks(executor: ProcessPoolExecutor, payloads: list) -> float:
+    """Get the wall time of running close_sum on every payload."""
+    start = time.perf_counter()
+    results = [future.result() for future in [executor.submit(close_sum, payload) for payload in payloads]]
+    assert len(results) == len(payloads)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tasks", type=int, help="Number of tasks of each size.", default=200)
+    parser.add_argument("--workers", type=int, help="Number of worker processes.", default=2)
+    parser.add_argument("--bars", type=int, nargs="+", help="Numbers of bars per task.", default=[200, 20000, 100000])
+    parser.add_argument("--symbols", type=int, help="Number of stocks of the analyse_stocks run.", default=100)
+    args = parser.parse_args()
+
+    # The store is created before the workers, so that they share its resource tracker.
+    with SharedOHLCStore() as store, ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # Start the workers and import their modules before timing.
+        time_tasks(executor, [np.zeros((4, 1))] * args.workers * 2)
+        print(f"{'bars':>8} {'dataframe':>12} {'array':>12} {'shared':>12}  per task, {args.workers} workers")
+        for bars in args.bars:
+            data_stock = make_ohlcv(bars, seed=bars, freq="h")[OHLC_COLUMNS]
+            ohlc = to_ohlc_array(data_stock)
+            timings = {
+                "dataframe": time_tasks(executor, [data_stock] * args.tasks),
+                "array": time_tasks(executor, [ohlc] * args.tasks),
+            }
+            # Every task copies its prices into shared memory once, as analyse_stocks does.
+            start = time.perf_counter()
+            handles = [store.add(f"{bars}_{task}", ohlc) for task in range(args.tasks)]
+            timings["shared"] = time.perf_counter() - start + time_tasks(executor, handles)
+            print(f"{bars:8d}", *(f"{seconds * 1e6 / args.tasks:10.0f}us" for seconds in timings.values()))
+
+    stock_data = [
+        (symbol, make_ohlcv(2000, seed=seed, start_price=100 + seed), None)
+        for seed, symbol in enumerate(symbol_names(args.symbols))
+    ]
+    for shared_memory in (False, True):
+        start = time.perf_counter()
+        results = list(
+            analyse_stocks(stock_data, workers=args.workers, cluster_backend="numpy", shared_memory=shared_memory)
+        )
+        print(
+            f"analyse_stocks, {args.symbols} stocks of 2000 bars, shared_memory={shared_memory}: "
+            f"{time.perf_counter() - start:.2f} s"
+        )
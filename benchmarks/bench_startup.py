@@ -0,0 +1,55 @@
+"""Benchmark the cold start of price_action_analysis.py, with eager and lazy imports."""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import write_fixtures
+
+# Modules price_action_analysis.py imported before any work when every import was at the top.
+EAGER_IMPORTS = (
+    "import pandas, IPython.core.display, plotly.express, plotly.subplots, plotly.graph_objs, plotly.io, "
+    "sklearn.cluster, yfinance, reportlab.pdfgen.canvas, PIL.Image"
+)
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "price_action_analysis.py")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--repeats", type=int, help="Number of runs of each command, the best is kept.", default=5)
+parser.add_argument("--symbols", type=int, help="Number of stocks of the end to end runs.", default=10)
+args = parser.parse_args()
+
+
+def best_time(command: list, cwd: str) -> float:
+    """Get the best wall time of a few runs of a command in a fresh interpreter."""
+    times = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+with tempfile.TemporaryDirectory() as folder:
+    data_dir = os.path.join(folder, "data")
+    symbols = write_fixtures(data_dir, n_symbols=args.symbols, n_bars=200)
+    pd.DataFrame({"Symbol": symbols}).to_csv(os.path.join(folder, "stocks.csv"))
+    run = [sys.executable, SCRIPT, "--csv_file_path", "stocks.csv", "--data_dir", data_dir, "--cache_dir", ""]
+    timings = {
+        "python": best_time([sys.executable, "-c", "pass"], folder),
+        "eager imports": best_time([sys.executable, "-c", EAGER_IMPORTS], folder),
+        "import price_action_analysis": best_time(
+            [sys.executable, "-c", "import price_action_analysis"], os.path.dirname(SCRIPT)
+        ),
+        f"run, {args.symbols} stocks, --render skip": best_time(run + ["--render", "skip"], folder),
+        f"run, {args.symbols} stocks, --signals_only": best_time(run + ["--signals_only"], folder),
+        f"run, {args.symbols} stocks, --signals_only numpy": best_time(
+            run + ["--signals_only", "--cluster_backend", "numpy"], folder
+        ),
+    }
+
+for name, seconds in timings.items():
+    print(f"{name:40s} {seconds * 1e3:8.0f} ms")
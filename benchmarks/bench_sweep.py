@@ -0,0 +1,67 @@
+"""Benchmark the parameter sweep against one backtest per combination of parameters."""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.backtest_utils import backtest_stocks
+from utils.sweep_utils import SWEEP_PARAMETERS, get_grid, sweep_stocks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, help="Number of stocks.", default=10)
+    parser.add_argument("--bars", type=int, help="Number of bars of history per stock.", default=750)
+    parser.add_argument("--step_days", type=int, help="Calendar days between evaluation dates.", default=14)
+    parser.add_argument("--workers", type=int, help="Number of processes.", default=1)
+    parser.add_argument("--cluster_backend", type=str, help="Clustering backend.", default="numpy")
+    args = parser.parse_args()
+
+    # 100 combinations: 2 days x 2 n_clusters x 5 bandwidths x 5 percentages. The n_clusters axis shares all its work,
+    # the backtests below still run with each value to check that it does not change the signals.
+    grid = get_grid([150, 200], [5], [1, 2, 3, 4, 5], [4, 5], [5, 10, 20, 40, 80])
+    stock_data = [
+        (symbol, make_ohlcv(args.bars, seed=seed, start_price=100 + seed), None)
+        for seed, symbol in enumerate(symbol_names(args.symbols))
+    ]
+    index = stock_data[0][1].index
+    evaluation_dates = list(pd.date_range(index[0] + pd.DateOffset(200), index[-1], freq=f"{args.step_days}D"))
+
+    start = time.perf_counter()
+    evaluations = sweep_stocks(
+        stock_data, evaluation_dates, grid, workers=args.workers, cluster_backend=args.cluster_backend
+    )
+    sweep_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = []
+    for days, period, within_support_percentage, n_clusters, bandwidth in grid:
+        backtest = backtest_stocks(
+            stock_data,
+            evaluation_dates,
+            days=days,
+            period=period,
+            within_support_percentage=within_support_percentage,
+            workers=args.workers,
+            cluster_backend=args.cluster_backend,
+            n_clusters=n_clusters,
+            bandwidth=bandwidth,
+        )
+        for name, value in zip(SWEEP_PARAMETERS, (days, period, within_support_percentage, n_clusters, bandwidth)):
+            backtest[name] = value
+        expected.append(backtest)
+    backtests_time = time.perf_counter() - start
+
+    expected = pd.concat(expected, ignore_index=True)[evaluations.columns]
+    keys = list(SWEEP_PARAMETERS) + ["symbol", "date"]
+    pd.testing.assert_frame_equal(
+        evaluations.sort_values(keys).reset_index(drop=True),
+        expected.sort_values(keys).reset_index(drop=True),
+        check_dtype=False,
+    )
+    print(
+        f"{len(grid)} combinations, {args.symbols} stocks x {args.bars} bars, {len(evaluation_dates)} dates, "
+        f"{args.cluster_backend} clustering"
+    )
+    print(f"one backtest per combination: {backtests_time:7.2f} s")
+    print(f"sweep:                        {sweep_time:7.2f} s")
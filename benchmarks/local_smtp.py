@@ -0,0 +1,117 @@
+"""Minimal local SMTP server standing in for a mail provider in benchmarks."""
+import base64
+import socketserver
+import threading
+import time
+from typing import Optional
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks enough SMTP for smtplib to log in and send mail, one connection per handler."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server = self.server
+        time.sleep(server.connect_latency)
+        with server.lock:
+            server.connections += 1
+        self.reply("220 localhost ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                time.sleep(server.login_latency)
+                credentials = base64.b64decode(command.split()[-1]).split(b"\0")
+                if server.password is not None and credentials[-1].decode() != server.password:
+                    with server.lock:
+                        server.failed_logins += 1
+                    self.reply("535 authentication failed")
+                    continue
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 authenticated")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 end with .")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b".\n", b""):
+                        break
+                    size += len(data)
+                time.sleep(server.message_latency)
+                with server.lock:
+                    rejected = server.transient_failures > 0
+                    if rejected:
+                        server.transient_failures -= 1
+                    else:
+                        server.messages += 1
+                        server.bytes_received += size
+                self.reply("451 try again later" if rejected else "250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Plain text SMTP server on localhost counting connections, logins and messages.
+
+    Latencies mimic the cost of a provider's TLS handshake, login and message handling, and the
+    first messages can be rejected with a transient error to exercise retries.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        password: Optional[str] = None,
+        connect_latency: float = 0.0,
+        login_latency: float = 0.0,
+        message_latency: float = 0.0,
+        transient_failures: int = 0,
+    ):
+        """Start the server on a free port.
+
+        Args:
+            password (str, optional): Password accepted at login, any if None. Defaults to None.
+            connect_latency (float, optional): Seconds before greeting a new connection. Defaults to 0.
+            login_latency (float, optional): Seconds taken by a login. Defaults to 0.
+            message_latency (float, optional): Seconds taken to accept a message. Defaults to 0.
+            transient_failures (int, optional): Number of messages first rejected with a 451 reply. Defaults to 0.
+        """
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.password = password
+        self.connect_latency = connect_latency
+        self.login_latency = login_latency
+        self.message_latency = message_latency
+        self.transient_failures = transient_failures
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.failed_logins = 0
+        self.messages = 0
+        self.bytes_received = 0
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on."""
+        return self.server_address[1]
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.shutdown()
+        self.server_close()
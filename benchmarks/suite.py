@@ -0,0 +1,302 @@
+"""Offline benchmark suite of the analysis and charting stages, with a stored baseline to catch regressions.
+
+Every stage is timed on deterministic synthetic stock data, so runs on the same machine are
+comparable. The first run of each case is a warm-up which is not timed.
+
+    python -m benchmarks.suite --save_baseline    # time the quick preset and store it as the baseline
+    python -m benchmarks.suite                    # time it again and flag the cases slower than the baseline
+    python -m benchmarks.suite --preset full      # up to 100,000 bars and 2,000 stocks
+
+The exit status is 1 when a case regressed, so the suite can gate a CI job. Timings depend on the
+machine, so a baseline is only meaningful on the machine it was recorded on.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+import sklearn
+
+from benchmarks.synthetic import make_ohlcv, symbol_names
+from utils.analysis_utils import analyse_stocks
+from utils.plot_utils import get_data, get_layout, get_signal_figure
+from utils.render_utils import ChartJob, render_chart
+from utils.stock_data_utils import add_rsi, get_cluster_max_prices, get_cluster_min_prices, support_resistance
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+FIXTURE_END = "2024-12-31"
+# Daily bars go back further than pandas timestamps can for the largest sizes, which use hourly bars.
+MAX_DAILY_BARS = 20000
+PRESETS = {
+    "quick": {"bars": [200, 2000, 20000], "symbols": [1, 100]},
+    "full": {"bars": [200, 2000, 20000, 100000], "symbols": [1, 100, 2000]},
+}
+
+
+@dataclass
+class Case:
+    """A stage to benchmark.
+
+    Attributes:
+        name (str): Name of the case.
+        setup (Callable): Function of (number of bars, number of stocks, clustering backend) returning the
+            function to time.
+        per_symbol (bool): Whether the case is run for every number of stocks, else on one stock of every size.
+        max_bars (int): Largest number of bars the case is run on, all sizes if None.
+    """
+
+    name: str
+    setup: Callable[[int, int, str], Callable[[], object]]
+    per_symbol: bool = False
+    max_bars: Optional[int] = None
+
+
+def make_fixture(n_bars: int, seed: int = 0) -> pd.DataFrame:
+    """Get the synthetic stock data of a case, with its RSI.
+
+    Args:
+        n_bars (int): Number of bars.
+        seed (int, optional): Seed of the stock. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: Stock data ending on FIXTURE_END.
+    """
+    freq = "B" if n_bars <= MAX_DAILY_BARS else "h"
+    return add_rsi(make_ohlcv(n_bars, seed=seed, start_price=100 + seed, freq=freq, end=FIXTURE_END))
+
+
+def _setup_add_rsi(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    data = make_fixture(n_bars).drop(columns="rsi")
+    return lambda: add_rsi(data)
+
+
+def _setup_support_resistance(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    data = make_fixture(n_bars)
+    return lambda: support_resistance(data, backend=backend)
+
+
+def _setup_cluster_max_prices(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    data = make_fixture(n_bars)
+    return lambda: get_cluster_max_prices(data, backend=backend)
+
+
+def _setup_cluster_min_prices(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    data = make_fixture(n_bars)
+    return lambda: get_cluster_min_prices(data, backend=backend)
+
+
+def _setup_figure(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    data = make_fixture(n_bars)
+    cluster_min_prices = get_cluster_min_prices(data, backend=backend)
+    cluster_max_prices = get_cluster_max_prices(data, backend=backend)
+
+    def figure_json() -> str:
+        """Build the chart the way price_action_analysis.py does, as the JSON sent to the renderer."""
+        figure = get_signal_figure(cluster_min_prices, cluster_max_prices, data, get_data(data), get_layout("SYN0000"))
+        return pio.to_json(figure, validate=False)
+
+    return figure_json
+
+
+def _setup_render(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    job = ChartJob(_setup_figure(n_bars, n_symbols, backend)(), [os.path.join(tempfile.mkdtemp(), "chart.png")])
+    return lambda: render_chart(job)
+
+
+def _setup_scan(n_bars: int, n_symbols: int, backend: str) -> Callable[[], object]:
+    stock_data = [
+        (symbol, make_ohlcv(n_bars, seed=seed, start_price=100 + seed, end=FIXTURE_END), None)
+        for seed, symbol in enumerate(symbol_names(n_symbols))
+    ]
+    return lambda: list(analyse_stocks(stock_data, cluster_backend=backend))
+
+
+CASES = [
+    Case("add_rsi", _setup_add_rsi),
+    Case("support_resistance", _setup_support_resistance),
+    Case("get_cluster_max_prices", _setup_cluster_max_prices),
+    Case("get_cluster_min_prices", _setup_cluster_min_prices),
+    Case("figure", _setup_figure, max_bars=MAX_DAILY_BARS),
+    Case("render", _setup_render, max_bars=MAX_DAILY_BARS),
+    Case("scan", _setup_scan, per_symbol=True, max_bars=200),
+]
+
+
+def time_call(function: Callable[[], object], repeats: int, max_seconds: float) -> dict:
+    """Time a function after one warm-up call.
+
+    Args:
+        function (Callable): Function to time.
+        repeats (int): Maximum number of timed calls.
+        max_seconds (float): Time after which no more calls are made, at least one call is always timed.
+
+    Returns:
+        dict: Best and median wall time in seconds and the number of timed calls.
+    """
+    function()
+    times = []
+    started = time.perf_counter()
+    while len(times) < repeats and (not times or time.perf_counter() - started < max_seconds):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "runs": len(times)}
+
+
+def run_suite(
+    bars: Sequence[int],
+    symbols: Sequence[int],
+    backend: str = "numpy",
+    only: Optional[Sequence[str]] = None,
+    repeats: int = 5,
+    max_seconds: float = 10.0,
+) -> Dict[str, dict]:
+    """Time every case at every size.
+
+    Args:
+        bars (Sequence[int]): Numbers of bars the single stock cases are run on.
+        symbols (Sequence[int]): Numbers of stocks the scan is run on.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'numpy'.
+        only (Sequence[str], optional): Run only the cases whose name contains one of these. Defaults to None.
+        repeats (int, optional): Maximum number of timed calls per case. Defaults to 5.
+        max_seconds (float, optional): Time after which a case is not called again. Defaults to 10.
+
+    Returns:
+        Dict[str, dict]: Timings keyed by case name and size, such as 'add_rsi[bars=200,symbols=1]'.
+    """
+    results = {}
+    for case in CASES:
+        if only and not any(name in case.name for name in only):
+            continue
+        sizes = [(n_bars, n_symbols) for n_bars in bars for n_symbols in (symbols if case.per_symbol else [1])]
+        if case.max_bars is not None:
+            sizes = sorted({(min(n_bars, case.max_bars), n_symbols) for n_bars, n_symbols in sizes})
+        for n_bars, n_symbols in sizes:
+            key = f"{case.name}[bars={n_bars},symbols={n_symbols}]"
+            results[key] = time_call(case.setup(n_bars, n_symbols, backend), repeats, max_seconds)
+            print(f"{key:48s} {results[key]['min'] * 1e3:11.2f} ms  ({results[key]['runs']} runs)", flush=True)
+    return results
+
+
+def get_environment() -> dict:
+    """Get the versions and machine the timings were measured on."""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float, min_delta: float) -> List[str]:
+    """Compare timings with a baseline.
+
+    A case regressed when its best time is more than threshold slower than in the baseline and
+    by more than min_delta seconds, which keeps timer noise on the fastest cases from being flagged.
+
+    Args:
+        results (Dict[str, dict]): Timings as returned by run_suite.
+        baseline (Dict[str, dict]): Timings of the baseline.
+        threshold (float): Allowed slowdown as a fraction of the baseline time.
+        min_delta (float): Smallest slowdown in seconds which is flagged.
+
+    Returns:
+        List[str]: Names of the cases which regressed.
+    """
+    regressions = []
+    print(f"\n{'case':48s} {'baseline ms':>12s} {'now ms':>12s} {'ratio':>7s}")
+    for key, result in results.items():
+        if key not in baseline:
+            print(f"{key:48s} {'-':>12s} {result['min'] * 1e3:12.2f}    new")
+            continue
+        before, now = baseline[key]["min"], result["min"]
+        ratio = now / before if before else float("inf")
+        regressed = ratio > 1 + threshold and now - before > min_delta
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{key:48s} {before * 1e3:12.2f} {now * 1e3:12.2f} {ratio:7.2f}{flag}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main() -> None:
+    """Run the suite, then store it as the baseline or compare it with the baseline."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--preset", type=str, choices=list(PRESETS), help="Sizes to run.", default="quick")
+    parser.add_argument("--bars", type=int, nargs="+", help="Numbers of bars, instead of the preset ones.")
+    parser.add_argument("--symbols", type=int, nargs="+", help="Numbers of stocks scanned, instead of the preset ones.")
+    parser.add_argument(
+        "--cluster_backend",
+        type=str,
+        help="Clustering backend, sklearn takes minutes on the larger sizes.",
+        default="numpy",
+    )
+    parser.add_argument("--only", type=str, nargs="+", help="Run only the cases whose name contains one of these.")
+    parser.add_argument("--repeats", type=int, help="Maximum number of timed calls per case.", default=5)
+    parser.add_argument("--max_seconds", type=float, help="Time after which a case is not called again.", default=10)
+    parser.add_argument("--baseline", type=str, help="Baseline file.", default=BASELINE_FILE)
+    parser.add_argument("--save_baseline", action="store_true", help="Store the timings as the baseline.")
+    parser.add_argument("--threshold", type=float, help="Allowed slowdown, 0.25 is 25%%.", default=0.25)
+    parser.add_argument("--min_delta", type=float, help="Smallest slowdown in seconds flagged.", default=0.002)
+    parser.add_argument("--output", type=str, help="JSON file to write the timings to.", default="")
+    args = parser.parse_args()
+
+    preset = PRESETS[args.preset]
+    results = run_suite(
+        args.bars or preset["bars"],
+        args.symbols or preset["symbols"],
+        backend=args.cluster_backend,
+        only=args.only,
+        repeats=args.repeats,
+        max_seconds=args.max_seconds,
+    )
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": get_environment(),
+        "cluster_backend": args.cluster_backend,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)["results"]
+        # Cases not run this time keep their previous baseline.
+        report["results"] = {**baseline, **results}
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved baseline of {len(results)} cases to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save_baseline to record one.")
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline["environment"] != report["environment"] or baseline["cluster_backend"] != args.cluster_backend:
+        print("Warning: the baseline was recorded with another environment or backend:", baseline["environment"])
+    regressions = compare(results, baseline["results"], args.threshold, args.min_delta)
+    if regressions:
+        print(f"\n{len(regressions)} cases are more than {args.threshold:.0%} slower than the baseline.")
+        sys.exit(1)
+    print(f"\nNo case is more than {args.threshold:.0%} slower than the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Deterministic synthetic OHLCV data for benchmarks."""
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def make_ohlcv(
+    n_bars: int, seed: int = 0, start_price: float = 1000.0, freq: str = "B", end: Optional[str] = None
+) -> pd.DataFrame:
+    """Generate a random walk of OHLCV bars laid out like yfinance data.
+
+    Prices are rounded to the NSE tick size of 0.05 so that windowed extrema repeat
+    the way they do on real data.
+
+    Args:
+        n_bars (int): Number of bars to generate.
+        seed (int, optional): Seed of the random generator. Defaults to 0.
+        start_price (float, optional): Price around which the walk starts. Defaults to 1000.
+        freq (str, optional): Pandas frequency of the bars. Defaults to business days.
+        end (str, optional): Date of the last bar, the previous day if None. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Synthetic stock data.
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.015, n_bars)))
+    open_ = close * np.exp(rng.normal(0, 0.005, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n_bars)))
+    if end is None:
+        end = pd.Timestamp.today(tz="Asia/Kolkata").normalize() - pd.Timedelta(days=1)
+    else:
+        end = pd.Timestamp(end, tz="Asia/Kolkata")
+    index = pd.date_range(end=end, periods=n_bars, freq=freq, name="Date")
+    data_stock = pd.DataFrame(
+        {
+            "Open": np.round(open_ / 0.05) * 0.05,
+            "High": np.round(high / 0.05) * 0.05,
+            "Low": np.round(low / 0.05) * 0.05,
+            "Close": np.round(close / 0.05) * 0.05,
+            "Volume": rng.integers(10_000, 1_000_000, n_bars),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+    return data_stock
+
+
+def symbol_names(n_symbols: int) -> list:
+    """Get names of synthetic stocks.
+
+    Args:
+        n_symbols (int): Number of stocks.
+
+    Returns:
+        list: Names SYN0000, SYN0001, ...
+    """
+    return [f"SYN{num:04d}" for num in range(n_symbols)]
+
+
+def write_fixtures(directory: str, n_symbols: int, n_bars: int, freq: str = "B") -> list:
+    """Write synthetic stock data as CSV files readable by LocalDataSource.
+
+    Args:
+        directory (str): Directory in which <symbol>.csv files are written.
+        n_symbols (int): Number of stocks.
+        n_bars (int): Number of bars per stock.
+        freq (str, optional): Pandas frequency of the bars. Defaults to business days.
+
+    Returns:
+        list: Names of the stocks written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    symbols = symbol_names(n_symbols)
+    for seed, symbol in enumerate(symbols):
+        make_ohlcv(n_bars, seed=seed, freq=freq).to_csv(os.path.join(directory, f"{symbol}.csv"))
+    return symbols
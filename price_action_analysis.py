@@ -1,76 +1,411 @@
 """Entry script for price action analysis of stocks using CSV."""
 import argparse
+import cProfile
+import pstats
+import numpy as np
 import pandas as pd
-from IPython.core.display import display, HTML
 import os
+from datetime import datetime
+from typing import Optional
 
 
-from utils.stock_data_utils import get_stock_data, add_rsi, get_cluster_max_prices, get_cluster_min_prices
-from utils.plot_utils import get_data, get_layout, images_for_stocks_to_buy, images_for_stocks_to_sell
+from utils.analysis_utils import analyse_stocks
+from utils.cache_utils import CachedDataSource, OHLCVCache
+from utils.checkpoint_utils import ScanCheckpoint
+from utils.cluster_utils import CLUSTER_BACKENDS
+from utils.config_utils import DAYS, PERIOD, WITHIN_SUPPORT_PERCENTAGE
+from utils.data_source_utils import LocalDataSource, YahooDataSource
+from utils.level_cache_utils import LevelCache
+from utils.stock_data_utils import iter_stock_data_bulk
+from utils.profile_utils import RunProfiler
+from utils.render_cache_utils import RenderCache, prune_charts
+from utils.render_utils import (
+    RENDER_MODES,
+    ChartJob,
+    ChartRenderer,
+    save_chart_jobs,
+    signal_chart_job,
+    signal_chart_path,
+)
+from utils.store_utils import SignalStore
 
-display(HTML("<style>.container { width:100% !important; }</style>"))
+FOLDER_TO_SAVE_IMAGES = "buy_sell_images"
+CHART_JOBS_FILE = "chart_jobs.jsonl"
+CHECKPOINT_FILE = "scan_checkpoint.jsonl"
 
-parser = argparse.ArgumentParser()
-parser.add_argument(
-    "--csv_file_path", type=str, help="CSV file containing list of stocks.", default="ind_niftylist.csv"
-)
-args = parser.parse_args()
 
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments of the script.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--csv_file_path", type=str, help="CSV file containing list of stocks.", default="ind_niftylist.csv"
+    )
+    parser.add_argument("--fetch_workers", type=int, help="Number of stocks fetched concurrently.", default=8)
+    parser.add_argument(
+        "--workers", type=int, help="Number of processes analysing stocks, 1 to analyse serially.", default=1
+    )
+    parser.add_argument(
+        "--shared_memory",
+        action="store_true",
+        help="Hand the prices to the --workers processes through shared memory instead of pickling them.",
+    )
+    parser.add_argument(
+        "--cluster_backend",
+        type=str,
+        choices=CLUSTER_BACKENDS,
+        help="Clustering implementation, sklearn is the reference and numpy is faster.",
+        default="sklearn",
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        help="Read stock data from <data_dir>/<symbol>.csv instead of yahoo finance.",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        help="Directory caching fetched stock data, empty to disable.",
+        default="stock_data_cache",
+    )
+    parser.add_argument("--cache_max_mb", type=int, help="Size of the stock data cache in MB.", default=500)
+    parser.add_argument(
+        "--cache_ttl", type=float, help="Seconds for which cached data is used without a top-up fetch.", default=3600
+    )
+    parser.add_argument(
+        "--level_cache",
+        type=str,
+        help="JSON file caching support resistance levels between runs, empty to disable.",
+        default="level_cache.json",
+    )
+    parser.add_argument(
+        "--level_cache_size", type=int, help="Number of cached levels kept in the level cache.", default=20000
+    )
+    parser.add_argument(
+        "--prescreen",
+        action="store_true",
+        help="Skip the clustering and charts of stocks whose close rules out a signal. Their levels are not stored.",
+    )
+    parser.add_argument(
+        "--render",
+        type=str,
+        choices=RENDER_MODES,
+        help=f"Render charts now, save them to {CHART_JOBS_FILE} for render_charts.py, or skip them.",
+        default="now",
+    )
+    parser.add_argument("--render_workers", type=int, help="Number of processes rendering charts.", default=1)
+    parser.add_argument(
+        "--render_cache",
+        type=str,
+        help="Directory caching rendered charts by the hash of their figure, empty to disable.",
+        default="render_cache",
+    )
+    parser.add_argument("--render_cache_mb", type=int, help="Size of the render cache in MB.", default=200)
+    parser.add_argument(
+        "--charts_max_mb",
+        type=int,
+        help=f"Size of {FOLDER_TO_SAVE_IMAGES} above which the oldest charts of past runs are removed. Defaults to 0, "
+        "which keeps all.",
+        default=0,
+    )
+    parser.add_argument(
+        "--report_pdf",
+        type=str,
+        help="PDF file to write a report of the calls and the charts of this run to, none if empty. Reports with more "
+        "than 16 MB of images are split into <file>_1.pdf, <file>_2.pdf and so on, and send_email_to_people "
+        "sends each part in its own email.",
+        default="",
+    )
+    parser.add_argument(
+        "--run_report",
+        type=str,
+        help="JSON file to write per stock, per stage timings to, with a CSV of every timing next to it. None if empty.",
+        default="",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="File to write cProfile statistics of the run to, for pstats or snakeviz. None if empty.",
+        default="",
+    )
+    parser.add_argument(
+        "--signal_store",
+        type=str,
+        help="SQLite database the signals and levels of every run are appended to, none if empty.",
+        default="signals.db",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="JSON lines file every finished stock is durably recorded in, none if empty.",
+        default=CHECKPOINT_FILE,
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the scan recorded in --checkpoint: skip the stocks done and retry the ones which failed.",
+    )
+    parser.add_argument(
+        "--signals_only",
+        "--signals-only",
+        action="store_true",
+        help="Only write buy_sell.csv, without charts, which skips loading plotly and IPython.",
+    )
+    args = parser.parse_args()
+    if args.signals_only:
+        if args.report_pdf:
+            parser.error("--report_pdf needs the charts, it cannot be used with --signals_only.")
+        args.render = "skip"
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs a --checkpoint file.")
+    return args
 
-DAYS = 200
-PERIOD = 5
-WITHIN_SUPPORT_PERCENTAGE = 2
-CSV_FILE_FOR_STOCK_INDICES = args.csv_file_path
-FOLDER_TO_SAVE_IMAGES = "buy_sell_images"
 
-nifty_file = pd.read_csv(CSV_FILE_FOR_STOCK_INDICES, index_col=0)
-os.makedirs(FOLDER_TO_SAVE_IMAGES, exist_ok=True)
+def main() -> None:
+    """Analyse every stock of the CSV file and write buy sell suggestions and charts."""
+    args = parse_args()
+    if not args.profile:
+        run(args)
+        return
+    profile = cProfile.Profile()
+    profile.runcall(run, args)
+    profile.dump_stats(args.profile)
+    print(f"Saved profile to {args.profile}, top functions by cumulative time:")
+    pstats.Stats(profile).sort_stats("cumulative").print_stats(20)
 
 
-buy_sell_stock = {}
+def run(args: argparse.Namespace) -> None:
+    """Analyse every stock of the CSV file and write buy sell suggestions and charts.
 
-for num in range(len(nifty_file)):
-    company = list(nifty_file["Symbol"])[num]
-    buy_sell_stock[company] = {}
-    buy_sell_stock[company]["buy"] = []
-    buy_sell_stock[company]["sell"] = []
+    Args:
+        args (argparse.Namespace): Parsed arguments.
+    """
+    profiler = RunProfiler()
+    # Plotting, IPython and the PDF report are imported only when used, as they take most of the start-up time.
+    if not args.signals_only:
+        from IPython.core.display import display, HTML
 
-for num in range(len(nifty_file)):
-    try:
-        print("Analysing for nifty stock:", list(nifty_file["Symbol"])[num])
+        display(HTML("<style>.container { width:100% !important; }</style>"))
+        os.makedirs(FOLDER_TO_SAVE_IMAGES, exist_ok=True)
+    if args.render != "skip":
+        from utils.plot_utils import get_data, get_layout
+
+    nifty_file = pd.read_csv(args.csv_file_path, index_col=0)
+
+    buy_sell_stock = {}
+
+    for num in range(len(nifty_file)):
         company = list(nifty_file["Symbol"])[num]
-        data_stock = get_stock_data(company, days=DAYS, interval="1d")
-        data_stock = add_rsi(data_stock)
+        buy_sell_stock[company] = {}
+        buy_sell_stock[company]["buy"] = []
+        buy_sell_stock[company]["sell"] = []
+
+    symbols = list(nifty_file["Symbol"])
+    checkpoint = None
+    if args.checkpoint:
+        parameters = {
+            "csv_file_path": args.csv_file_path,
+            "date": datetime.today().strftime("%Y-%m-%d"),
+            "days": DAYS,
+            "period": PERIOD,
+            "within_support_percentage": WITHIN_SUPPORT_PERCENTAGE,
+            "cluster_backend": args.cluster_backend,
+            "render": args.render,
+        }
+        try:
+            checkpoint = ScanCheckpoint(args.checkpoint, parameters, resume=args.resume)
+        except ValueError as error:
+            raise SystemExit(error)
+        completed = checkpoint.completed()
+        for company, record in completed.items():
+            if company in buy_sell_stock:
+                # Prices as the analysis returns them, so that buy_sell.csv is written the same way.
+                buy_sell_stock[company] = {
+                    "buy": [np.float64(price) for price in record["buy"]],
+                    "sell": [np.float64(price) for price in record["sell"]],
+                }
+        symbols = [company for company in symbols if company not in completed]
+        if args.resume:
+            print(
+                f"Resuming {args.checkpoint}: {len(completed)} stocks done, {len(symbols)} left to scan "
+                f"of which {len(checkpoint.failed())} failed before."
+            )
 
-        data = data_stock
-        period = PERIOD
-        cluster_max_prices = get_cluster_max_prices(data, period=PERIOD)
-        cluster_min_prices = get_cluster_min_prices(data, period=PERIOD)
+    def record_chart(job: ChartJob, error: Optional[Exception]) -> None:
+        """Record a stock in the checkpoint once its chart is written."""
+        signals = buy_sell_stock[job.symbol]
+        if error is None:
+            checkpoint.record(job.symbol, signals["buy"], signals["sell"])
+        else:
+            checkpoint.record(job.symbol, signals["buy"], signals["sell"], "render", repr(error))
 
-        layout = get_layout(title=company)
-        data = get_data(data_stock)
-        config = {"displayModeBar": False}
+    source = LocalDataSource(args.data_dir) if args.data_dir else YahooDataSource()
+    cache = None
+    if args.cache_dir:
+        cache = OHLCVCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+        source = CachedDataSource(source, cache, ttl=args.cache_ttl)
+    stock_data = iter_stock_data_bulk(
+        symbols,
+        days=DAYS,
+        interval="1d",
+        max_workers=args.fetch_workers,
+        source=source,
+        profiler=profiler,
+    )
+    level_cache = LevelCache.load(args.level_cache, args.level_cache_size) if args.level_cache else None
+    results = analyse_stocks(
+        stock_data,
+        period=PERIOD,
+        within_support_percentage=WITHIN_SUPPORT_PERCENTAGE,
+        workers=args.workers,
+        cluster_backend=args.cluster_backend,
+        level_cache=level_cache,
+        prescreen=args.prescreen,
+        shared_memory=args.shared_memory,
+    )
 
-        close_last = data_stock["Close"][-1]
+    renderer = None
+    render_cache = None
+    if args.render == "now":
+        on_done = record_chart if checkpoint is not None else None
+        if args.render_cache:
+            render_cache = RenderCache(args.render_cache, max_bytes=args.render_cache_mb * 1024 * 1024)
+        renderer = ChartRenderer(workers=args.render_workers, profiler=profiler, on_done=on_done, cache=render_cache)
+    deferred_jobs = []
+
+    store = SignalStore(args.signal_store) if args.signal_store else None
+    run_id = None
+    if store is not None:
+        run_id = store.start_run(DAYS, PERIOD, WITHIN_SUPPORT_PERCENTAGE, args.cluster_backend)
+
+    skipped = 0
+    for company, data_stock, result in results:
+        print("Analysing for nifty stock:", company)
+        profiler.add_timings(company, result.timings)
+        if store is not None:
+            store.add_result(run_id, result, None if data_stock is None or data_stock.empty else data_stock.index[-1])
+        if result.skipped:
+            skipped += 1
+            if not args.signals_only:
+                os.makedirs(f"{FOLDER_TO_SAVE_IMAGES}/{company}", exist_ok=True)
+            if checkpoint is not None:
+                checkpoint.record(company, [], [])
+            continue
+        if result.error is not None:
+            if data_stock is not None:
+                profiler.count(company, "analysis_failures")
+            print(result.error)
+            if checkpoint is not None:
+                checkpoint.record(company, [], [], result.failure, result.error)
+            continue
+        buy_sell_stock[company]["buy"] = result.buy
+        buy_sell_stock[company]["sell"] = result.sell
+        data_stock = data_stock.assign(rsi=result.rsi)
+        cluster_max_prices = result.cluster_max_prices
+        cluster_min_prices = result.cluster_min_prices
+
+        close_last = result.close_last
         delta = close_last * (WITHIN_SUPPORT_PERCENTAGE / 100)
 
-        os.makedirs(f"{FOLDER_TO_SAVE_IMAGES}/{company}", exist_ok=True)
-        images_for_stocks_to_buy(
-            close_last, delta, cluster_min_prices, cluster_max_prices, data_stock, company, data, layout, "end"
-        )
+        if not args.signals_only:
+            os.makedirs(f"{FOLDER_TO_SAVE_IMAGES}/{company}", exist_ok=True)
+        job = None
+        if args.render != "skip":
+            try:
+                with profiler.stage(company, "figure"):
+                    layout = get_layout(title=company)
+                    data = get_data(data_stock)
+                    job = signal_chart_job(
+                        close_last,
+                        delta,
+                        cluster_min_prices,
+                        cluster_max_prices,
+                        data_stock,
+                        company,
+                        data,
+                        layout,
+                        "end",
+                        folder=FOLDER_TO_SAVE_IMAGES,
+                    )
+            except Exception as error:
+                print(f"Could not build the chart of {company}: {error!r}")
+                profiler.count(company, "render_failures")
+                if checkpoint is not None:
+                    checkpoint.record(company, result.buy, result.sell, "render", repr(error))
+                continue
+            if job is not None and renderer is not None:
+                renderer.submit(job)
+            elif job is not None:
+                deferred_jobs.append(job)
+            print("Saved Image for: ", company)
+
+        # Stocks with a chart to render now are recorded once it is written, and deferred charts once they are saved.
+        if checkpoint is not None and job is None:
+            checkpoint.record(company, result.buy, result.sell)
 
-        images_for_stocks_to_sell(
-            close_last, delta, cluster_min_prices, cluster_max_prices, data_stock, company, data, layout, "end"
+    if args.prescreen:
+        print(f"Pre-screen skipped {skipped} of {len(nifty_file)} stocks which cannot trigger a signal.")
+    if renderer is not None:
+        renderer.close()
+        print(
+            f"Rendered {renderer.charts - renderer.failures} of {renderer.charts} charts to {renderer.images} images, "
+            f"{renderer.cached} of them from the render cache."
         )
-        print("Saved Image for: ", company)
-
-        if cluster_min_prices[0] > (close_last - delta) and cluster_min_prices[0] < (close_last + delta):
-            buy_sell_stock[company]["buy"].append(close_last)
-        if cluster_max_prices[-1] > (close_last - delta) and cluster_max_prices[-1] < (close_last + delta):
-            buy_sell_stock[company]["sell"].append(close_last)
-    except ValueError:
-        print("No proper support resistance values could be found for the given period.")
-        continue
-
-df_buy_sell = pd.DataFrame.from_dict(buy_sell_stock, orient="index")
-df_buy_sell.to_csv("buy_sell.csv")
+    if args.render == "defer":
+        save_chart_jobs(deferred_jobs, CHART_JOBS_FILE, append=args.resume)
+        print(f"Saved {len(deferred_jobs)} charts to render to {CHART_JOBS_FILE}.")
+        if checkpoint is not None:
+            for job in deferred_jobs:
+                checkpoint.record(job.symbol, buy_sell_stock[job.symbol]["buy"], buy_sell_stock[job.symbol]["sell"])
+    if checkpoint is not None:
+        checkpoint.close()
+        print(checkpoint.summary())
+    # The charts of this scan, including the stocks a resumed scan finished before.
+    chart_paths = [
+        signal_chart_path(FOLDER_TO_SAVE_IMAGES, company, signal.upper(), "end", price)
+        for company, signals in buy_sell_stock.items()
+        for signal in ("buy", "sell")
+        for price in signals[signal]
+    ]
+    if not args.signals_only and args.charts_max_mb > 0:
+        removed = prune_charts(FOLDER_TO_SAVE_IMAGES, chart_paths, args.charts_max_mb * 1024 * 1024)
+        if removed:
+            print(f"Removed {removed} charts of earlier runs from {FOLDER_TO_SAVE_IMAGES}.")
+
+    with profiler.stage(None, "csv"):
+        df_buy_sell = pd.DataFrame.from_dict(buy_sell_stock, orient="index")
+        df_buy_sell.to_csv("buy_sell.csv")
+    if store is not None:
+        with profiler.stage(None, "store"):
+            store.close()
+        print(f"Saved the signals of run {run_id} to {args.signal_store}")
+    if args.report_pdf:
+        from utils.pdf_utils import create_report
+
+        with profiler.stage(None, "report"):
+            report_files = create_report(
+                FOLDER_TO_SAVE_IMAGES,
+                args.report_pdf,
+                buy_sell_stock,
+                workers=args.render_workers,
+                images_list=[path for path in dict.fromkeys(chart_paths) if os.path.exists(path)],
+            )
+        print("Saved report to", ", ".join(report_files))
+    if cache is not None:
+        print(cache.report())
+    if render_cache is not None:
+        print(render_cache.report())
+    if level_cache is not None:
+        level_cache.save(args.level_cache)
+        print(level_cache.report())
+    print(profiler.summary())
+    if args.run_report:
+        print("Saved run report to", ", ".join(profiler.write(args.run_report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Entry script rendering the charts saved by price_action_analysis.py --render defer."""
+import argparse
+
+from utils.render_cache_utils import RenderCache
+from utils.render_utils import ChartRenderer, load_chart_jobs
+
+
+def main() -> None:
+    """Render every chart job of the jobs file."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs_file", type=str, help="Chart jobs file to render.", default="chart_jobs.jsonl")
+    parser.add_argument("--workers", type=int, help="Number of processes rendering charts.", default=1)
+    parser.add_argument(
+        "--render_cache",
+        type=str,
+        help="Directory caching rendered charts by the hash of their figure, empty to disable.",
+        default="render_cache",
+    )
+    parser.add_argument("--render_cache_mb", type=int, help="Size of the render cache in MB.", default=200)
+    args = parser.parse_args()
+
+    cache = RenderCache(args.render_cache, max_bytes=args.render_cache_mb * 1024 * 1024) if args.render_cache else None
+    with ChartRenderer(workers=args.workers, cache=cache) as renderer:
+        for job in load_chart_jobs(args.jobs_file):
+            renderer.submit(job)
+    print(
+        f"Rendered {renderer.charts - renderer.failures} of {renderer.charts} charts to {renderer.images} images, "
+        f"{renderer.cached} of them from the render cache."
+    )
+    if cache is not None:
+        print(cache.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Entry script running the price action analysis as a daemon with a local HTTP/JSON API."""
+import argparse
+import asyncio
+
+import pandas as pd
+
+from utils.cache_utils import CachedDataSource, OHLCVCache
+from utils.cluster_utils import CLUSTER_BACKENDS
+from utils.config_utils import DAYS, PERIOD, WITHIN_SUPPORT_PERCENTAGE
+from utils.daemon_utils import Scanner
+from utils.data_source_utils import LocalDataSource, YahooDataSource
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments of the script.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--csv_file_path", type=str, help="CSV file containing list of stocks.", default="ind_niftylist.csv"
+    )
+    parser.add_argument("--host", type=str, help="Address the API listens on.", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Port the API listens on.", default=8765)
+    parser.add_argument(
+        "--interval", type=float, help="Seconds between scans, 0 to only scan on POST /rescan.", default=900
+    )
+    parser.add_argument("--fetch_workers", type=int, help="Number of stocks fetched concurrently.", default=8)
+    parser.add_argument(
+        "--workers", type=int, help="Number of processes analysing stocks, 1 to analyse in a thread.", default=1
+    )
+    parser.add_argument(
+        "--cluster_backend",
+        type=str,
+        choices=CLUSTER_BACKENDS,
+        help="Clustering implementation, sklearn is the reference and numpy is faster.",
+        default="sklearn",
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        help="Read stock data from <data_dir>/<symbol>.csv instead of yahoo finance.",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        help="Directory caching fetched stock data, empty to disable.",
+        default="stock_data_cache",
+    )
+    parser.add_argument("--cache_max_mb", type=int, help="Size of the stock data cache in MB.", default=500)
+    parser.add_argument(
+        "--cache_ttl", type=float, help="Seconds for which cached data is used without a top-up fetch.", default=300
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Scan the stocks of the CSV file on a schedule and serve their signals and levels."""
+    args = parse_args()
+    symbols = list(pd.read_csv(args.csv_file_path, index_col=0)["Symbol"])
+    source = LocalDataSource(args.data_dir) if args.data_dir else YahooDataSource()
+    if args.cache_dir:
+        cache = OHLCVCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+        source = CachedDataSource(source, cache, ttl=args.cache_ttl)
+    scanner = Scanner(
+        symbols,
+        source,
+        days=DAYS,
+        period=PERIOD,
+        within_support_percentage=WITHIN_SUPPORT_PERCENTAGE,
+        fetch_workers=args.fetch_workers,
+        workers=args.workers,
+        cluster_backend=args.cluster_backend,
+    )
+    try:
+        asyncio.run(scanner.serve(args.host, args.port, args.interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scanner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Entry script querying the signal store written by price_action_analysis.py."""
+import argparse
+
+from utils.store_utils import SIGNAL_KINDS, SignalStore
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments of the script.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signal_store", type=str, help="SQLite database of the signals.", default="signals.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for kind in SIGNAL_KINDS:
+        signals = commands.add_parser(kind, help=f"List the {kind} signals of recent dates.")
+        signals.add_argument("--days", type=int, help="Number of past days.", default=30)
+        signals.add_argument("--symbol", type=str, help="Only list the signals of this stock.", default=None)
+        signals.add_argument(
+            "--all_runs", action="store_true", help="List the signal of every run, not only the latest one of a date."
+        )
+
+    levels = commands.add_parser("levels", help="List the support and resistance levels of a stock in every run.")
+    levels.add_argument("symbol", type=str, help="Name of the stock.")
+
+    export = commands.add_parser("export", help="Write the signals of a run in the format of buy_sell.csv.")
+    export.add_argument("path", type=str, help="CSV file to write.")
+    export.add_argument("--run_id", type=int, help="Id of the run, the latest if not given.", default=None)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Print the signals or levels asked for, or export a run."""
+    args = parse_args()
+    with SignalStore(args.signal_store) as store:
+        if args.command in SIGNAL_KINDS:
+            print(store.signals(args.command, days=args.days, symbol=args.symbol, latest=not args.all_runs).to_string())
+        elif args.command == "levels":
+            print(store.level_history(args.symbol).to_string())
+        else:
+            store.export_buy_sell_csv(args.path, run_id=args.run_id)
+            print("Saved", args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Entry script for a parameter sweep of the buy sell signals on a CSV list of stocks."""
+import argparse
+import time
+
+import pandas as pd
+
+from utils.cluster_utils import CLUSTER_BACKENDS
+from utils.config_utils import DAYS, PERIOD, WITHIN_SUPPORT_PERCENTAGE
+from utils.data_source_utils import LocalDataSource, YahooDataSource
+from utils.stock_data_utils import get_dates_for_backtesting, iter_stock_data_bulk
+from utils.sweep_utils import get_grid, summarise_sweep, sweep_stocks
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line arguments of the script.
+
+    Returns:
+        argparse.Namespace: Parsed arguments.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--csv_file_path", type=str, help="CSV file containing list of stocks.", default="ind_niftylist.csv"
+    )
+    parser.add_argument(
+        "--data_dir",
+        type=str,
+        help="Read stock data from <data_dir>/<symbol>.csv instead of yahoo finance.",
+        default=None,
+    )
+    parser.add_argument("--days", type=int, nargs="+", help="Numbers of past days analysed.", default=[DAYS])
+    parser.add_argument("--period", type=int, nargs="+", help="Window periods for gathering prices.", default=[PERIOD])
+    parser.add_argument(
+        "--within_support_percentage",
+        type=float,
+        nargs="+",
+        help="Distances from a level, in percent of the close, which trigger a signal.",
+        default=[WITHIN_SUPPORT_PERCENTAGE],
+    )
+    parser.add_argument(
+        "--n_clusters",
+        type=int,
+        nargs="+",
+        help="Numbers of clusters of the windowed maxima. Kept for the output, equal prices always share a cluster "
+        "so it does not change the signals and costs nothing.",
+        default=[5],
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, nargs="+", help="Bandwidths of the clustering of frequent prices.", default=[10]
+    )
+    parser.add_argument("--num_periods", type=int, help="Number of evaluation dates.", default=50)
+    parser.add_argument("--step_days", type=int, help="Calendar days between evaluation dates.", default=7)
+    parser.add_argument(
+        "--horizons", type=int, nargs="+", help="Bars after a signal at which returns are measured.", default=[5, 20]
+    )
+    parser.add_argument("--fetch_workers", type=int, help="Number of stocks fetched concurrently.", default=8)
+    parser.add_argument("--workers", type=int, help="Number of processes running the sweep.", default=1)
+    parser.add_argument(
+        "--cluster_backend",
+        type=str,
+        choices=CLUSTER_BACKENDS,
+        help="Clustering implementation, sklearn is the reference and numpy is faster.",
+        default="sklearn",
+    )
+    parser.add_argument("--output", type=str, help="CSV file to write every evaluation to, none if empty.", default="")
+    parser.add_argument(
+        "--summary", type=str, help="CSV file to write the statistics of every combination to.", default="sweep.csv"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Sweep the parameters over every stock of the CSV file and print the statistics of every combination."""
+    args = parse_args()
+    symbols = list(pd.read_csv(args.csv_file_path, index_col=0)["Symbol"])
+    evaluation_dates = get_dates_for_backtesting(args.num_periods, days=args.step_days)[::-1]
+    grid = get_grid(args.days, args.period, args.within_support_percentage, args.n_clusters, args.bandwidth)
+
+    # One fetch per stock covers the longest window of every evaluation date and the returns after the last one.
+    source = LocalDataSource(args.data_dir) if args.data_dir else YahooDataSource()
+    history_days = max(args.days) + args.num_periods * args.step_days + 1
+    stock_data = iter_stock_data_bulk(
+        symbols, days=history_days, interval="1d", max_workers=args.fetch_workers, source=source
+    )
+
+    start = time.perf_counter()
+    evaluations = sweep_stocks(
+        stock_data,
+        evaluation_dates,
+        grid,
+        horizons=args.horizons,
+        workers=args.workers,
+        cluster_backend=args.cluster_backend,
+    )
+    print(
+        f"Swept {len(grid)} combinations over {len(symbols)} stocks on {len(evaluation_dates)} dates "
+        f"in {time.perf_counter() - start:.1f} s"
+    )
+    if args.output:
+        evaluations.to_csv(args.output, index=False)
+        print("Saved evaluations to", args.output)
+    summary = summarise_sweep(evaluations, horizons=args.horizons)
+    summary.to_csv(args.summary)
+    print(summary.to_string())
+    print("Saved statistics of every combination to", args.summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Stocks whose backtest fails are reported and left out of the evaluations."""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_ohlcv
+from utils import backtest_utils
+
+SYMBOLS = ["SYN0000", "SYN0001", "SYN0002", "SYN0003"]
+backtest_stock = backtest_utils.backtest_stock
+
+
+def broken_backtest_stock(symbol, *args):
+    """Backtest a stock, raising for the second one."""
+    if symbol == SYMBOLS[1]:
+        raise RuntimeError("worker failed")
+    return backtest_stock(symbol, *args)
+
+
+def get_stock_data():
+    """Get stock data with a fetch error on the third stock and no Close prices on the last one."""
+    stock_data = [(symbol, make_ohlcv(400, seed=seed), None) for seed, symbol in enumerate(SYMBOLS)]
+    stock_data[2] = (SYMBOLS[2], None, ConnectionError("reset"))
+    stock_data[3] = (SYMBOLS[3], stock_data[3][1].drop(columns="Close"), None)
+    return stock_data
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failed_stocks_are_left_out(monkeypatch, capsys, workers):
+    stock_data = get_stock_data()
+    index = stock_data[0][1].index
+    evaluation_dates = list(pd.date_range(index[0] + pd.DateOffset(200), index[-1], freq="7D"))
+    expected = backtest_utils.backtest_stocks(stock_data[:1], evaluation_dates, cluster_backend="numpy")
+
+    monkeypatch.setattr(backtest_utils, "backtest_stock", broken_backtest_stock)
+    evaluations = backtest_utils.backtest_stocks(
+        stock_data, evaluation_dates, workers=workers, cluster_backend="numpy", dates_per_task=10
+    )
+    pd.testing.assert_frame_equal(evaluations, expected)
+    output = capsys.readouterr().out
+    # Every failed stock is reported once, whatever its number of tasks.
+    for symbol in SYMBOLS[1:]:
+        assert output.count(f"Could not backtest {symbol}:") == 1
+    assert "worker failed" in output
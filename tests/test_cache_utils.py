@@ -0,0 +1,50 @@
+"""Eviction of the on-disk stock data cache while entries are being stored."""
+import threading
+
+import pandas as pd
+
+from benchmarks.synthetic import make_ohlcv
+from utils.cache_utils import OHLCVCache
+
+
+def test_evict_skips_entries_being_stored(tmp_path, monkeypatch):
+    cache = OHLCVCache(str(tmp_path), max_bytes=100 * 1024 * 1024)
+    small, large = make_ohlcv(50, seed=0), make_ohlcv(2000, seed=1)
+    # The small entry is the least recently used one.
+    cache.store("SMALL", "1d", small, start="2020-01-01", end="2021-01-01")
+    small_bytes = cache.stats()["bytes"]
+    cache.store("LARGE", "1d", large, start="2020-01-01", end="2021-01-01")
+
+    # Hold the next store of the small entry after it wrote its first file.
+    writing, resume = threading.Event(), threading.Event()
+    write_array = OHLCVCache._write_array
+
+    def held_write_array(entry_dir, name, values):
+        write_array(entry_dir, name, values)
+        writing.set()
+        resume.wait(10)
+
+    monkeypatch.setattr(OHLCVCache, "_write_array", staticmethod(held_write_array))
+    updated = make_ohlcv(51, seed=0)
+    errors = []
+
+    def store():
+        try:
+            cache.store("SMALL", "1d", updated, start="2020-01-01", end="2021-01-02")
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=store)
+    thread.start()
+    assert writing.wait(10)
+    cache.max_bytes = 2 * small_bytes
+    cache.evict()
+    resume.set()
+    thread.join()
+
+    assert errors == []
+    assert cache.load("LARGE", "1d") is None
+    data_stock, meta = cache.load("SMALL", "1d")
+    pd.testing.assert_frame_equal(data_stock, updated, check_freq=False)
+    assert meta["end"] == "2021-01-02"
+    assert cache.stats()["evictions"] == 1
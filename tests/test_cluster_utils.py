@@ -0,0 +1,135 @@
+"""Parity of the numpy clustering backend with the sklearn reference."""
+import numpy as np
+import pytest
+from sklearn.cluster import MeanShift
+
+from benchmarks.synthetic import make_ohlcv
+from utils.cluster_utils import mean_shift_1d
+from utils.stock_data_utils import (
+    get_cluster_max_prices,
+    get_cluster_min_prices,
+    get_frequent_prices,
+    get_windowed_prices,
+    support_resistance,
+    windowed_extrema,
+)
+
+
+def levels(data, backend):
+    """Get every level computed by the pipeline, or the type of the exception raised."""
+    result = {}
+    for name, func, period in [
+        ("max", get_cluster_max_prices, 5),
+        ("min", get_cluster_min_prices, 5),
+        ("support_resistance", support_resistance, 30),
+    ]:
+        try:
+            result[name] = func(data, period=period, backend=backend)
+        except (ValueError, IndexError) as error:
+            result[name] = type(error)
+    return result
+
+
+def same_levels(expected, result):
+    """Check whether two results of levels() are equal."""
+    if isinstance(expected, type) or isinstance(result, type):
+        return expected is result
+    if isinstance(expected, tuple):
+        return all(
+            expected_groups.keys() == groups.keys()
+            and all(np.array_equal(expected_groups[key], groups[key]) for key in expected_groups)
+            for expected_groups, groups in zip(expected, result)
+        )
+    return np.array_equal(expected, result)
+
+
+def clusterings(data, name):
+    """Get the values and bandwidth of every mean shift clustering behind a level of levels()."""
+    if name == "support_resistance":
+        num_windows = len(data) - 30 - 1
+        return [
+            (windowed_extrema(data["High"].to_numpy(), 30, num_windows, kind="max"), 30),
+            (windowed_extrema(data["Low"].to_numpy(), 30, num_windows, kind="min"), 30),
+        ]
+    prices_win, values = get_windowed_prices(data, "High" if name == "max" else "Low", 5)
+    return [(get_frequent_prices(prices_win, values), 10)]
+
+
+def near_bandwidth(distances, bandwidth):
+    """Check which distances are one bandwidth up to rounding."""
+    return np.isclose(distances, bandwidth, rtol=0, atol=1e-9)
+
+
+def crosses_boundary(values, bandwidth, centers):
+    """Check whether mean shift of values puts a value or center exactly one bandwidth from a mean or center.
+
+    Mean shift is followed from every seed until the means stop moving. Up to the first mean lying one
+    bandwidth from a value, any implementation finds the same means up to rounding, so this finds the
+    boundary if any implementation meets it.
+    """
+    sorted_values = np.sort(values)
+    means = np.unique(values)
+    for _ in range(300):
+        distances = np.abs(sorted_values[None, :] - means[:, None])
+        within = distances <= bandwidth
+        new_means = (within * sorted_values).sum(axis=1) / within.sum(axis=1)
+        if (
+            near_bandwidth(distances, bandwidth).any()
+            or near_bandwidth(np.abs(sorted_values[None, :] - new_means[:, None]), bandwidth).any()
+        ):
+            return True
+        moving = np.abs(new_means - means) > 1e-3 * bandwidth
+        means = new_means[moving]
+        if len(means) == 0:
+            break
+    return near_bandwidth(np.abs(centers[None, :] - centers[:, None]), bandwidth).any()
+
+
+def assert_same_clusters(values, bandwidth):
+    """Assert that mean_shift_1d finds sklearn's clusters, unless mean shift meets the bandwidth boundary.
+
+    The means are rounded differently from sklearn's, so a value or center exactly one bandwidth from a
+    mean can be within bandwidth for one and not for the other, and a value halfway between two centers
+    can get either label, as documented by mean_shift_1d.
+
+    Returns whether the clusters differ.
+    """
+    values = np.asarray(values, dtype=float)
+    expected = MeanShift(bandwidth=bandwidth).fit(np.reshape(values, (-1, 1)))
+    expected_centers = expected.cluster_centers_.ravel()
+    labels, centers = mean_shift_1d(values, bandwidth)
+    if len(centers) == len(expected_centers) and np.allclose(centers, expected_centers, rtol=0, atol=1e-9):
+        # A value halfway between two centers may get either label.
+        tied = np.isclose(np.abs(values - centers[labels]), np.abs(values - centers[expected.labels_]), rtol=0)
+        np.testing.assert_array_equal(labels[~tied], expected.labels_[~tied])
+        return not np.array_equal(labels, expected.labels_)
+    all_centers = np.concatenate([centers, expected_centers])
+    assert crosses_boundary(values, bandwidth, all_centers), "centers differ from sklearn"
+    return True
+
+
+# sklearn takes about 20 s per 2000 bar stock, so long stocks are limited to a few seeds, among them 16 which meets
+# the bandwidth boundary.
+@pytest.mark.parametrize(
+    "n_bars, seed",
+    [(140, seed) for seed in range(20)] + [(500, seed) for seed in range(20)] + [(2000, seed) for seed in (0, 1, 16)],
+)
+def test_levels_match_sklearn(n_bars, seed):
+    data = make_ohlcv(n_bars, seed=seed)
+    expected = levels(data, "sklearn")
+    result = levels(data, "numpy")
+    for name in expected:
+        if not same_levels(expected[name], result[name]):
+            differ = [assert_same_clusters(values, bandwidth) for values, bandwidth in clusterings(data, name)]
+            assert any(differ), f"{name} levels differ from sklearn"
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_mean_shift_1d_matches_sklearn(seed):
+    rng = np.random.default_rng(seed)
+    # Prices on a tick grid put values exactly one bandwidth apart.
+    for n_values in [1, 2, 5, 11, 12, 40, 61, 150, 400]:
+        tick = rng.choice([0.05, 0.25, 1.0])
+        values = np.round(rng.uniform(400, 400 + rng.uniform(5, 400), n_values) / tick) * tick
+        for bandwidth in [2.5, 10]:
+            assert_same_clusters(values, bandwidth)
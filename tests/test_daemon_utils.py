@@ -0,0 +1,189 @@
+"""Scans and API of the scanner daemon against in-memory stock data."""
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_ohlcv
+from utils.analysis_utils import analyse_stock, to_ohlc_array
+from utils.daemon_utils import Scanner, SymbolStream, build_streams
+from utils.data_source_utils import DataSource
+
+SYMBOLS = ["SYN0000", "SYN0001", "SYN0002"]
+
+
+class FrameSource(DataSource):
+    """Data source serving the frames of a dict, whatever the dates asked for."""
+
+    def __init__(self, frames: dict):
+        self.frames = frames
+
+    def history(self, stock_name: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        return self.frames[stock_name]
+
+
+def make_frames(n_bars):
+    """Get stock data of every symbol, the first n_bars of 200 bar histories."""
+    return {symbol: make_ohlcv(200, seed=seed).iloc[:n_bars] for seed, symbol in enumerate(SYMBOLS)}
+
+
+def assert_same_result(result, data_stock):
+    expected = analyse_stock(result.symbol, to_ohlc_array(data_stock), 5, 2, "numpy")
+    assert result.error == expected.error
+    assert result.failure == expected.failure
+    if expected.error is None:
+        np.testing.assert_array_equal(result.cluster_min_prices, expected.cluster_min_prices)
+        np.testing.assert_array_equal(result.cluster_max_prices, expected.cluster_max_prices)
+        np.testing.assert_array_equal(result.rsi, expected.rsi)
+        assert result.close_last == expected.close_last
+        assert (result.buy, result.sell) == (expected.buy, expected.sell)
+
+
+def test_build_streams_matches_adding_bars_one_stock_at_a_time():
+    ohlcs = [to_ohlc_array(make_ohlcv(n_bars, seed=n_bars)) for n_bars in (1, 40, 150, 200)]
+    for ohlc, stream in zip(ohlcs, build_streams(ohlcs, 5, "numpy")):
+        expected = SymbolStream.empty(5, "numpy")
+        expected.add(ohlc[:, :-1])
+        # Both streams go on from the bars added alike.
+        for added in (stream, expected):
+            added.add(ohlc[:, -1:])
+        np.testing.assert_array_equal(stream.ohlc, expected.ohlc)
+        np.testing.assert_array_equal(stream.rsi_values, expected.rsi_values)
+        for name in ("highs", "lows", "high_maxima", "low_maxima"):
+            assert list(getattr(stream.levels, name)) == list(getattr(expected.levels, name))
+
+
+def test_scan_adds_new_bars_to_the_previous_state():
+    source = FrameSource(make_frames(150))
+    scanner = Scanner(SYMBOLS, source, cluster_backend="numpy")
+
+    async def run():
+        scans = [await scanner.scan()]
+        for symbol in SYMBOLS:
+            assert_same_result(scanner.states[symbol].result, source.frames[symbol])
+
+        # A new bar for the first stock, an intraday update of the last bar for the second one.
+        source.frames[SYMBOLS[0]] = make_frames(151)[SYMBOLS[0]]
+        updated = source.frames[SYMBOLS[1]].copy()
+        updated.iloc[-1, updated.columns.get_loc("Close")] += 0.05
+        source.frames[SYMBOLS[1]] = updated
+        scans.append(await scanner.scan())
+        for symbol in SYMBOLS:
+            assert_same_result(scanner.states[symbol].result, source.frames[symbol])
+        # The history of the first stock is now a shifted window.
+        source.frames[SYMBOLS[0]] = make_frames(160)[SYMBOLS[0]].iloc[5:]
+        scans.append(await scanner.scan())
+        assert_same_result(scanner.states[SYMBOLS[0]].result, source.frames[SYMBOLS[0]])
+        return scans
+
+    try:
+        scans = asyncio.run(run())
+    finally:
+        scanner.close()
+    assert [(scan["analysed"], scan["unchanged"], scan["failed"]) for scan in scans] == [
+        (3, 0, 0),
+        (2, 1, 0),
+        (1, 2, 0),
+    ]
+    # The stream holds every bar but the last one.
+    assert scanner.states[SYMBOLS[1]].stream.ohlc.shape == (4, 149)
+    assert scanner.level_cache.stats()["hits"] > 0
+
+
+def test_scan_retries_a_stock_whose_analysis_raised():
+    source = FrameSource(make_frames(150))
+    scanner = Scanner(SYMBOLS, source, cluster_backend="numpy")
+    analyse = scanner._analyse
+    calls = []
+
+    async def broken_analyse(symbol, ohlc, stream):
+        calls.append(symbol)
+        if symbol == SYMBOLS[0] and calls.count(symbol) == 1:
+            raise RuntimeError("worker died")
+        return await analyse(symbol, ohlc, stream)
+
+    scanner._analyse = broken_analyse
+
+    async def run():
+        return await scanner.scan(), await scanner.scan()
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        scanner.close()
+    assert (first["analysed"], first["failed"]) == (2, 1)
+    assert (second["analysed"], second["unchanged"], second["failed"]) == (1, 2, 0)
+    assert_same_result(scanner.states[SYMBOLS[0]].result, source.frames[SYMBOLS[0]])
+
+
+def test_scan_keeps_the_result_of_a_stock_which_could_not_be_fetched():
+    source = FrameSource(make_frames(150))
+    scanner = Scanner(SYMBOLS, source, cluster_backend="numpy")
+
+    async def run():
+        await scanner.scan()
+        del source.frames[SYMBOLS[0]]
+        return await scanner.scan()
+
+    try:
+        scan = asyncio.run(run())
+    finally:
+        scanner.close()
+    assert (scan["failed"], scan["unchanged"]) == (1, 2)
+    assert scanner.states[SYMBOLS[0]].summary["error"] is None
+
+
+@pytest.fixture(scope="module")
+def scanned():
+    frames = make_frames(150)
+    frames["EMPTY"] = frames[SYMBOLS[0]].iloc[:0]
+    scanner = Scanner(SYMBOLS + ["EMPTY"], FrameSource(frames), cluster_backend="numpy")
+    asyncio.run(scanner.scan())
+    yield scanner
+    scanner.close()
+
+
+def respond(scanner, method, target):
+    status, body = asyncio.run(scanner.respond(method, target))
+    return status, json.loads(body)
+
+
+def test_respond_signals(scanned):
+    status, body = respond(scanned, "GET", "/signals")
+    assert status == 200
+    assert body == json.loads(json.dumps(scanned.signals()))
+    assert set(body) == set(SYMBOLS) | {"EMPTY"}
+    assert "support" not in body[SYMBOLS[0]]
+    assert body["EMPTY"]["failure"] == "no_data"
+    for kind in ("buy", "sell"):
+        status, body = respond(scanned, "GET", f"/signals?kind={kind}")
+        assert status == 200
+        assert all(summary[kind] for summary in body.values())
+    assert respond(scanned, "GET", "/signals?kind=hold")[0] == 400
+
+
+def test_respond_symbols(scanned):
+    status, body = respond(scanned, "GET", f"/symbols/{SYMBOLS[0]}")
+    assert status == 200
+    assert body == scanned.states[SYMBOLS[0]].summary
+    assert body["support"] and body["resistance"]
+    assert respond(scanned, "GET", "/symbols/UNKNOWN")[0] == 404
+
+
+def test_respond_status_and_rescan(scanned):
+    scans = scanned.scans
+    status, body = respond(scanned, "GET", "/status")
+    assert status == 200
+    assert body["scans"] == scans
+    assert respond(scanned, "GET", "/rescan")[0] == 405
+    status, body = respond(scanned, "POST", "/rescan")
+    assert status == 200
+    assert body["scan"] == scans + 1
+    assert body["unchanged"] == len(scanned.symbols)
+
+
+def test_respond_errors(scanned):
+    assert respond(scanned, "POST", "/signals")[0] == 405
+    assert respond(scanned, "GET", "/unknown")[0] == 404
@@ -0,0 +1,136 @@
+"""Sending of the report emails against a local SMTP server."""
+import smtplib
+import time
+
+import pytest
+
+from benchmarks.local_smtp import LocalSMTPServer
+from utils.email_utils import EmailDispatcher, MessageTemplate, prepare_attachment, send_email_to_people
+
+SENDER = "sender@example.com"
+PASSWORD = "secret"
+RECEIPIENTS = [f"user{num}@example.com" for num in range(6)]
+
+
+@pytest.fixture
+def report(tmp_path):
+    """Get the path of a small PDF to attach."""
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4\n" + bytes(range(256)) * 16)
+    return str(path)
+
+
+def dispatcher(server, password=PASSWORD, **kwargs):
+    """Get a dispatcher sending to a local server, retrying without waiting."""
+    return EmailDispatcher(SENDER, password, host="127.0.0.1", port=server.port, use_ssl=False, backoff=0, **kwargs)
+
+
+@pytest.mark.parametrize("connections", [1, 3])
+def test_connections_are_reused_across_recipients(report, connections):
+    server = LocalSMTPServer(password=PASSWORD)
+    try:
+        failed = send_email_to_people(
+            SENDER,
+            RECEIPIENTS,
+            report,
+            password=PASSWORD,
+            host="127.0.0.1",
+            port=server.port,
+            use_ssl=False,
+            connections=connections,
+        )
+    finally:
+        server.stop()
+    assert failed == {}
+    assert server.messages == len(RECEIPIENTS)
+    assert server.logins == server.connections <= connections
+
+
+def test_transient_error_is_retried(report):
+    server = LocalSMTPServer(password=PASSWORD, transient_failures=2)
+    template = MessageTemplate(SENDER, "subject", "body", prepare_attachment(report))
+    try:
+        with dispatcher(server, retries=3) as email_dispatcher:
+            failed = email_dispatcher.send_all(RECEIPIENTS[:1], template)
+    finally:
+        server.stop()
+    assert failed == {}
+    assert server.messages == 1
+    # Every retry is made on a fresh connection.
+    assert server.connections == 3
+
+
+def test_transient_error_fails_after_retries(report):
+    server = LocalSMTPServer(password=PASSWORD, transient_failures=10)
+    template = MessageTemplate(SENDER, "subject", "body", prepare_attachment(report))
+    try:
+        with dispatcher(server, retries=2) as email_dispatcher:
+            failed = email_dispatcher.send_all(RECEIPIENTS[:1], template)
+    finally:
+        server.stop()
+    assert isinstance(failed[RECEIPIENTS[0]], smtplib.SMTPDataError)
+    assert server.messages == 0
+    assert server.connections == 3
+
+
+@pytest.mark.parametrize("connections", [1, 3])
+def test_rejected_login_fails_fast(report, connections):
+    server = LocalSMTPServer(password=PASSWORD)
+    template = MessageTemplate(SENDER, "subject", "body", prepare_attachment(report))
+    try:
+        with dispatcher(server, password="wrong", connections=connections, retries=3) as email_dispatcher:
+            with pytest.raises(smtplib.SMTPAuthenticationError):
+                email_dispatcher.send_all(RECEIPIENTS, template)
+    finally:
+        server.stop()
+    assert server.failed_logins == 1
+    assert server.logins == 0
+    assert server.messages == 0
+
+
+def test_max_per_second_throttles_sends(report):
+    server = LocalSMTPServer(password=PASSWORD)
+    template = MessageTemplate(SENDER, "subject", "body", prepare_attachment(report))
+    try:
+        with dispatcher(server, connections=2, max_per_second=20) as email_dispatcher:
+            start = time.perf_counter()
+            failed = email_dispatcher.send_all(RECEIPIENTS, template)
+            seconds = time.perf_counter() - start
+    finally:
+        server.stop()
+    assert failed == {}
+    assert server.messages == len(RECEIPIENTS)
+    # The first send goes out at once and every other one 1 / 20 s after the previous.
+    assert seconds >= (len(RECEIPIENTS) - 1) / 20
+
+
+def test_report_parts_are_sent_in_separate_emails(report, tmp_path):
+    second = tmp_path / "report_2.pdf"
+    second.write_bytes(b"%PDF-1.4\n")
+    server = LocalSMTPServer(password=PASSWORD)
+    try:
+        failed = send_email_to_people(
+            SENDER,
+            RECEIPIENTS[:2],
+            [report, str(second)],
+            password=PASSWORD,
+            host="127.0.0.1",
+            port=server.port,
+            use_ssl=False,
+        )
+        with pytest.raises(ValueError):
+            send_email_to_people(
+                SENDER,
+                RECEIPIENTS[:2],
+                [report, str(second)],
+                password=PASSWORD,
+                host="127.0.0.1",
+                port=server.port,
+                use_ssl=False,
+                max_email_bytes=1024,
+            )
+    finally:
+        server.stop()
+    assert failed == {}
+    assert server.messages == 4
+    assert server.logins == 1
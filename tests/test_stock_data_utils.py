@@ -0,0 +1,65 @@
+"""Retries of the fetches of stock data."""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_ohlcv
+from utils.data_source_utils import DataSource
+from utils.stock_data_utils import iter_stock_data_bulk
+
+
+class FailingSource(DataSource):
+    """Data source failing or returning no rows on the first requests of every stock."""
+
+    def __init__(self, failures: int, error=None, retry_empty: bool = False):
+        self.failures = failures
+        self.error = error
+        self.retry_empty = retry_empty
+        self.requests = 0
+
+    def history(self, stock_name: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        self.requests += 1
+        data_stock = make_ohlcv(50, seed=0)
+        if self.requests > self.failures:
+            return data_stock
+        if self.error is not None:
+            raise self.error
+        return data_stock.iloc[:0]
+
+
+def fetch(source):
+    """Get the data of a stock, or the error of its last attempt, retrying 3 times."""
+    [(_, data_stock, error)] = iter_stock_data_bulk(["SYN0000"], retries=3, backoff=0, source=source)
+    return data_stock if error is None else error
+
+
+def test_connection_errors_are_retried():
+    source = FailingSource(2, error=ConnectionError("reset"))
+    assert len(fetch(source)) == 50
+    assert source.requests == 3
+    source = FailingSource(10, error=ConnectionError("reset"))
+    assert isinstance(fetch(source), ConnectionError)
+    assert source.requests == 4
+
+
+@pytest.mark.parametrize("error", [FileNotFoundError("SYN0000.csv"), KeyError("Close"), ValueError("bad data")])
+def test_other_errors_are_not_retried(error):
+    source = FailingSource(1, error=error)
+    assert fetch(source) is error
+    assert source.requests == 1
+
+
+def test_empty_data_is_retried_only_for_sources_returning_it_on_failures():
+    source = FailingSource(2, retry_empty=True)
+    assert len(fetch(source)) == 50
+    assert source.requests == 3
+    source = FailingSource(10, retry_empty=True)
+    assert fetch(source).empty
+    assert source.requests == 4
+    source = FailingSource(2)
+    assert fetch(source).empty
+    assert source.requests == 1
+
+
+def test_data_source_needs_history():
+    with pytest.raises(TypeError):
+        DataSource()
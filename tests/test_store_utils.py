@@ -0,0 +1,39 @@
+"""Results added to a run of the signal store more than once."""
+import numpy as np
+
+from utils.analysis_utils import SymbolResult
+from utils.store_utils import SignalStore
+
+
+def result(support, resistance):
+    return SymbolResult(
+        "SYN0000",
+        cluster_min_prices=np.array(support),
+        cluster_max_prices=np.array(resistance),
+        rsi=np.array([50.0]),
+        close_last=100.0,
+    )
+
+
+def levels(store, run_id):
+    history = store.level_history("SYN0000")
+    history = history[history["run_id"] == run_id]
+    return list(zip(history["kind"], history["price"]))
+
+
+def test_adding_a_stock_again_replaces_its_levels(tmp_path):
+    with SignalStore(str(tmp_path / "signals.db")) as store:
+        first, second = store.start_run(), store.start_run()
+        store.add_result(first, result([90.0], [110.0]))
+        store.add_result(second, result([80.0], [120.0]))
+        store.flush()
+        # Added again after a flush, then twice within one batch.
+        store.add_result(second, result([85.0, 95.0], [105.0]))
+        store.add_result(first, result([91.0], [111.0, 115.0]))
+        store.add_result(first, result([92.0], [112.0]))
+        assert levels(store, first) == [("resistance", 112.0), ("support", 92.0)]
+        assert levels(store, second) == [("resistance", 105.0), ("support", 85.0), ("support", 95.0)]
+
+        store.add_result(second, SymbolResult("SYN0000", error="No data", failure="no_data"))
+        assert levels(store, second) == []
+        assert len(store.run_results(first)) == len(store.run_results(second)) == 1
@@ -0,0 +1,55 @@
+"""Equality of the streaming state with the batch pipeline."""
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_ohlcv
+from utils.stock_data_utils import add_rsi, get_cluster_max_prices, get_cluster_min_prices
+from utils.streaming_utils import RollingRSI, StreamingLevels
+
+
+def batch_levels(data, period, backend):
+    """Get the support and resistance levels of the batch pipeline, or None if it finds none."""
+    try:
+        return (
+            get_cluster_min_prices(data, period=period, backend=backend),
+            get_cluster_max_prices(data, period=period, backend=backend),
+        )
+    except ValueError:
+        return None
+
+
+@pytest.mark.parametrize("backend", ["numpy", "sklearn"])
+@pytest.mark.parametrize("seed", range(5))
+def test_streaming_levels_match_batch(seed, backend):
+    data = make_ohlcv(160, seed=seed)
+    state = StreamingLevels(period=5, backend=backend)
+    for num, (high, low) in enumerate(zip(data["High"], data["Low"]), 1):
+        state.update(high, low)
+        # The levels are checked on every 40th bar, and on the first ones which have too few windows.
+        if num % 40 and num > 12:
+            continue
+        expected = batch_levels(data.iloc[:num], 5, backend)
+        if expected is None:
+            with pytest.raises(ValueError):
+                state.levels()
+        else:
+            for levels, expected_levels in zip(state.levels(), expected):
+                np.testing.assert_array_equal(levels, expected_levels)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_streaming_levels_keep_max_bars(seed):
+    data = make_ohlcv(300, seed=seed)
+    state = StreamingLevels(period=5, max_bars=120, backend="numpy")
+    for high, low in zip(data["High"], data["Low"]):
+        state.update(high, low)
+    for levels, expected_levels in zip(state.levels(), batch_levels(data.iloc[-120:], 5, "numpy")):
+        np.testing.assert_array_equal(levels, expected_levels)
+
+
+def test_rolling_rsi_matches_add_rsi():
+    frames = [make_ohlcv(100, seed=seed) for seed in range(10)]
+    close = np.stack([data["Close"].to_numpy() for data in frames])
+    state = RollingRSI(len(frames))
+    rsi = np.stack([state.update(close[:, bar]) for bar in range(close.shape[1])], axis=1)
+    np.testing.assert_array_equal(rsi, np.stack([add_rsi(data)["rsi"].to_numpy() for data in frames]))
@@ -0,0 +1,381 @@
+"""Per stock support resistance analysis, run serially or across a process pool."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.data_source_utils import classify_fetch_error
+from utils.level_cache_utils import LevelCache
+from utils.panel_utils import OHLCVPanel
+from utils.profile_utils import StageTimer
+from utils.shared_memory_utils import SharedArray, SharedOHLCStore
+from utils.stock_data_utils import add_rsi, get_cluster_max_prices, get_cluster_min_prices
+
+OHLC_COLUMNS = ["Open", "High", "Low", "Close"]
+FAILURE_KINDS = ("no_data", "network", "insufficient_levels", "render", "unknown")
+
+
+@dataclass
+class SymbolResult:
+    """Result of analysing one stock.
+
+    Attributes:
+        symbol (str): Name of the stock.
+        cluster_min_prices (np.ndarray): Support levels, sorted.
+        cluster_max_prices (np.ndarray): Resistance levels, sorted.
+        rsi (np.ndarray): RSI of every bar.
+        close_last (float): Last closing price.
+        buy (list): Closing price if the stock is near its lowest support, else empty.
+        sell (list): Closing price if the stock is near its highest resistance, else empty.
+        error (str): Reason the analysis failed, None if it succeeded.
+        timings (dict): (wall time, CPU time) in seconds of each stage of the analysis.
+        skipped (bool): True if prescreen_signals ruled out both signals, in which case only close_last is set.
+        failure (str): Kind of failure, one of FAILURE_KINDS, None if the analysis succeeded.
+    """
+
+    symbol: str
+    cluster_min_prices: np.ndarray = field(default_factory=lambda: np.empty(0))
+    cluster_max_prices: np.ndarray = field(default_factory=lambda: np.empty(0))
+    rsi: np.ndarray = field(default_factory=lambda: np.empty(0))
+    close_last: float = float("nan")
+    buy: list = field(default_factory=list)
+    sell: list = field(default_factory=list)
+    error: Optional[str] = None
+    timings: dict = field(default_factory=dict)
+    skipped: bool = False
+    failure: Optional[str] = None
+
+
+def fetch_failure_result(symbol: str, error: Exception) -> SymbolResult:
+    """Get the result of a stock whose data could not be fetched.
+
+    Args:
+        symbol (str): Name of the stock.
+        error (Exception): Exception raised by the last fetch attempt.
+
+    Returns:
+        SymbolResult: Result with the error and the kind of failure set.
+    """
+    return SymbolResult(symbol, error=f"Could not fetch data: {error}", failure=classify_fetch_error(error))
+
+
+def get_buy_sell_signals(
+    close_last: float, cluster_min_prices: np.ndarray, cluster_max_prices: np.ndarray, within_support_percentage: float
+) -> Tuple[list, list]:
+    """Get buy and sell signals from the last close and the support resistance levels.
+
+    Args:
+        close_last (float): Last closing price of the stock.
+        cluster_min_prices (np.ndarray): Support levels, sorted.
+        cluster_max_prices (np.ndarray): Resistance levels, sorted.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+
+    Returns:
+        Tuple[list, list]: Buy and sell lists, each holding the closing price when its signal triggers.
+    """
+    delta = close_last * (within_support_percentage / 100)
+    buy, sell = [], []
+    if cluster_min_prices[0] > (close_last - delta) and cluster_min_prices[0] < (close_last + delta):
+        buy.append(close_last)
+    if cluster_max_prices[-1] > (close_last - delta) and cluster_max_prices[-1] < (close_last + delta):
+        sell.append(close_last)
+    return buy, sell
+
+
+def _frequent_extremes(prices: np.ndarray, period: int, min_count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Get the lowest and highest windowed maxima repeated at least min_count times, along the last axis.
+
+    Returns whether any maximum is repeated enough, the lowest and the highest such maximum.
+    """
+    num_windows = prices.shape[-1] - period - 1
+    maxima = np.sort(sliding_window_view(prices, period, axis=-1)[..., :num_windows, :].max(axis=-1), axis=-1)
+    # In sorted maxima a value is repeated min_count times when it equals the value min_count - 1 places before.
+    tail = maxima[..., min_count - 1 :]
+    repeated = tail == maxima[..., : maxima.shape[-1] - min_count + 1]
+    return (
+        repeated.any(axis=-1),
+        np.where(repeated, tail, np.inf).min(axis=-1),
+        np.where(repeated, tail, -np.inf).max(axis=-1),
+    )
+
+
+def prescreen_signals(
+    ohlc: np.ndarray,
+    period: int,
+    within_support_percentage: float,
+    min_count: int = 5,
+    bars: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the stocks whose buy or sell signal can trigger, without clustering.
+
+    The levels are clustered from the frequent prices: the windowed maxima repeated at least
+    min_count times within their partition. Both partition backends give equal prices the same
+    label, so these are the windowed maxima repeated min_count times overall. Each level is the
+    maximum (resistance) or minimum (support) of a cluster of them, so the highest resistance is
+    the highest frequent maximum of the High prices and the lowest support the lowest frequent
+    maximum of the Low prices. Comparing those with the close as get_buy_sell_signals does never
+    rules out a signal the full analysis would give. Stocks with too few bars, missing prices or
+    no frequent price are kept, so that the full analysis reports them.
+
+    Args:
+        ohlc (np.ndarray): Array of shape (..., 4, bars) holding Open, High, Low and Close prices, oldest first,
+                           for one stock or a batch of stocks.
+        period (int): Window period for gathering prices.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+        min_count (int, optional): Minimum number of repeats of a frequent price. Defaults to 5.
+        bars (np.ndarray, optional): Number of bars of every stock, of shape ohlc.shape[:-2], when the stocks of
+                                     a batch are NaN padded on the left to the same length, as OHLCVPanel.packed
+                                     returns them. Defaults to every column being a bar.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Whether the buy signal and the sell signal can trigger, of shape ohlc.shape[:-2].
+    """
+    ohlc = np.asarray(ohlc, dtype=float)
+    shape = ohlc.shape[:-2]
+    if ohlc.shape[-1] - period - 1 < min_count:
+        return np.ones(shape, dtype=bool), np.ones(shape, dtype=bool)
+    bars = np.full(shape, ohlc.shape[-1]) if bars is None else np.asarray(bars)
+    high, low, close_last = ohlc[..., 1, :], ohlc[..., 2, :], ohlc[..., 3, -1]
+    delta = close_last * (within_support_percentage / 100)
+    # Windows reaching into the padding have a NaN maximum, which never counts as repeated.
+    has_support, support, _ = _frequent_extremes(low, period, min_count)
+    has_resistance, _, resistance = _frequent_extremes(high, period, min_count)
+    is_bar = np.arange(ohlc.shape[-1]) >= ohlc.shape[-1] - bars[..., np.newaxis]
+    incomplete = (bars - period - 1 < min_count) | (np.isnan(ohlc[..., 1:, :]).any(axis=-2) & is_bar).any(axis=-1)
+    may_buy = incomplete | ~has_support | ((support > (close_last - delta)) & (support < (close_last + delta)))
+    may_sell = (
+        incomplete | ~has_resistance | ((resistance > (close_last - delta)) & (resistance < (close_last + delta)))
+    )
+    return may_buy, may_sell
+
+
+def prescreen_panel(
+    panel: OHLCVPanel, period: int, within_support_percentage: float, min_count: int = 5
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the stocks of a panel whose buy or sell signal can trigger, in one pass over all of them.
+
+    Args:
+        panel (OHLCVPanel): Prices of the stocks.
+        period (int): Window period for gathering prices.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+        min_count (int, optional): Minimum number of repeats of a frequent price. Defaults to 5.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Whether the buy signal and the sell signal of each stock can trigger.
+    """
+    ohlc = panel.packed_fields(OHLC_COLUMNS)
+    return prescreen_signals(ohlc, period, within_support_percentage, min_count, bars=panel.bar_counts())
+
+
+def analyse_stock(
+    symbol: str,
+    ohlc: Union[np.ndarray, SharedArray],
+    period: int,
+    within_support_percentage: float,
+    cluster_backend: str = "sklearn",
+    level_cache: Optional[LevelCache] = None,
+) -> SymbolResult:
+    """Compute RSI, support resistance levels and buy sell signals of a stock.
+
+    Takes plain arrays rather than a dataframe so that it is cheap to send to a worker process,
+    or the location of the array in shared memory so that the prices are not sent at all.
+
+    Args:
+        symbol (str): Name of the stock.
+        ohlc (Union[np.ndarray, SharedArray]): Array of shape (4, bars) holding Open, High, Low and Close prices,
+                                               oldest first, or its location in shared memory.
+        period (int): Window period for gathering prices.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+        cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        level_cache (LevelCache, optional): Cache the levels are looked up in and added to, None to always
+                                            cluster. Defaults to None.
+
+    Returns:
+        SymbolResult: Result of the analysis, with the error set if no levels could be found.
+    """
+    if isinstance(ohlc, SharedArray):
+        ohlc = ohlc.view()
+    if ohlc.shape[-1] == 0:
+        return SymbolResult(symbol, error="No data was returned for the stock.", failure="no_data")
+    timer = StageTimer()
+    try:
+        with timer.stage("add_rsi"):
+            data = add_rsi(pd.DataFrame(dict(zip(OHLC_COLUMNS, ohlc))))
+        with timer.stage("cluster_max_prices"):
+            if level_cache is None:
+                cluster_max_prices = get_cluster_max_prices(data, period=period, backend=cluster_backend)
+            else:
+                cluster_max_prices = level_cache.get_cluster_max_prices(symbol, data, period, cluster_backend)
+        with timer.stage("cluster_min_prices"):
+            if level_cache is None:
+                cluster_min_prices = get_cluster_min_prices(data, period=period, backend=cluster_backend)
+            else:
+                cluster_min_prices = level_cache.get_cluster_min_prices(symbol, data, period, cluster_backend)
+        close_last = data["Close"].iloc[-1]
+        buy, sell = get_buy_sell_signals(close_last, cluster_min_prices, cluster_max_prices, within_support_percentage)
+    except ValueError:
+        return SymbolResult(
+            symbol,
+            error="No proper support resistance values could be found for the given period.",
+            timings=timer.timings,
+            failure="insufficient_levels",
+        )
+    except Exception as error:
+        return SymbolResult(symbol, error=repr(error), timings=timer.timings, failure="unknown")
+    return SymbolResult(
+        symbol,
+        cluster_min_prices=cluster_min_prices,
+        cluster_max_prices=cluster_max_prices,
+        rsi=data["rsi"].to_numpy(),
+        close_last=close_last,
+        buy=buy,
+        sell=sell,
+        timings=timer.timings,
+    )
+
+
+def analyse_stock_with_cache(
+    symbol: str,
+    ohlc: Union[np.ndarray, SharedArray],
+    period: int,
+    within_support_percentage: float,
+    cluster_backend: str,
+    level_cache: LevelCache,
+) -> Tuple[SymbolResult, LevelCache]:
+    """Analyse a stock in a worker process with the cached levels of the stock.
+
+    Args:
+        symbol (str): Name of the stock.
+        ohlc (Union[np.ndarray, SharedArray]): Prices as taken by analyse_stock.
+        period (int): Window period for gathering prices.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+        cluster_backend (str): Clustering backend, 'sklearn' or 'numpy'.
+        level_cache (LevelCache): Entries of the stock, as returned by LevelCache.subset.
+
+    Returns:
+        Tuple[SymbolResult, LevelCache]: Result of the analysis and the updated cache, to merge into the main one.
+    """
+    result = analyse_stock(symbol, ohlc, period, within_support_percentage, cluster_backend, level_cache)
+    return result, level_cache
+
+
+def to_ohlc_array(data_stock: pd.DataFrame) -> np.ndarray:
+    """Get the Open, High, Low and Close prices of stock data as one array.
+
+    Args:
+        data_stock (pd.DataFrame): Stock data.
+
+    Returns:
+        np.ndarray: Float array of shape (4, bars).
+    """
+    return data_stock.reindex(columns=OHLC_COLUMNS).to_numpy(dtype=float).T.copy()
+
+
+def analyse_stocks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    period: int = 5,
+    within_support_percentage: float = 2,
+    workers: int = 1,
+    cluster_backend: str = "sklearn",
+    level_cache: Optional[LevelCache] = None,
+    prescreen: bool = False,
+    shared_memory: bool = False,
+) -> Iterator[Tuple[str, pd.DataFrame, SymbolResult]]:
+    """Analyse many stocks, yielding results in the order the stocks come in.
+
+    With more than one worker the stocks are analysed in a process pool. Only the OHLC arrays
+    are sent to the workers, or with shared_memory only their location in a SharedOHLCStore,
+    and at most 2*workers stocks are in flight at once. Workers get the cached levels of their
+    stock only and send back the updated entries. With prescreen, every stock is fetched first and
+    screened in one pass over an OHLCVPanel of their prices, then stocks which prescreen_panel rules
+    out are not analysed and get a skipped result.
+
+    Args:
+        stock_data (Iterable): (stock name, data, fetch error) tuples, as yielded by iter_stock_data_bulk.
+        period (int, optional): Window period for gathering prices. Defaults to 5.
+        within_support_percentage (float, optional): Distance from a level, in percent of the close,
+                                                     which triggers a signal. Defaults to 2.
+        workers (int, optional): Number of worker processes, 1 to analyse in this process. Defaults to 1.
+        cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        level_cache (LevelCache, optional): Cache of the levels, None to always cluster. Defaults to None.
+        prescreen (bool, optional): Skip the stocks which cannot trigger a signal. Defaults to False.
+        shared_memory (bool, optional): Hand the prices to the workers through a SharedOHLCStore instead of
+                                        pickling them. Defaults to False.
+
+    Yields:
+        Tuple[str, pd.DataFrame, SymbolResult]: Stock name, its data and the result of its analysis.
+    """
+    skipped = {}
+    if prescreen:
+        stock_data, skipped = _prescreen_stocks(stock_data, period, within_support_percentage)
+    if workers <= 1:
+        for symbol, data_stock, error in stock_data:
+            if error is not None:
+                yield symbol, data_stock, fetch_failure_result(symbol, error)
+            elif symbol in skipped:
+                yield symbol, data_stock, SymbolResult(symbol, close_last=skipped[symbol], skipped=True)
+            else:
+                ohlc = to_ohlc_array(data_stock)
+                result = analyse_stock(symbol, ohlc, period, within_support_percentage, cluster_backend, level_cache)
+                yield symbol, data_stock, result
+        return
+
+    store = SharedOHLCStore() if shared_memory else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for symbol, data_stock, error in stock_data:
+                if error is not None:
+                    pending.append((symbol, data_stock, fetch_failure_result(symbol, error)))
+                elif symbol in skipped:
+                    pending.append((symbol, data_stock, SymbolResult(symbol, close_last=skipped[symbol], skipped=True)))
+                else:
+                    ohlc = to_ohlc_array(data_stock)
+                    prices = ohlc if store is None else store.add(symbol, ohlc)
+                    arguments = (symbol, prices, period, within_support_percentage, cluster_backend)
+                    if level_cache is None:
+                        future = executor.submit(analyse_stock, *arguments)
+                    else:
+                        future = executor.submit(analyse_stock_with_cache, *arguments, level_cache.subset(symbol))
+                    pending.append((symbol, data_stock, future))
+                while len(pending) > 2 * workers:
+                    yield _pop_result(pending, level_cache)
+            while pending:
+                yield _pop_result(pending, level_cache)
+    finally:
+        # The workers have exited, so nothing maps the segments any more.
+        if store is not None:
+            store.close()
+
+
+def _prescreen_stocks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]], period: int, within_support_percentage: float
+) -> Tuple[list, dict]:
+    """Fetch every stock and find the ones which cannot trigger a signal with prescreen_panel.
+
+    Returns the fetched stocks and the last close of every stock to skip, keyed by stock name.
+    """
+    stock_data = list(stock_data)
+    frames = {symbol: data_stock for symbol, data_stock, error in stock_data if error is None and len(data_stock)}
+    panel = OHLCVPanel.from_frames(frames)
+    may_buy, may_sell = prescreen_panel(panel, period, within_support_percentage)
+    # The panel drops the bars without a close, the full analysis of such a stock is left to decide.
+    complete = panel.bar_counts() == np.array([len(frames[symbol]) for symbol in panel.symbols], dtype=int)
+    skip = complete & ~may_buy & ~may_sell
+    close_last = panel.last_close()
+    return stock_data, {symbol: close_last[row] for row, symbol in enumerate(panel.symbols) if skip[row]}
+
+
+def _pop_result(pending: deque, level_cache: Optional[LevelCache] = None) -> Tuple[str, pd.DataFrame, SymbolResult]:
+    """Wait for the oldest pending analysis and return it, merging the levels it cached."""
+    symbol, data_stock, result = pending.popleft()
+    if not isinstance(result, SymbolResult):
+        result = result.result()
+        if level_cache is not None:
+            result, symbol_cache = result
+            level_cache.merge(symbol_cache)
+    return symbol, data_stock, result
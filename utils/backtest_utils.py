@@ -0,0 +1,289 @@
+"""Walk forward backtest of the support resistance buy sell signals."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis_utils import get_buy_sell_signals
+from utils.stock_data_utils import get_cluster_levels, windowed_extrema
+
+
+def get_window_bounds(index: pd.DatetimeIndex, evaluation_dates: Sequence, days: int) -> np.ndarray:
+    """Get the bars get_stock_data would return on each evaluation date.
+
+    On an evaluation date the analysis sees the bars from the date days calendar days earlier,
+    included, to the evaluation date, excluded.
+
+    Args:
+        index (pd.DatetimeIndex): Dates of the full history of a stock, oldest first.
+        evaluation_dates (Sequence): Dates on which the analysis is run.
+        days (int): Number of past days fetched by the analysis.
+
+    Returns:
+        np.ndarray: Array of shape (dates, 2) with the first and one past the last bar of each window.
+    """
+    bounds = np.empty((len(evaluation_dates), 2), dtype=np.int64)
+    for num, date in enumerate(evaluation_dates):
+        begin = (pd.Timestamp(date) - pd.DateOffset(days)).strftime("%Y-%m-%d")
+        end = pd.Timestamp(date).strftime("%Y-%m-%d")
+        bounds[num, 0] = index.searchsorted(pd.Timestamp(begin, tz=index.tz), side="left")
+        bounds[num, 1] = index.searchsorted(pd.Timestamp(end, tz=index.tz), side="left")
+    return bounds
+
+
+def backtest_stock(
+    symbol: str,
+    hlc: np.ndarray,
+    bounds: np.ndarray,
+    period: int,
+    within_support_percentage: float,
+    horizons: Sequence[int],
+    cluster_backend: str = "sklearn",
+    n_clusters: int = 5,
+    bandwidth: float = 10,
+) -> List[tuple]:
+    """Evaluate the signals of a stock over many windows of its history.
+
+    The windowed maxima are computed once over the whole history and every window takes its
+    slice of them, which is what get_cluster_max_prices and get_cluster_min_prices would
+    compute on the window alone. Windows without proper support resistance levels are skipped.
+
+    Args:
+        symbol (str): Name of the stock.
+        hlc (np.ndarray): Array of shape (3, bars) holding High, Low and Close prices, oldest first.
+        bounds (np.ndarray): First and one past the last bar of each window, as returned by get_window_bounds.
+        period (int): Window period for gathering prices.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+        horizons (Sequence[int]): Numbers of bars after the last bar of a window at which returns are measured.
+        cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+    Returns:
+        List[tuple]: (symbol, window number, close, buy, sell, return at each horizon) of every evaluated window.
+    """
+    high, low, close = hlc
+    num_windows = max(len(close) - period + 1, 0)
+    high_maxima = windowed_extrema(high, period, num_windows, kind="max")
+    low_maxima = windowed_extrema(low, period, num_windows, kind="max")
+
+    records = []
+    for num, (first, stop) in enumerate(bounds):
+        if stop - first - period - 1 <= 0:
+            continue
+        try:
+            cluster_max_prices = get_cluster_levels(
+                high_maxima[first : stop - period - 1],
+                high[first:stop],
+                np.maximum,
+                cluster_backend,
+                n_clusters,
+                bandwidth,
+            )
+            cluster_min_prices = get_cluster_levels(
+                low_maxima[first : stop - period - 1],
+                low[first:stop],
+                np.minimum,
+                cluster_backend,
+                n_clusters,
+                bandwidth,
+            )
+        except ValueError:
+            continue
+        close_last = close[stop - 1]
+        buy, sell = get_buy_sell_signals(close_last, cluster_min_prices, cluster_max_prices, within_support_percentage)
+        returns = [
+            close[stop - 1 + horizon] / close_last - 1 if stop - 1 + horizon < len(close) else np.nan
+            for horizon in horizons
+        ]
+        records.append((symbol, num, close_last, bool(buy), bool(sell), *returns))
+    return records
+
+
+def backtest_stocks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    evaluation_dates: Sequence,
+    days: int = 200,
+    period: int = 5,
+    within_support_percentage: float = 2,
+    horizons: Sequence[int] = (5, 20),
+    workers: int = 1,
+    cluster_backend: str = "sklearn",
+    dates_per_task: int = 50,
+    n_clusters: int = 5,
+    bandwidth: float = 10,
+) -> pd.DataFrame:
+    """Backtest the signals of many stocks on many dates.
+
+    Each stock is split into tasks of dates_per_task consecutive evaluation dates, so that both
+    stocks and dates are spread over the worker processes. A stock whose backtest raised is
+    reported and left out, like a stock which could not be fetched.
+
+    Args:
+        stock_data (Iterable): (stock name, full history, fetch error) tuples, as yielded by iter_stock_data_bulk.
+        evaluation_dates (Sequence): Dates on which the analysis is run.
+        days (int, optional): Number of past days fetched by the analysis. Defaults to 200.
+        period (int, optional): Window period for gathering prices. Defaults to 5.
+        within_support_percentage (float, optional): Distance from a level, in percent of the close,
+                                                     which triggers a signal. Defaults to 2.
+        horizons (Sequence[int], optional): Numbers of bars after the evaluation at which returns are measured.
+                                            Defaults to (5, 20).
+        workers (int, optional): Number of worker processes, 1 to run serially. Defaults to 1.
+        cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        dates_per_task (int, optional): Number of evaluation dates per task. Defaults to 50.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+    Returns:
+        pd.DataFrame: One row per evaluated stock and date with the close, buy and sell signals and
+            the returns at each horizon.
+    """
+    evaluation_dates = list(evaluation_dates)
+    columns = ["symbol", "date", "close", "buy", "sell"] + [f"return_{horizon}" for horizon in horizons]
+    records = []
+    failed = set()
+    for symbol, date_numbers, result in _run_tasks(
+        stock_data,
+        evaluation_dates,
+        days,
+        period,
+        within_support_percentage,
+        horizons,
+        workers,
+        cluster_backend,
+        dates_per_task,
+        n_clusters,
+        bandwidth,
+    ):
+        if isinstance(result, Exception):
+            if symbol not in failed:
+                print(f"Could not backtest {symbol}: {result!r}")
+            failed.add(symbol)
+            continue
+        if symbol in failed:
+            continue
+        for record in result:
+            records.append((record[0], evaluation_dates[date_numbers[record[1]]]) + record[2:])
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def _iter_tasks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    evaluation_dates: list,
+    days: int,
+    horizons: Sequence[int],
+    dates_per_task: int,
+) -> Iterator[Tuple[str, np.ndarray, Optional[np.ndarray], object]]:
+    """Split the stocks into (stock name, date numbers, prices, window bounds or fetch error) tasks.
+
+    Every task only gets the bars its windows and the returns after them need.
+    """
+    for symbol, data_stock, error in stock_data:
+        if error is None:
+            try:
+                hlc = data_stock[["High", "Low", "Close"]].to_numpy(dtype=float).T.copy()
+                bounds = get_window_bounds(data_stock.index, evaluation_dates, days)
+            except Exception as data_error:
+                error = data_error
+        if error is not None:
+            yield symbol, np.empty(0, dtype=np.int64), None, error
+            continue
+        for start in range(0, len(evaluation_dates), dates_per_task):
+            date_numbers = np.arange(start, min(start + dates_per_task, len(evaluation_dates)))
+            first = bounds[date_numbers, 0].min()
+            stop = min(bounds[date_numbers, 1].max() + max(horizons, default=0), hlc.shape[1])
+            yield symbol, date_numbers, hlc[:, first:stop], bounds[date_numbers] - first
+
+
+def _run_tasks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    evaluation_dates: list,
+    days: int,
+    period: int,
+    within_support_percentage: float,
+    horizons: Sequence[int],
+    workers: int,
+    cluster_backend: str,
+    dates_per_task: int,
+    n_clusters: int,
+    bandwidth: float,
+) -> Iterator[Tuple[str, np.ndarray, object]]:
+    """Run the backtest tasks, yielding (stock name, date numbers, records or error) in task order.
+
+    The exception raised by the backtest of a task is yielded in place of its records.
+    """
+    tasks = _iter_tasks(stock_data, evaluation_dates, days, horizons, dates_per_task)
+    arguments = (period, within_support_percentage, tuple(horizons), cluster_backend, n_clusters, bandwidth)
+    if workers <= 1:
+        for symbol, date_numbers, hlc, bounds in tasks:
+            if hlc is None:
+                yield symbol, date_numbers, bounds
+                continue
+            try:
+                result = backtest_stock(symbol, hlc, bounds, *arguments)
+            except Exception as error:
+                result = error
+            yield symbol, date_numbers, result
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for symbol, date_numbers, hlc, bounds in tasks:
+            if hlc is None:
+                pending.append((symbol, date_numbers, bounds))
+            else:
+                try:
+                    future = executor.submit(backtest_stock, symbol, hlc, bounds, *arguments)
+                except BrokenProcessPool as error:
+                    future = error
+                pending.append((symbol, date_numbers, future))
+            while len(pending) > 2 * workers:
+                yield _pop_task(pending)
+        while pending:
+            yield _pop_task(pending)
+
+
+def _pop_task(pending: deque) -> Tuple[str, np.ndarray, object]:
+    """Wait for the oldest pending task and return it, with the exception it raised in place of its records."""
+    symbol, date_numbers, result = pending.popleft()
+    if not isinstance(result, (list, Exception)):
+        try:
+            result = result.result()
+        except Exception as error:
+            result = error
+    return symbol, date_numbers, result
+
+
+def summarise_backtest(evaluations: pd.DataFrame, horizons: Sequence[int] = (5, 20)) -> pd.DataFrame:
+    """Get hit rate and return statistics of the buy and sell signals.
+
+    A buy signal is a hit when the price rises over the horizon and a sell signal when it falls.
+    Returns are those of following the signal, long for buy and short for sell. Signals too
+    close to the end of the history to measure a horizon are left out of its statistics.
+
+    Args:
+        evaluations (pd.DataFrame): Evaluations as returned by backtest_stocks.
+        horizons (Sequence[int], optional): Horizons the evaluations hold returns for. Defaults to (5, 20).
+
+    Returns:
+        pd.DataFrame: Statistics indexed by signal, BUY and SELL.
+    """
+    summary = {}
+    for signal, column, direction in (("BUY", "buy", 1), ("SELL", "sell", -1)):
+        signals = evaluations[evaluations[column]]
+        row = {
+            "evaluations": len(evaluations),
+            "signals": len(signals),
+            "stocks": signals["symbol"].nunique(),
+        }
+        for horizon in horizons:
+            returns = direction * signals[f"return_{horizon}"].dropna()
+            row[f"measured_{horizon}"] = len(returns)
+            row[f"hit_rate_{horizon}"] = (returns > 0).mean() if len(returns) else np.nan
+            row[f"mean_return_{horizon}"] = returns.mean()
+            row[f"median_return_{horizon}"] = returns.median()
+        summary[signal] = row
+    return pd.DataFrame.from_dict(summary, orient="index")
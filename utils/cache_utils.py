@@ -0,0 +1,270 @@
+"""On-disk cache of historical stock data with incremental top-up fetches."""
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.data_source_utils import DataSource
+
+# Fraction of max_bytes the cache is brought down to when it grows above max_bytes.
+EVICT_TO_FRACTION = 0.9
+
+
+class OHLCVCache:
+    """Columnar on-disk store of stock data keyed by stock name and interval.
+
+    Every entry lives in <root>/<interval>/<stock_name>/ as one .npy file per column plus the
+    date index, so columns can be memory-mapped instead of parsed. A meta.json file records
+    the column names, the time zone, the date range the entry covers and when it was fetched.
+    The modification time of meta.json tracks the last access for eviction. The size of every
+    entry is kept in memory, so the cache directory is only scanned when the cache is opened
+    and when it grows above max_bytes. Entries being stored by a thread are never evicted.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 500 * 1024 * 1024):
+        """Create a cache rooted at a directory.
+
+        Args:
+            root (str): Directory in which the cache is stored.
+            max_bytes (int, optional): Size of the cache on disk above which least recently used
+                                       entries are evicted. Defaults to 500 MB.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "top_ups": 0, "misses": 0, "evictions": 0, "rows_fetched": 0, "rows_served": 0}
+        self._lock = threading.Lock()
+        # Number of stores in flight per entry directory, which evict leaves alone.
+        self._storing = {}
+        os.makedirs(root, exist_ok=True)
+        self._sizes = {entry_dir: size for _, size, entry_dir in self._entries()}
+        self._bytes = sum(self._sizes.values())
+
+    def _entry_dir(self, stock_name: str, interval: str) -> str:
+        return os.path.join(self.root, interval, stock_name)
+
+    def count(self, counter: str, value: int = 1) -> None:
+        """Increase one of the cache counters.
+
+        Args:
+            counter (str): Name of the counter.
+            value (int, optional): Amount to add. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[counter] += value
+
+    def load(self, stock_name: str, interval: str) -> Optional[tuple]:
+        """Load a cached entry.
+
+        Args:
+            stock_name (str): Name of the stock.
+            interval (str): Interval between data points.
+
+        Returns:
+            Optional[tuple]: Cached dataframe and its meta data, or None if the entry is missing or incomplete.
+        """
+        entry_dir = self._entry_dir(stock_name, interval)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        try:
+            with open(meta_path) as meta_file:
+                meta = json.load(meta_file)
+            index = np.load(os.path.join(entry_dir, "index.npy"), mmap_mode="r")
+            columns = {
+                name: np.load(os.path.join(entry_dir, f"col_{num}.npy"), mmap_mode="r")
+                for num, name in enumerate(meta["columns"])
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        if any(len(values) != len(index) for values in columns.values()):
+            return None
+        os.utime(meta_path)
+        date_index = pd.DatetimeIndex(pd.to_datetime(np.asarray(index), utc=True), name=meta["index_name"])
+        date_index = date_index.tz_convert(meta["tz"]).as_unit(meta["unit"])
+        data_stock = pd.DataFrame(columns, index=date_index)
+        return data_stock, meta
+
+    def store(self, stock_name: str, interval: str, data_stock: pd.DataFrame, start: str, end: str) -> None:
+        """Store an entry, replacing any previous one, and evict old entries if the cache is too big.
+
+        Args:
+            stock_name (str): Name of the stock.
+            interval (str): Interval between data points.
+            data_stock (pd.DataFrame): Stock data to store.
+            start (str): First date covered by the data, formatted as YYYY-MM-DD.
+            end (str): Date up to which the data is complete (exclusive), formatted as YYYY-MM-DD.
+        """
+        entry_dir = self._entry_dir(stock_name, interval)
+        with self._lock:
+            self._storing[entry_dir] = self._storing.get(entry_dir, 0) + 1
+        try:
+            size = self._write_entry(entry_dir, data_stock, start, end)
+        finally:
+            with self._lock:
+                self._storing[entry_dir] -= 1
+                if not self._storing[entry_dir]:
+                    del self._storing[entry_dir]
+        with self._lock:
+            self._bytes += size - self._sizes.get(entry_dir, 0)
+            self._sizes[entry_dir] = size
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _write_entry(self, entry_dir: str, data_stock: pd.DataFrame, start: str, end: str) -> int:
+        """Write the files of an entry, returning its size in bytes."""
+        os.makedirs(entry_dir, exist_ok=True)
+        index = data_stock.index
+        tz = str(index.tz) if index.tz is not None else "UTC"
+        utc_index = index.tz_convert("UTC") if index.tz is not None else index
+        self._write_array(entry_dir, "index.npy", utc_index.as_unit("ns").asi8)
+        for num, name in enumerate(data_stock.columns):
+            self._write_array(entry_dir, f"col_{num}.npy", data_stock[name].to_numpy())
+        meta = {
+            "columns": list(data_stock.columns),
+            "index_name": index.name,
+            "tz": tz,
+            "unit": index.unit,
+            "start": start,
+            "end": end,
+            "fetched_at": time.time(),
+        }
+        tmp_path = os.path.join(entry_dir, "meta.json.tmp")
+        with open(tmp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, os.path.join(entry_dir, "meta.json"))
+        return sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+
+    @staticmethod
+    def _write_array(entry_dir: str, name: str, values: np.ndarray) -> None:
+        tmp_path = os.path.join(entry_dir, name + ".tmp")
+        with open(tmp_path, "wb") as array_file:
+            np.save(array_file, values)
+        os.replace(tmp_path, os.path.join(entry_dir, name))
+
+    def _entries(self) -> list:
+        """Get every entry in the cache as (last access time, size in bytes, directory)."""
+        entries = []
+        for interval in os.listdir(self.root):
+            interval_dir = os.path.join(self.root, interval)
+            if not os.path.isdir(interval_dir):
+                continue
+            for stock_name in os.listdir(interval_dir):
+                entry_dir = os.path.join(interval_dir, stock_name)
+                try:
+                    accessed = os.path.getmtime(os.path.join(entry_dir, "meta.json"))
+                    size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+                except OSError:
+                    continue
+                entries.append((accessed, size, entry_dir))
+        return entries
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in 90% of max_bytes.
+
+        The cache directory is scanned for the access times, which also picks up entries
+        written or removed by other processes. Leaving a tenth of max_bytes free means a cache
+        kept full does not scan again on every store. Entries which are being stored are skipped,
+        as removing their directory would fail the store or leave it incomplete.
+        """
+        with self._lock:
+            entries = sorted(self._entries())
+            self._sizes = {entry_dir: size for _, size, entry_dir in entries}
+            self._bytes = sum(self._sizes.values())
+            for _, size, entry_dir in entries:
+                if self._bytes <= EVICT_TO_FRACTION * self.max_bytes:
+                    break
+                if entry_dir in self._storing:
+                    continue
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                del self._sizes[entry_dir]
+                self._bytes -= size
+                self.counters["evictions"] += 1
+
+    def stats(self) -> dict:
+        """Get statistics of the cache.
+
+        Returns:
+            dict: Request counters plus the number of entries and bytes on disk.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._sizes)
+            stats["bytes"] = self._bytes
+        return stats
+
+    def report(self) -> str:
+        """Get a human readable summary of the cache statistics.
+
+        Returns:
+            str: Summary of the cache statistics.
+        """
+        stats = self.stats()
+        requests = stats["hits"] + stats["top_ups"] + stats["misses"]
+        saved = stats["rows_served"] / stats["rows_fetched"] if stats["rows_fetched"] else float("inf")
+        return (
+            f"Cache: {requests} requests, {stats['hits']} hits, {stats['top_ups']} top-ups, "
+            f"{stats['misses']} misses, {stats['evictions']} evictions. "
+            f"Rows fetched: {stats['rows_fetched']}, rows served: {stats['rows_served']} ({saved:.1f}x). "
+            f"{stats['entries']} entries using {stats['bytes'] / 1024 / 1024:.1f} MB."
+        )
+
+
+class CachedDataSource(DataSource):
+    """Data source serving requests from an OHLCVCache and fetching only missing bars upstream.
+
+    A request is answered from the cache alone when the cached entry covers the requested
+    dates, or when it was fetched less than ttl seconds ago. Otherwise only the bars from the
+    last cached date onwards are fetched and merged in; the last cached bar is fetched again
+    since it may have been incomplete when it was stored.
+    """
+
+    def __init__(self, upstream: DataSource, cache: OHLCVCache, ttl: float = 3600.0):
+        """Create a cached data source.
+
+        Args:
+            upstream (DataSource): Source used for data missing from the cache.
+            cache (OHLCVCache): Cache holding previously fetched data.
+            ttl (float, optional): Seconds for which a cached entry is served without a top-up. Defaults to 1 hour.
+        """
+        self.upstream = upstream
+        self.cache = cache
+        self.ttl = ttl
+        self.retry_empty = upstream.retry_empty
+
+    def history(self, stock_name: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        """Get historical data for a stock, fetching upstream only what the cache is missing."""
+        cached = self.cache.load(stock_name, interval)
+        if cached is None or start < cached[1]["start"] or len(cached[0]) == 0:
+            data_stock = self.upstream.history(stock_name, start=start, end=end, interval=interval)
+            self.cache.count("misses")
+            self.cache.count("rows_fetched", len(data_stock))
+            if len(data_stock):
+                self.cache.store(stock_name, interval, data_stock, start=start, end=end)
+        else:
+            data_stock, meta = cached
+            if end <= meta["end"] or time.time() - meta["fetched_at"] < self.ttl:
+                self.cache.count("hits")
+            else:
+                last = data_stock.index[-1]
+                new_data = self.upstream.history(
+                    stock_name, start=last.strftime("%Y-%m-%d"), end=end, interval=interval
+                )
+                self.cache.count("top_ups")
+                self.cache.count("rows_fetched", len(new_data))
+                if len(new_data):
+                    old_data = data_stock[data_stock.index < new_data.index[0]]
+                    data_stock = pd.concat([old_data, new_data.reindex(columns=data_stock.columns)])
+                self.cache.store(stock_name, interval, data_stock, start=meta["start"], end=end)
+
+        if len(data_stock) == 0:
+            return data_stock
+        tz = data_stock.index.tz
+        begin = pd.Timestamp(start, tz=tz)
+        finish = pd.Timestamp(end, tz=tz)
+        data_stock = data_stock[(data_stock.index >= begin) & (data_stock.index < finish)]
+        self.cache.count("rows_served", len(data_stock))
+        return data_stock
@@ -0,0 +1,129 @@
+"""Durable per stock checkpoint of a scan, so that a scan which died can be resumed."""
+import json
+import os
+from typing import Dict, Optional
+
+
+class ScanCheckpoint:
+    """Append only JSON lines record of the stocks a scan has finished.
+
+    The first line holds the parameters of the scan. Every stock then gets one line when it is
+    finished, with its buy and sell lists, or with the kind of failure and the error if it
+    failed. Every line is flushed and fsynced before the next stock is recorded, so a crash
+    loses at most the line being written, which is dropped on resuming. When a stock appears
+    more than once, as after a resumed scan retried it, its last line counts.
+    """
+
+    def __init__(self, path: str, parameters: dict, resume: bool = False):
+        """Start a new checkpoint, or continue the one in path.
+
+        Args:
+            path (str): JSON lines file of the checkpoint.
+            parameters (dict): JSON serializable parameters of the scan. A checkpoint is only resumed by a scan
+                               with the same parameters.
+            resume (bool, optional): Continue the checkpoint in path if it exists instead of starting over.
+                                     Defaults to False.
+
+        Raises:
+            ValueError: If the checkpoint to resume was written by a scan with other parameters.
+        """
+        self.path = path
+        self.parameters = parameters
+        self.records: Dict[str, dict] = {}
+        if resume and os.path.exists(path):
+            saved_parameters = self._read()
+            if saved_parameters != parameters:
+                raise ValueError(
+                    f"{path} was written by a scan with parameters {saved_parameters}, not {parameters}. "
+                    "Run without --resume to start over."
+                )
+            self._file = open(path, "a")
+        else:
+            self._file = open(path, "w")
+            self._write({"parameters": parameters})
+
+    def _read(self) -> Optional[dict]:
+        """Read the records of the checkpoint file and return its parameters.
+
+        A last line cut short by a crash is removed, so that new records start on a line of their own.
+        """
+        parameters = None
+        with open(self.path, "rb+") as file:
+            complete = 0
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                complete += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if "parameters" in record:
+                    parameters = record["parameters"]
+                else:
+                    self.records[record["symbol"]] = record
+            file.truncate(complete)
+        return parameters
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def completed(self) -> Dict[str, dict]:
+        """Get the records of the stocks which were finished without failure, keyed by stock name."""
+        return {symbol: record for symbol, record in self.records.items() if record["failure"] is None}
+
+    def failed(self) -> Dict[str, dict]:
+        """Get the records of the stocks whose last attempt failed, keyed by stock name."""
+        return {symbol: record for symbol, record in self.records.items() if record["failure"] is not None}
+
+    def record(
+        self,
+        symbol: str,
+        buy: list,
+        sell: list,
+        failure: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Durably record a finished stock.
+
+        Args:
+            symbol (str): Name of the stock.
+            buy (list): Closing price if the buy signal triggered, else empty.
+            sell (list): Closing price if the sell signal triggered, else empty.
+            failure (str, optional): Kind of failure, one of analysis_utils.FAILURE_KINDS, None if the stock
+                                     succeeded. Defaults to None.
+            error (str, optional): Reason the stock failed. Defaults to None.
+        """
+        record = {
+            "symbol": symbol,
+            "buy": [float(price) for price in buy],
+            "sell": [float(price) for price in sell],
+            "failure": failure,
+            "error": error,
+        }
+        self.records[symbol] = record
+        self._write(record)
+
+    def summary(self) -> str:
+        """Get the number of finished stocks and of failed stocks by kind of failure."""
+        failures = {}
+        for record in self.failed().values():
+            failures[record["failure"]] = failures.get(record["failure"], 0) + 1
+        details = ", ".join(f"{count} {failure}" for failure, count in sorted(failures.items()))
+        return (
+            f"Checkpoint: {len(self.completed())} stocks done, {sum(failures.values())} failed"
+            + (f" ({details})" if details else "")
+            + f", saved to {self.path}."
+        )
+
+    def close(self) -> None:
+        """Close the checkpoint file."""
+        self._file.close()
+
+    def __enter__(self) -> "ScanCheckpoint":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
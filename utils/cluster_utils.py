@@ -0,0 +1,192 @@
+"""Clustering of one dimensional price data with selectable backends.
+
+The "sklearn" backend runs the scikit-learn estimators and is the reference. The "numpy"
+backend computes the same clusterings with sort based algorithms specialised to one
+dimension, which avoids importing scikit-learn and most of its per fit overhead.
+"""
+from typing import Tuple
+
+import numpy as np
+
+CLUSTER_BACKENDS = ("sklearn", "numpy")
+
+
+def mean_shift_1d(values: np.ndarray, bandwidth: float, max_iter: int = 300) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster values with flat kernel mean shift, seeded from every value.
+
+    Follows sklearn.cluster.MeanShift with default arguments: every seed moves to the mean of
+    the values within bandwidth of it until it moves less than 1e-3 * bandwidth, centers are
+    ranked by the number of values within bandwidth, centers within bandwidth of a higher ranked
+    one are dropped, and every value is labelled with its nearest center. The values within
+    bandwidth of all seeds are found at once with searchsorted on the sorted values, and
+    their sums as differences of the running sum of the sorted values.
+
+    The means are rounded differently from sklearn's, which sums each window in the order its
+    neighbour search returns the values, so centers can differ from sklearn's by a few ulps.
+    That only changes the result when a mean lands exactly one bandwidth from a value or another
+    center, which happens for prices on a tick grid: a value on that boundary can fall on the
+    other side of it, so a seed can stop at another center, or a center sklearn keeps can be
+    dropped, and the clusters around it differ. Anywhere else the clusters are the same as
+    sklearn's, except that a value exactly halfway between two centers gets the lower label,
+    where sklearn's choice depends on its neighbour search.
+
+    Args:
+        values (np.ndarray): One dimensional values to cluster.
+        bandwidth (float): Radius of the flat kernel.
+        max_iter (int, optional): Maximum number of iterations per seed. Defaults to 300.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Label of every value and the cluster centers, in sklearn's label order.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if len(values) == 0:
+        raise ValueError("Found array with 0 sample(s) while a minimum of 1 is required by MeanShift.")
+    sorted_values = np.sort(values)
+    running_sum = np.concatenate(([0.0], np.cumsum(sorted_values)))
+    stop_thresh = 1e-3 * bandwidth
+
+    means = np.unique(values)
+    intensity = np.zeros(len(means), dtype=np.int64)
+    active = np.ones(len(means), dtype=bool)
+    for completed_iterations in range(max_iter + 1):
+        seeds = np.flatnonzero(active)
+        if len(seeds) == 0:
+            break
+        old_means = means[seeds]
+        low, high = _within_bandwidth(sorted_values, old_means, bandwidth)
+        count = high - low
+        new_means = (running_sum[high] - running_sum[low]) / np.maximum(count, 1)
+        # Seeds with no values within bandwidth stop where they are and are dropped.
+        new_means[count == 0] = old_means[count == 0]
+        means[seeds] = new_means
+        intensity[seeds] = count
+        done = (count == 0) | (np.abs(new_means - old_means) <= stop_thresh) | (completed_iterations == max_iter)
+        active[seeds[done]] = False
+
+    centers, first = np.unique(means[intensity > 0], return_index=True)
+    center_intensity = intensity[intensity > 0][first]
+    # Rank by intensity, then by center, both descending.
+    order = np.lexsort((-centers, -center_intensity))
+    sorted_centers = centers[order]
+
+    unique = np.ones(len(sorted_centers), dtype=bool)
+    by_value = np.argsort(sorted_centers, kind="stable")
+    centers_by_value = sorted_centers[by_value]
+    low, high = _within_bandwidth(centers_by_value, sorted_centers, bandwidth)
+    for i in range(len(sorted_centers)):
+        if unique[i]:
+            unique[by_value[low[i] : high[i]]] = False
+            unique[i] = True
+    cluster_centers = sorted_centers[unique]
+
+    return _nearest_center(values, cluster_centers), cluster_centers
+
+
+def _within_bandwidth(
+    sorted_values: np.ndarray, centers: np.ndarray, bandwidth: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the slice of sorted values within bandwidth of every center.
+
+    A value is within bandwidth when abs(value - center) <= bandwidth, as sklearn tests it.
+    Searching for center - bandwidth can round to the neighbouring float and miss a value
+    sitting exactly on the boundary, which is common for prices on a tick grid, so each
+    bound is corrected by one distinct value when needed.
+    """
+    last = len(sorted_values) - 1
+    low = np.searchsorted(sorted_values, centers - bandwidth, side="left")
+    high = np.searchsorted(sorted_values, centers + bandwidth, side="right")
+
+    before = sorted_values[np.maximum(low - 1, 0)]
+    grow = (low > 0) & (np.abs(before - centers) <= bandwidth)
+    low[grow] = np.searchsorted(sorted_values, before[grow], side="left")
+    first = sorted_values[np.minimum(low, last)]
+    shrink = (low <= last) & (np.abs(first - centers) > bandwidth)
+    low[shrink] = np.searchsorted(sorted_values, first[shrink], side="right")
+
+    after = sorted_values[np.minimum(high, last)]
+    grow = (high <= last) & (np.abs(after - centers) <= bandwidth)
+    high[grow] = np.searchsorted(sorted_values, after[grow], side="right")
+    final = sorted_values[np.maximum(high - 1, 0)]
+    shrink = (high > 0) & (np.abs(final - centers) > bandwidth)
+    high[shrink] = np.searchsorted(sorted_values, final[shrink], side="left")
+    return low, np.maximum(high, low)
+
+
+def _nearest_center(values: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """Get the index of the nearest center of every value, preferring the lower index on ties."""
+    if len(centers) == 1:
+        return np.zeros(len(values), dtype=np.int64)
+    by_value = np.argsort(centers, kind="stable")
+    centers_by_value = centers[by_value]
+    right = np.clip(np.searchsorted(centers_by_value, values), 1, len(centers) - 1)
+    left = right - 1
+    left_distance = np.abs(values - centers_by_value[left])
+    right_distance = np.abs(values - centers_by_value[right])
+    left_label = by_value[left]
+    right_label = by_value[right]
+    take_right = (right_distance < left_distance) | ((right_distance == left_distance) & (right_label < left_label))
+    return np.where(take_right, right_label, left_label)
+
+
+def gap_partition_1d(values: np.ndarray, n_clusters: int) -> np.ndarray:
+    """Partition values into at most n_clusters groups by cutting at the widest gaps.
+
+    Equal values always share a label, which is all the cluster pipeline needs from the Birch
+    step: it only counts repeats of a price within its group.
+
+    Args:
+        values (np.ndarray): One dimensional values to partition.
+        n_clusters (int): Maximum number of groups.
+
+    Returns:
+        np.ndarray: Label of every value, numbered from 0 in increasing order of value.
+    """
+    values = np.asarray(values, dtype=float).ravel()
+    if len(values) == 0:
+        raise ValueError("Found array with 0 sample(s) while a minimum of 1 is required by Birch.")
+    unique = np.unique(values)
+    gaps = np.diff(unique)
+    cuts = np.sort(np.argsort(gaps, kind="stable")[::-1][: n_clusters - 1])
+    unique_labels = np.zeros(len(unique), dtype=np.int64)
+    unique_labels[cuts + 1] = 1
+    unique_labels = np.cumsum(unique_labels)
+    return unique_labels[np.searchsorted(unique, values)]
+
+
+def mean_shift_labels(values: np.ndarray, bandwidth: float, backend: str = "sklearn") -> np.ndarray:
+    """Get mean shift cluster labels of one dimensional values.
+
+    Args:
+        values (np.ndarray): One dimensional values to cluster.
+        bandwidth (float): Bandwidth of the mean shift kernel.
+        backend (str, optional): 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+
+    Returns:
+        np.ndarray: Cluster label of every value.
+    """
+    if backend == "numpy":
+        return mean_shift_1d(values, bandwidth)[0]
+    from sklearn.cluster import MeanShift
+
+    return MeanShift(bandwidth=bandwidth).fit(np.reshape(values, (-1, 1))).labels_
+
+
+def partition_labels(values: np.ndarray, n_clusters: int, backend: str = "sklearn") -> np.ndarray:
+    """Get labels grouping one dimensional values into about n_clusters clusters.
+
+    Args:
+        values (np.ndarray): One dimensional values to cluster.
+        n_clusters (int): Number of clusters.
+        backend (str, optional): 'sklearn' for Birch or 'numpy' for gap partitioning. Defaults to 'sklearn'.
+
+    Returns:
+        np.ndarray: Cluster label of every value.
+    """
+    if backend == "numpy":
+        return gap_partition_1d(values, n_clusters)
+    from sklearn.cluster import Birch
+
+    values = np.reshape(values, (-1, 1))
+    brc = Birch(n_clusters=n_clusters)
+    brc.fit(values)
+    return brc.predict(values)
@@ -0,0 +1,5 @@
+"""Analysis settings shared by the scan, backtest, sweep and scanner daemon scripts."""
+
+DAYS = 200
+PERIOD = 5
+WITHIN_SUPPORT_PERCENTAGE = 2
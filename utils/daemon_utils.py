@@ -0,0 +1,519 @@
+"""Long running scanner keeping the stock data and analysis in memory, with a local HTTP/JSON API."""
+import asyncio
+import copy
+import json
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis_utils import (
+    OHLC_COLUMNS,
+    SymbolResult,
+    fetch_failure_result,
+    get_buy_sell_signals,
+    to_ohlc_array,
+)
+from utils.data_source_utils import DataSource
+from utils.level_cache_utils import LevelCache
+from utils.stock_data_utils import get_stock_data
+from utils.streaming_utils import RollingRSI, StreamingLevels
+
+HTTP_REASONS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed", 400: "Bad Request"}
+
+
+@dataclass
+class SymbolStream:
+    """RSI and windowed extrema of the bars of a stock, to which new bars are added as they come in.
+
+    Attributes:
+        ohlc (np.ndarray): Open, High, Low and Close prices of the bars added, of shape (4, bars).
+        rsi (RollingRSI): RSI state of the bars added.
+        rsi_values (list): RSI of every bar added.
+        levels (StreamingLevels): Windowed extrema of the bars added.
+    """
+
+    ohlc: np.ndarray
+    rsi: RollingRSI
+    rsi_values: list
+    levels: StreamingLevels
+
+    @classmethod
+    def empty(cls, period: int, cluster_backend: str) -> "SymbolStream":
+        """Get a stream without bars.
+
+        Args:
+            period (int): Window period for gathering prices.
+            cluster_backend (str): Clustering backend, 'sklearn' or 'numpy'.
+
+        Returns:
+            SymbolStream: Stream to add the bars of a stock to.
+        """
+        return cls(np.empty((len(OHLC_COLUMNS), 0)), RollingRSI(), [], StreamingLevels(period, backend=cluster_backend))
+
+    def add(self, ohlc: np.ndarray) -> None:
+        """Add bars, oldest first.
+
+        Args:
+            ohlc (np.ndarray): Open, High, Low and Close prices of the bars, of shape (4, bars).
+        """
+        for _, high, low, close in ohlc.T:
+            self.rsi_values.append(float(self.rsi.update(close)[0]))
+            self.levels.update(high, low)
+        self.ohlc = np.concatenate([self.ohlc, ohlc], axis=1)
+
+    def extends(self, ohlc: np.ndarray) -> bool:
+        """Check whether bars start with the bars added, followed by at least one more.
+
+        Args:
+            ohlc (np.ndarray): Open, High, Low and Close prices of the bars, of shape (4, bars).
+
+        Returns:
+            bool: Whether the bars following the ones added can be added to the stream.
+        """
+        known = self.ohlc.shape[-1]
+        return known < ohlc.shape[-1] and np.array_equal(self.ohlc, ohlc[:, :known], equal_nan=True)
+
+
+def build_streams(ohlcs: List[np.ndarray], period: int, cluster_backend: str) -> List[SymbolStream]:
+    """Get the streams of stocks holding every bar but the last one, as analyse_stream keeps them.
+
+    The RSI of every stock is updated at once bar after bar, which costs about as much as
+    adding the bars of a single stock, so rebuilding the streams of all stocks on the first
+    scan or after the first bar of the date range moved is not a loop over the stocks.
+
+    Args:
+        ohlcs (List[np.ndarray]): Open, High, Low and Close prices of each stock, of shape (4, bars) with at least one bar.
+        period (int): Window period for gathering prices.
+        cluster_backend (str): Clustering backend, 'sklearn' or 'numpy'.
+
+    Returns:
+        List[SymbolStream]: Stream of each stock.
+    """
+    lengths = np.array([ohlc.shape[-1] - 1 for ohlc in ohlcs])
+    n_bars = lengths.max(initial=0)
+    # Stocks with fewer bars are padded on the left and only get their bars.
+    close = np.full((len(ohlcs), n_bars), np.nan)
+    for row, ohlc in enumerate(ohlcs):
+        close[row, n_bars - lengths[row] :] = ohlc[3, :-1]
+    state = RollingRSI(len(ohlcs))
+    rsi = np.full((len(ohlcs), n_bars), np.nan)
+    for bar in range(n_bars):
+        valid = bar >= n_bars - lengths
+        rsi[valid, bar] = state.update(close[:, bar], valid=valid)[valid]
+    streams = []
+    for row, ohlc in enumerate(ohlcs):
+        levels = StreamingLevels(period, backend=cluster_backend)
+        for high, low in ohlc[1:3, :-1].T:
+            levels.update(high, low)
+        rsi_values = rsi[row, n_bars - lengths[row] :].tolist()
+        streams.append(SymbolStream(ohlc[:, :-1], state.take(np.array([row])), rsi_values, levels))
+    return streams
+
+
+def analyse_stream(
+    symbol: str,
+    ohlc: np.ndarray,
+    stream: Optional[SymbolStream],
+    period: int,
+    within_support_percentage: float,
+    cluster_backend: str,
+    level_cache: LevelCache,
+) -> Tuple[SymbolResult, SymbolStream, LevelCache]:
+    """Analyse a stock from the state of its previous scan, adding only the bars which came in since.
+
+    The last bar of a stock keeps changing during the trading day, so the stream holds every bar
+    but the last one, which is added to a copy of it. The bars are added to the stream when they
+    extend the bars it holds, else it is rebuilt from all of them, as on the first scan or when the
+    first bar of the date range moved, which Scanner.scan does beforehand for all such stocks at
+    once with build_streams. The levels are looked up in level_cache, which skips the
+    clustering when the windowed extrema or the frequent prices are unchanged. Gives the same
+    result as analyse_stock.
+
+    Args:
+        symbol (str): Name of the stock.
+        ohlc (np.ndarray): Array of shape (4, bars) holding Open, High, Low and Close prices, oldest first.
+        stream (SymbolStream, optional): Stream returned by the previous scan of the stock, None on the first one.
+        period (int): Window period for gathering prices.
+        within_support_percentage (float): Distance from a level, in percent of the close, which triggers a signal.
+        cluster_backend (str): Clustering backend, 'sklearn' or 'numpy'.
+        level_cache (LevelCache): Entries of the stock, as returned by LevelCache.subset.
+
+    Returns:
+        Tuple[SymbolResult, SymbolStream, LevelCache]: Result of the analysis, the stream holding every bar but the
+            last one and the updated cache, to merge into the main one.
+    """
+    if ohlc.shape[-1] == 0:
+        return SymbolResult(symbol, error="No data was returned for the stock.", failure="no_data"), stream, level_cache
+    closed = ohlc.shape[-1] - 1
+    if stream is None or not stream.extends(ohlc):
+        stream = SymbolStream.empty(period, cluster_backend)
+    else:
+        # The stream given is left as it is, should this analysis fail.
+        stream = copy.deepcopy(stream)
+    stream.add(ohlc[:, stream.ohlc.shape[-1] : closed])
+    current = copy.deepcopy(stream)
+    current.add(ohlc[:, closed:])
+    try:
+        cluster_min_prices, cluster_max_prices = current.levels.levels(level_cache, symbol)
+        close_last = ohlc[3, -1]
+        buy, sell = get_buy_sell_signals(close_last, cluster_min_prices, cluster_max_prices, within_support_percentage)
+    except ValueError:
+        error = "No proper support resistance values could be found for the given period."
+        return SymbolResult(symbol, error=error, failure="insufficient_levels"), stream, level_cache
+    except Exception as error:
+        return SymbolResult(symbol, error=repr(error), failure="unknown"), stream, level_cache
+    result = SymbolResult(
+        symbol,
+        cluster_min_prices=cluster_min_prices,
+        cluster_max_prices=cluster_max_prices,
+        rsi=np.array(current.rsi_values),
+        close_last=close_last,
+        buy=buy,
+        sell=sell,
+    )
+    return result, stream, level_cache
+
+
+@dataclass
+class SymbolState:
+    """Warm state of a stock between scans.
+
+    Attributes:
+        data_stock (pd.DataFrame): Latest data of the stock, None if it could not be fetched.
+        bars_key (tuple): Number of bars, date and prices of the last bar, which change when new bars come in.
+        result (SymbolResult): Result of the latest analysis.
+        updated_at (str): Time of the latest analysis.
+        summary (dict): Result of the latest analysis as sent by the API.
+        stream (SymbolStream): RSI and windowed extrema of the bars analysed, but the last one.
+    """
+
+    data_stock: Optional[pd.DataFrame] = None
+    bars_key: Optional[tuple] = None
+    result: Optional[SymbolResult] = None
+    updated_at: Optional[str] = None
+    summary: dict = field(default_factory=dict)
+    stream: Optional[SymbolStream] = None
+
+
+def get_bars_key(data_stock: pd.DataFrame) -> tuple:
+    """Get a key of stock data which changes when a bar is added or the last bar is updated.
+
+    Args:
+        data_stock (pd.DataFrame): Stock data.
+
+    Returns:
+        tuple: Number of bars, date of the last bar and its OHLC prices.
+    """
+    if data_stock.empty:
+        return (0,)
+    last = data_stock.iloc[-1]
+    return (len(data_stock), data_stock.index[-1], *(float(last[column]) for column in OHLC_COLUMNS))
+
+
+def summarise_result(result: SymbolResult, data_stock: Optional[pd.DataFrame], updated_at: str) -> dict:
+    """Get the result of the analysis of a stock as JSON serializable values.
+
+    Args:
+        result (SymbolResult): Result of the analysis.
+        data_stock (pd.DataFrame): Data the stock was analysed on, None if it could not be fetched.
+        updated_at (str): Time of the analysis.
+
+    Returns:
+        dict: Date of the last bar, close, last RSI, buy and sell flags, levels, error and kind of failure of the stock.
+    """
+    summary = {
+        "symbol": result.symbol,
+        "date": None if data_stock is None or data_stock.empty else data_stock.index[-1].strftime("%Y-%m-%d"),
+        "updated_at": updated_at,
+        "error": result.error,
+        "failure": result.failure,
+    }
+    if result.error is None:
+        rsi = float(result.rsi[-1]) if len(result.rsi) else np.nan
+        summary.update(
+            close=float(result.close_last),
+            rsi=None if np.isnan(rsi) else rsi,
+            buy=bool(result.buy),
+            sell=bool(result.sell),
+            support=[float(price) for price in result.cluster_min_prices],
+            resistance=[float(price) for price in result.cluster_max_prices],
+        )
+    return summary
+
+
+class Scanner:
+    """Rescans a list of stocks on a schedule or on demand, keeping their data and results in memory.
+
+    Stocks are fetched concurrently with asyncio, each fetch running in a thread since data
+    sources are blocking. A stock is only analysed again when its bars changed since the
+    previous scan, and then only its new bars are added to its RSI and windowed extrema, with
+    its levels looked up in a LevelCache. Results are kept as JSON ready summaries so that
+    queries only read memory.
+    """
+
+    def __init__(
+        self,
+        symbols: List[str],
+        source: DataSource,
+        days: int = 200,
+        period: int = 5,
+        within_support_percentage: float = 2,
+        fetch_workers: int = 8,
+        workers: int = 1,
+        cluster_backend: str = "sklearn",
+    ):
+        """Create the scanner.
+
+        Args:
+            symbols (List[str]): Names of the stocks to scan.
+            source (DataSource): Source to fetch the data from.
+            days (int, optional): Number of past days analysed. Defaults to 200.
+            period (int, optional): Window period for gathering prices. Defaults to 5.
+            within_support_percentage (float, optional): Distance from a level, in percent of the close,
+                                                         which triggers a signal. Defaults to 2.
+            fetch_workers (int, optional): Number of stocks fetched concurrently. Defaults to 8.
+            workers (int, optional): Number of processes analysing stocks, 1 for a thread of this process. Defaults to 1.
+            cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        """
+        self.symbols = list(symbols)
+        self.source = source
+        self.days = days
+        self.period = period
+        self.within_support_percentage = within_support_percentage
+        self.fetch_workers = fetch_workers
+        self.workers = workers
+        self.cluster_backend = cluster_backend
+        self.states: Dict[str, SymbolState] = {symbol: SymbolState() for symbol in self.symbols}
+        self.level_cache = LevelCache()
+        self.scans = 0
+        self.last_scan: dict = {}
+        self._executor = self._make_executor()
+        self._scan_lock: Optional[asyncio.Lock] = None
+        self._signals_json = b"{}"
+
+    def _make_executor(self) -> Executor:
+        """Get the executor analysing stocks."""
+        return ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else ThreadPoolExecutor(1)
+
+    async def _fetch(self, symbol: str, semaphore: asyncio.Semaphore) -> Tuple[str, object]:
+        """Fetch a stock, returning its data or the error fetching it."""
+        async with semaphore:
+            try:
+                return symbol, await asyncio.to_thread(
+                    get_stock_data, symbol, days=self.days, interval="1d", source=self.source
+                )
+            except Exception as error:
+                return symbol, error
+
+    async def _build_streams(self, ohlcs: Dict[str, np.ndarray]) -> Dict[str, SymbolStream]:
+        """Build the streams of stocks in the executor, none if that raised, leaving them to analyse_stream."""
+        if not ohlcs:
+            return {}
+        loop = asyncio.get_running_loop()
+        try:
+            streams = await loop.run_in_executor(
+                self._executor, build_streams, list(ohlcs.values()), self.period, self.cluster_backend
+            )
+        except Exception as error:
+            print(f"Could not build the streams of {len(ohlcs)} stocks: {error!r}")
+            return {}
+        return dict(zip(ohlcs, streams))
+
+    async def _analyse(
+        self, symbol: str, ohlc: np.ndarray, stream: Optional[SymbolStream]
+    ) -> Tuple[SymbolResult, SymbolStream]:
+        """Analyse a stock in the executor, leaving the event loop free to answer queries."""
+        loop = asyncio.get_running_loop()
+        result, stream, level_cache = await loop.run_in_executor(
+            self._executor,
+            analyse_stream,
+            symbol,
+            ohlc,
+            stream,
+            self.period,
+            self.within_support_percentage,
+            self.cluster_backend,
+            self.level_cache.subset(symbol),
+        )
+        self.level_cache.merge(level_cache)
+        return result, stream
+
+    async def scan(self) -> dict:
+        """Fetch every stock and analyse the ones whose bars changed.
+
+        A stock whose analysis raised, for example because a worker process died, keeps its
+        previous result and is analysed again on the next scan.
+
+        Returns:
+            dict: Statistics of the scan: stocks analysed, unchanged and failed, and its duration.
+        """
+        if self._scan_lock is None:
+            self._scan_lock = asyncio.Lock()
+        async with self._scan_lock:
+            start = time.perf_counter()
+            semaphore = asyncio.Semaphore(self.fetch_workers)
+            fetched = await asyncio.gather(*(self._fetch(symbol, semaphore) for symbol in self.symbols))
+            updated_at = datetime.now().isoformat(timespec="seconds")
+            changed, unchanged, failed = [], 0, 0
+            for symbol, data_stock in fetched:
+                state = self.states[symbol]
+                if isinstance(data_stock, Exception):
+                    failed += 1
+                    # Keep serving the previous result of a stock which could not be fetched this time.
+                    if state.result is None:
+                        state.result = fetch_failure_result(symbol, data_stock)
+                        state.updated_at = updated_at
+                        state.summary = summarise_result(state.result, None, updated_at)
+                    continue
+                bars_key = get_bars_key(data_stock)
+                if bars_key == state.bars_key:
+                    unchanged += 1
+                    continue
+                changed.append((symbol, data_stock, bars_key, to_ohlc_array(data_stock)))
+            streams = {symbol: self.states[symbol].stream for symbol, *_ in changed}
+            streams.update(
+                await self._build_streams(
+                    {
+                        symbol: ohlc
+                        for symbol, _, _, ohlc in changed
+                        if ohlc.shape[-1] and (streams[symbol] is None or not streams[symbol].extends(ohlc))
+                    }
+                )
+            )
+            outcomes = await asyncio.gather(
+                *(self._analyse(symbol, ohlc, streams[symbol]) for symbol, _, _, ohlc in changed),
+                return_exceptions=True,
+            )
+            analysed = 0
+            for (symbol, data_stock, bars_key, _), outcome in zip(changed, outcomes):
+                if isinstance(outcome, BaseException):
+                    print(f"Could not analyse {symbol}: {outcome!r}")
+                    failed += 1
+                    continue
+                state = self.states[symbol]
+                state.result, state.stream = outcome
+                state.data_stock, state.bars_key, state.updated_at = data_stock, bars_key, updated_at
+                state.summary = summarise_result(state.result, data_stock, updated_at)
+                analysed += 1
+            if any(isinstance(outcome, BrokenProcessPool) for outcome in outcomes):
+                self._executor.shutdown(wait=False)
+                self._executor = self._make_executor()
+            self._signals_json = json.dumps(self.signals()).encode()
+            self.scans += 1
+            self.last_scan = {
+                "scan": self.scans,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+                "symbols": len(self.symbols),
+                "analysed": analysed,
+                "unchanged": unchanged,
+                "failed": failed,
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+            return self.last_scan
+
+    def signals(self, kind: Optional[str] = None) -> dict:
+        """Get the current buy and sell flags of every stock.
+
+        Args:
+            kind (str, optional): 'buy' or 'sell' to only get the stocks with that signal. Defaults to None.
+
+        Returns:
+            dict: Summary of every stock without its levels, keyed by stock name.
+        """
+        return {
+            symbol: {key: value for key, value in state.summary.items() if key not in ("support", "resistance")}
+            for symbol, state in self.states.items()
+            if state.summary and (kind is None or state.summary.get(kind))
+        }
+
+    def status(self) -> dict:
+        """Get the statistics of the latest scan."""
+        return {"scans": self.scans, "last_scan": self.last_scan}
+
+    async def respond(self, method: str, target: str) -> Tuple[int, bytes]:
+        """Answer an API request.
+
+        GET /signals lists the flags of every stock, /signals?kind=buy only the stocks with a buy
+        signal, GET /symbols/<name> gets the levels of a stock, GET /status the statistics of
+        the latest scan and POST /rescan scans right away and returns its statistics.
+
+        Args:
+            method (str): HTTP method.
+            target (str): Path and query of the request.
+
+        Returns:
+            Tuple[int, bytes]: HTTP status and JSON body.
+        """
+        url = urlsplit(target)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["rescan"]:
+            if method != "POST":
+                return 405, json.dumps({"error": "Use POST to rescan."}).encode()
+            return 200, json.dumps(await self.scan()).encode()
+        if method != "GET":
+            return 405, json.dumps({"error": f"{method} is not supported."}).encode()
+        if parts == ["signals"]:
+            kind = parse_qs(url.query).get("kind", [None])[0]
+            if kind is None:
+                return 200, self._signals_json
+            if kind not in ("buy", "sell"):
+                return 400, json.dumps({"error": "kind must be buy or sell."}).encode()
+            return 200, json.dumps(self.signals(kind)).encode()
+        if len(parts) == 2 and parts[0] == "symbols":
+            state = self.states.get(parts[1])
+            if state is None or not state.summary:
+                return 404, json.dumps({"error": f"{parts[1]} is not scanned."}).encode()
+            return 200, json.dumps(state.summary).encode()
+        if parts == ["status"]:
+            return 200, json.dumps(self.status()).encode()
+        return 404, json.dumps({"error": f"Unknown path {url.path}."}).encode()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve one HTTP request and close the connection."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+            if len(request_line) < 2:
+                status, body = 400, json.dumps({"error": "Malformed request."}).encode()
+            else:
+                status, body = await self.respond(request_line[0].upper(), request_line[1])
+            writer.write(
+                f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, interval: float = 900.0) -> None:
+        """Scan once, then answer API requests and rescan every interval seconds until cancelled.
+
+        Args:
+            host (str, optional): Address to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): Port to listen on. Defaults to 8765.
+            interval (float, optional): Seconds between scheduled scans, 0 to only scan on demand. Defaults to 900.
+        """
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+        async with server:
+            print("Scan:", await self.scan())
+            while True:
+                if interval > 0:
+                    await asyncio.sleep(interval)
+                    print("Scan:", await self.scan())
+                else:
+                    await asyncio.Event().wait()
+
+    def close(self) -> None:
+        """Stop the analysis workers."""
+        self._executor.shutdown()
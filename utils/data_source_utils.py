@@ -0,0 +1,118 @@
+"""Pluggable sources of historical stock data."""
+import abc
+import os
+import time
+
+import pandas as pd
+
+
+def classify_fetch_error(error: Exception) -> str:
+    """Get the kind of failure of a stock whose data could not be fetched.
+
+    Args:
+        error (Exception): Exception raised by the last fetch attempt.
+
+    Returns:
+        str: 'no_data' if the source has no data for the stock, 'network' for connection errors,
+            which include the errors of requests, else 'unknown'.
+    """
+    if isinstance(error, (FileNotFoundError, KeyError)):
+        return "no_data"
+    if isinstance(error, OSError):
+        return "network"
+    return "unknown"
+
+
+def is_transient_fetch_error(error: Exception) -> bool:
+    """Check whether a fetch may succeed when retried, which only holds for connection errors.
+
+    Args:
+        error (Exception): Exception raised by a fetch attempt.
+
+    Returns:
+        bool: Whether the fetch is worth retrying.
+    """
+    return classify_fetch_error(error) == "network"
+
+
+class DataSource(abc.ABC):
+    """Interface for a provider of historical OHLCV data.
+
+    Implementations return a dataframe indexed by date with at least the
+    Open, High, Low, Close and Volume columns, in the same layout as yfinance.
+
+    Attributes:
+        retry_empty (bool): Whether an empty dataframe may be a failed request worth retrying
+                            rather than a stock without data.
+    """
+
+    retry_empty = False
+
+    @abc.abstractmethod
+    def history(self, stock_name: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        """Get historical data for a stock.
+
+        Args:
+            stock_name (str): Name of the stock as listed in the stock CSV files.
+            start (str): First date to fetch, formatted as YYYY-MM-DD.
+            end (str): Date up to which data is fetched (exclusive), formatted as YYYY-MM-DD.
+            interval (str, optional): Interval between data points. Defaults to '1d'.
+
+        Returns:
+            pd.DataFrame: Dataframe containing historical data for the stock.
+        """
+
+
+class YahooDataSource(DataSource):
+    """Data source backed by the yahoo finance api.
+
+    yfinance logs failed and throttled requests and returns an empty dataframe, so empty
+    dataframes are retried.
+    """
+
+    retry_empty = True
+
+    def __init__(self, suffix: str = ".NS"):
+        """Create a yahoo finance data source.
+
+        Args:
+            suffix (str, optional): Exchange suffix appended to every stock name. Defaults to '.NS'.
+        """
+        self.suffix = suffix
+
+    def history(self, stock_name: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        """Get historical data for a stock from yahoo finance."""
+        # yfinance takes a large part of the start-up time, so it is only imported by runs fetching from it.
+        import yfinance as yf
+
+        ticker = yf.Ticker(stock_name + self.suffix)
+        return ticker.history(start=start, end=end, interval=interval)
+
+
+class LocalDataSource(DataSource):
+    """Data source reading one CSV file per stock from a local directory.
+
+    Used in place of yahoo finance for offline runs, tests and benchmarks. Files are
+    named <stock_name>.csv and hold a date index followed by the OHLCV columns.
+    """
+
+    def __init__(self, directory: str, delay: float = 0.0):
+        """Create a local file backed data source.
+
+        Args:
+            directory (str): Directory containing one CSV file per stock.
+            delay (float, optional): Seconds to sleep on every request, to mimic network latency. Defaults to 0.
+        """
+        self.directory = directory
+        self.delay = delay
+
+    def history(self, stock_name: str, start: str, end: str, interval: str = "1d") -> pd.DataFrame:
+        """Get historical data for a stock from its CSV file."""
+        if self.delay:
+            time.sleep(self.delay)
+        path = os.path.join(self.directory, f"{stock_name}.csv")
+        data_stock = pd.read_csv(path, index_col=0)
+        data_stock.index = pd.to_datetime(data_stock.index, utc=True).tz_convert("Asia/Kolkata")
+        begin = pd.Timestamp(start, tz=data_stock.index.tz)
+        finish = pd.Timestamp(end, tz=data_stock.index.tz)
+        return data_stock[(data_stock.index >= begin) & (data_stock.index < finish)]
@@ -1,10 +1,21 @@
+import math
+import os
 import smtplib, ssl
+import threading
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 from email import encoders
 from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from datetime import date
+from typing import List, Optional, Union
+
+PASSWORD_ENV_VAR = "SMTP_PASSWORD"
+# Most providers reject emails above 25 MB, counting the base64 encoded attachments.
+MAX_EMAIL_BYTES = 25 * 1024 * 1024
+
 
 def prepare_attachment(path_of_file_to_send: str) -> MIMEBase:
     """Prepare the attachement for a email using the contents of a file.
@@ -16,9 +27,9 @@ def prepare_attachment(path_of_file_to_send: str) -> MIMEBase:
     Returns:
         MIMEBase: MIMEBase object which can be attached to mail.
     """
-    assert path_of_file_to_send.split(".")[-1]=="pdf", "Only PDF files are supported at the moment."
+    assert path_of_file_to_send.split(".")[-1] == "pdf", "Only PDF files are supported at the moment."
     filename = path_of_file_to_send
-    
+
     # Open PDF file in binary mode
     with open(filename, "rb") as attachment:
         # Add file as application/octet-stream
@@ -26,7 +37,7 @@ def prepare_attachment(path_of_file_to_send: str) -> MIMEBase:
         part = MIMEBase("application", "octet-stream")
         part.set_payload(attachment.read())
 
-    # Encode file in ASCII characters to send by email    
+    # Encode file in ASCII characters to send by email
     encoders.encode_base64(part)
 
     # Add header as key/value pair to attachment part
@@ -36,42 +47,339 @@ def prepare_attachment(path_of_file_to_send: str) -> MIMEBase:
     )
     return part
 
-def send_email_to_people(senders_email: str,
-                         receipients: list, 
-                         path_of_file_to_send: str, 
-                         subject: str=f"Stocks to watch out for in Nifty 50 {date.today}",
-                         body: str=f"Support and Resistance with RSI for Nifty 50 {date.today()}") -> None:
+
+def encoded_size(path_of_file_to_send: str) -> int:
+    """Get the size of a file once attached to an email, base64 encoded in lines of 76 characters.
+
+    Args:
+        path_of_file_to_send (str): Path of the file.
+
+    Returns:
+        int: Size of the encoded attachment in bytes.
+    """
+    encoded = 4 * math.ceil(os.path.getsize(path_of_file_to_send) / 3)
+    return encoded + math.ceil(encoded / 76)
+
+
+def get_password(password: Optional[str] = None) -> str:
+    """Get the password of the sender's email account.
+
+    Args:
+        password (str, optional): Password, if already known. Defaults to None.
+
+    Returns:
+        str: The given password, else the SMTP_PASSWORD environment variable, else the password typed at a prompt.
+    """
+    if password is not None:
+        return password
+    if os.environ.get(PASSWORD_ENV_VAR):
+        return os.environ[PASSWORD_ENV_VAR]
+    return input("Type your password and press enter:")
+
+
+def _is_transient(error: Exception) -> bool:
+    """Check whether a failed send may succeed when retried, which 5xx replies rule out."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return True
+
+
+class MessageTemplate:
+    """Email with an attachment, serialized once and addressed to each recipient.
+
+    The body and the base64 encoded attachment are rendered to text once. Each message then
+    only adds its own recipient headers in front of it.
+    """
+
+    def __init__(self, senders_email: str, subject: str, body: str, part: MIMEBase):
+        """Create the template.
+
+        Args:
+            senders_email (str): Email of the sender.
+            subject (str): Subject of the email.
+            body (str): Plain text body of the email.
+            part (MIMEBase): Attachment, as returned by prepare_attachment.
+        """
+        message = MIMEMultipart()
+        message["From"] = senders_email
+        message["Subject"] = subject
+        message.attach(MIMEText(body, "plain"))
+        message.attach(part)
+        self.headers, self.payload = message.as_string().split("\n\n", 1)
+
+    def render(self, receiver_email: str) -> str:
+        """Get the message text for a recipient.
+
+        Args:
+            receiver_email (str): Email of the recipient.
+
+        Returns:
+            str: Message text, with To and Bcc set to the recipient.
+        """
+        return f"{self.headers}\nTo: {receiver_email}\nBcc: {receiver_email}\n\n{self.payload}"
+
+
+class EmailDispatcher:
+    """Sends messages over a small pool of authenticated SMTP connections.
+
+    Every connection logs in once and is reused for all the messages it sends. Sends can be
+    throttled to a maximum rate across all connections, and failed sends are retried on a
+    fresh connection with exponential backoff. Logins are made one at a time and a rejected
+    login is never retried, so that a wrong password fails once rather than once per
+    connection or recipient, which could lock the sender's account.
+    """
+
+    def __init__(
+        self,
+        senders_email: str,
+        password: str,
+        host: str = "smtp.gmail.com",
+        port: int = 465,
+        use_ssl: bool = True,
+        connections: int = 1,
+        max_per_second: Optional[float] = None,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        """Create the dispatcher, connections are opened on first use.
+
+        Args:
+            senders_email (str): Email of the sender, used to log in.
+            password (str): Password of the sender's email account.
+            host (str, optional): SMTP server. Defaults to 'smtp.gmail.com'.
+            port (int, optional): SMTP server port. Defaults to 465.
+            use_ssl (bool, optional): Connect with SSL, else in plain text. Defaults to True.
+            connections (int, optional): Number of connections sending in parallel. Defaults to 1.
+            max_per_second (float, optional): Maximum number of messages sent per second, unlimited if None. Defaults to None.
+            retries (int, optional): Number of retries of a failed send. Defaults to 3.
+            backoff (float, optional): Seconds to wait before the first retry, doubled on every retry. Defaults to 1.
+        """
+        self.senders_email = senders_email
+        self.password = password
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.connections = connections
+        self.interval = 1 / max_per_second if max_per_second else 0.0
+        self.retries = retries
+        self.backoff = backoff
+        self.logins = 0
+        self._context = ssl.create_default_context() if use_ssl else None
+        self._local = threading.local()
+        self._servers = []
+        self._lock = threading.Lock()
+        self._login_lock = threading.Lock()
+        self._auth_error = None
+        self._next_send = 0.0
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open and log in a connection.
+
+        Raises:
+            smtplib.SMTPAuthenticationError: If the server rejected the login, now or on an earlier connection.
+        """
+        if self._auth_error is not None:
+            raise self._auth_error
+        if self.use_ssl:
+            server = smtplib.SMTP_SSL(self.host, self.port, context=self._context)
+        else:
+            server = smtplib.SMTP(self.host, self.port)
+        try:
+            with self._login_lock:
+                if self._auth_error is not None:
+                    raise self._auth_error
+                try:
+                    server.login(self.senders_email, self.password)
+                except smtplib.SMTPAuthenticationError as error:
+                    self._auth_error = error
+                    raise
+        except BaseException:
+            server.close()
+            raise
+        with self._lock:
+            self.logins += 1
+            self._servers.append(server)
+        return server
+
+    def _server(self) -> smtplib.SMTP:
+        """Get the connection of this thread, opening it if needed."""
+        server = getattr(self._local, "server", None)
+        if server is None:
+            server = self._local.server = self._connect()
+        return server
+
+    def _drop_server(self) -> None:
+        """Close the connection of this thread after a failure."""
+        server = getattr(self._local, "server", None)
+        self._local.server = None
+        if server is not None:
+            with self._lock:
+                if server in self._servers:
+                    self._servers.remove(server)
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _throttle(self) -> None:
+        """Wait for the next send slot."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_send)
+            self._next_send = send_at + self.interval
+        time.sleep(send_at - now)
+
+    def send(self, receiver_email: str, text: str) -> None:
+        """Send a message, retrying on failure.
+
+        Args:
+            receiver_email (str): Email of the recipient.
+            text (str): Message text.
+
+        Raises:
+            smtplib.SMTPAuthenticationError: If the server rejected the login, which is not retried.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                self._throttle()
+                self._server().sendmail(self.senders_email, receiver_email, text)
+                return
+            except smtplib.SMTPAuthenticationError:
+                self._drop_server()
+                raise
+            except (smtplib.SMTPException, OSError) as error:
+                self._drop_server()
+                if attempt == self.retries or not _is_transient(error):
+                    raise
+                time.sleep(self.backoff * 2**attempt)
+
+    def send_all(self, receipients: list, template: MessageTemplate) -> dict:
+        """Send a message to every recipient.
+
+        Args:
+            receipients (list): List of recepients.
+            template (MessageTemplate): Message sent to each of them.
+
+        Returns:
+            dict: Error of every recipient the message could not be sent to.
+
+        Raises:
+            smtplib.SMTPAuthenticationError: If the server rejected the login. No message is sent after it.
+        """
+        failed = {}
+
+        def send_one(receiver_email: str) -> None:
+            # A rejected login fails every message, so the ones left are not attempted.
+            if self._auth_error is not None:
+                return
+            try:
+                self.send(receiver_email, template.render(receiver_email))
+            except smtplib.SMTPAuthenticationError:
+                pass
+            except (smtplib.SMTPException, OSError) as error:
+                failed[receiver_email] = error
+
+        if self.connections <= 1:
+            for receiver_email in receipients:
+                send_one(receiver_email)
+        else:
+            with ThreadPoolExecutor(max_workers=self.connections) as executor:
+                list(executor.map(send_one, receipients))
+        if self._auth_error is not None:
+            raise self._auth_error
+        return failed
+
+    def close(self) -> None:
+        """Log out of every connection."""
+        with self._lock:
+            servers, self._servers = self._servers, []
+        for server in servers:
+            try:
+                server.quit()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+    def __enter__(self) -> "EmailDispatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def send_email_to_people(
+    senders_email: str,
+    receipients: list,
+    path_of_file_to_send: Union[str, List[str]],
+    subject: str = f"Stocks to watch out for in Nifty 50 {date.today}",
+    body: str = f"Support and Resistance with RSI for Nifty 50 {date.today()}",
+    password: Optional[str] = None,
+    host: str = "smtp.gmail.com",
+    port: int = 465,
+    use_ssl: bool = True,
+    connections: int = 1,
+    max_per_second: Optional[float] = None,
+    retries: int = 3,
+    max_email_bytes: int = MAX_EMAIL_BYTES,
+) -> dict:
     """Send emails to a list of recepients with an attachment.
 
+    A list of files, such as the parts of a report returned by create_report, is sent as one email
+    per file, with "(part 1 of 3)" and so on added to the subject, so that each email stays within
+    the size limit of the provider. Every attachment is checked against max_email_bytes before any
+    email is sent.
+
     Args:
         senders_email (str): Email of the sender.
         receipients (list): List of recepeints.
-        path_of_file_to_send (str): File to send as attachment.
+        path_of_file_to_send (str or List[str]): File to send as attachment, or list of files sent one per email.
         subject (str, optional): Subject of the email. Defaults to "Stocks to watch out for in Nifty 50 {date.today}".
         body (str, optional): Body of the email. Defaults to "Support and Resistance with RSI for Nifty 50 {date.today()}".
-    """
-    password = input("Type your password and press enter:")
-    part = prepare_attachment(path_of_file_to_send)
-    
-    for recepient in receipients:
-        receiver_email = recepient
-        
-        # Create a multipart message and set headers
-        message = MIMEMultipart()
-        message["From"] = senders_email
-        message["To"] = receiver_email
-        message["Subject"] = subject
-        message["Bcc"] = receiver_email  # Recommended for mass emails
+        password (str, optional): Password of the sender, read from SMTP_PASSWORD or a prompt if None. Defaults to None.
+        host (str, optional): SMTP server. Defaults to 'smtp.gmail.com'.
+        port (int, optional): SMTP server port. Defaults to 465.
+        use_ssl (bool, optional): Connect with SSL, else in plain text. Defaults to True.
+        connections (int, optional): Number of connections sending in parallel. Defaults to 1.
+        max_per_second (float, optional): Maximum number of emails sent per second, unlimited if None. Defaults to None.
+        retries (int, optional): Number of retries of a failed send. Defaults to 3.
+        max_email_bytes (int, optional): Maximum size of an encoded attachment. Defaults to 25 MB.
 
-        # Add body to email
-        message.attach(MIMEText(body, "plain"))
+    Returns:
+        dict: Error of every recipient an email could not be sent to, the first one if several failed.
 
-        # Add attachment to message and convert message to string
-        message.attach(part)
-        text = message.as_string()
+    Raises:
+        ValueError: If an attachment would be larger than max_email_bytes. No email is sent then.
+        smtplib.SMTPAuthenticationError: If the server rejected the sender's login.
+    """
+    paths = [path_of_file_to_send] if isinstance(path_of_file_to_send, str) else list(path_of_file_to_send)
+    for path in paths:
+        size = encoded_size(path)
+        if size > max_email_bytes:
+            raise ValueError(
+                f"{path} is {size / 2**20:.1f} MB once encoded, above the limit of "
+                f"{max_email_bytes / 2**20:.1f} MB per email. Split the report into smaller parts."
+            )
+    password = get_password(password)
 
-        # Log in to server using secure context and send email
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(senders_email, password)
-            server.sendmail(senders_email, receiver_email, text)
\ No newline at end of file
+    failed = {}
+    with EmailDispatcher(
+        senders_email,
+        password,
+        host=host,
+        port=port,
+        use_ssl=use_ssl,
+        connections=connections,
+        max_per_second=max_per_second,
+        retries=retries,
+    ) as dispatcher:
+        for num, path in enumerate(paths, 1):
+            part_subject = f"{subject} (part {num} of {len(paths)})" if len(paths) > 1 else subject
+            template = MessageTemplate(senders_email, part_subject, body, prepare_attachment(path))
+            for receiver_email, error in dispatcher.send_all(receipients, template).items():
+                print(f"Could not send {path} to {receiver_email}: {error}")
+                failed.setdefault(receiver_email, error)
+    return failed
@@ -0,0 +1,249 @@
+"""Memoized support and resistance levels, reused across runs while their inputs are unchanged."""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from utils.stock_data_utils import cluster_frequent_prices, get_frequent_prices, get_windowed_prices
+
+
+def get_digest(prices: np.ndarray) -> str:
+    """Get a content hash of prices.
+
+    Args:
+        prices (np.ndarray): Prices.
+
+    Returns:
+        str: Hex digest of the prices as float64.
+    """
+    return hashlib.blake2b(np.ascontiguousarray(prices, dtype=float).tobytes(), digest_size=16).hexdigest()
+
+
+class LevelCache:
+    """LRU cache of support and resistance levels keyed by stock, parameters and a hash of the prices.
+
+    Levels are looked up in two steps. The windowed maxima fully determine the levels, so when
+    they are unchanged, for example when a run is repeated before new bars come in, the cached
+    levels are returned without clustering. When new bars changed them, the frequent prices are
+    computed again, and their mean shift clustering, the costly step, is reused if the new bars
+    did not change the set of frequent prices, which is the case on most days.
+
+    Entries are evicted least recently used first above max_entries. The cache is saved to and
+    loaded from a JSON file so that it is shared by successive runs.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        """Create an empty cache.
+
+        Args:
+            max_entries (int, optional): Number of entries above which least recently used entries are evicted.
+                                         Defaults to 20000.
+        """
+        self.max_entries = max_entries
+        self.counters = {"hits": 0, "cluster_hits": 0, "misses": 0, "evictions": 0}
+        self._entries: OrderedDict = OrderedDict()
+        self._symbol_keys: Dict[str, Set[tuple]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: tuple) -> Optional[np.ndarray]:
+        levels = self._entries.get(key)
+        if levels is None:
+            return None
+        self._entries.move_to_end(key)
+        return np.array(levels)
+
+    def _put(self, key: tuple, levels) -> None:
+        self._entries[key] = tuple(float(level) for level in levels)
+        self._entries.move_to_end(key)
+        self._symbol_keys.setdefault(key[1], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._symbol_keys[old_key[1]].discard(old_key)
+            if not self._symbol_keys[old_key[1]]:
+                del self._symbol_keys[old_key[1]]
+            self.counters["evictions"] += 1
+
+    def get_cluster_levels(
+        self,
+        symbol: str,
+        prices_win: np.ndarray,
+        values: np.ndarray,
+        reduce: np.ufunc,
+        backend: str = "sklearn",
+        n_clusters: int = 5,
+        bandwidth: float = 10,
+    ) -> np.ndarray:
+        """Get the levels of get_cluster_levels, from the cache when the prices allow it.
+
+        Args:
+            symbol (str): Name of the stock.
+            prices_win (np.ndarray): Windowed maxima of the prices.
+            values (np.ndarray): Prices the windows were taken over, oldest first.
+            reduce (np.ufunc): np.maximum or np.minimum, used to pick the level of each cluster.
+            backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+            n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+            bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+        Returns:
+            np.ndarray: Sorted price level of each cluster.
+        """
+        # values only order equal frequent prices, which does not change the levels, so the
+        # windowed maxima are the whole input.
+        levels_key = ("levels", symbol, reduce.__name__, backend, n_clusters, bandwidth, get_digest(prices_win))
+        levels = self._get(levels_key)
+        if levels is not None:
+            self.counters["hits"] += 1
+            return levels
+
+        prices = get_frequent_prices(prices_win, values, n_clusters, backend)
+        clusters_key = ("clusters", symbol, reduce.__name__, backend, bandwidth, get_digest(prices))
+        levels = self._get(clusters_key)
+        if levels is not None:
+            self.counters["cluster_hits"] += 1
+        else:
+            levels = cluster_frequent_prices(prices, reduce, bandwidth, backend)
+            self.counters["misses"] += 1
+            self._put(clusters_key, levels)
+        self._put(levels_key, levels)
+        return levels
+
+    def get_cluster_max_prices(
+        self,
+        symbol: str,
+        data: pd.DataFrame,
+        period: int = 5,
+        backend: str = "sklearn",
+        n_clusters: int = 5,
+        bandwidth: float = 10,
+    ) -> np.ndarray:
+        """Get the levels of stock_data_utils.get_cluster_max_prices through the cache.
+
+        Args:
+            symbol (str): Name of the stock.
+            data (pd.DataFrame): Historical stock price.
+            period (int, optional): Window period for gathering prices. Defaults to 5.
+            backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+            n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+            bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+        Returns:
+            np.ndarray: Resistance levels, sorted.
+        """
+        prices_win, values = get_windowed_prices(data, "High", period)
+        return self.get_cluster_levels(symbol, prices_win, values, np.maximum, backend, n_clusters, bandwidth)
+
+    def get_cluster_min_prices(
+        self,
+        symbol: str,
+        data: pd.DataFrame,
+        period: int = 5,
+        backend: str = "sklearn",
+        n_clusters: int = 5,
+        bandwidth: float = 10,
+    ) -> np.ndarray:
+        """Get the levels of stock_data_utils.get_cluster_min_prices through the cache.
+
+        Args:
+            symbol (str): Name of the stock.
+            data (pd.DataFrame): Historical stock price.
+            period (int, optional): Window period for gathering prices. Defaults to 5.
+            backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+            n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+            bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+        Returns:
+            np.ndarray: Support levels, sorted.
+        """
+        prices_win, values = get_windowed_prices(data, "Low", period)
+        return self.get_cluster_levels(symbol, prices_win, values, np.minimum, backend, n_clusters, bandwidth)
+
+    def subset(self, symbol: str) -> "LevelCache":
+        """Get a cache holding only the entries of a stock, small enough to send to a worker process.
+
+        Args:
+            symbol (str): Name of the stock.
+
+        Returns:
+            LevelCache: Cache with the entries of the stock and zeroed counters.
+        """
+        cache = LevelCache(self.max_entries)
+        for key in self._symbol_keys.get(symbol, ()):
+            cache._put(key, self._entries[key])
+        return cache
+
+    def merge(self, other: "LevelCache") -> None:
+        """Add the entries and counters of another cache, typically a subset updated by a worker process.
+
+        Args:
+            other (LevelCache): Cache to merge in.
+        """
+        for key, levels in other._entries.items():
+            self._put(key, levels)
+        for counter in ("hits", "cluster_hits", "misses"):
+            self.counters[counter] += other.counters[counter]
+
+    def stats(self) -> dict:
+        """Get statistics of the cache.
+
+        Returns:
+            dict: Lookup counters plus the number of entries and stocks.
+        """
+        stats = dict(self.counters)
+        stats["entries"] = len(self._entries)
+        stats["symbols"] = len(self._symbol_keys)
+        return stats
+
+    def report(self) -> str:
+        """Get a human readable summary of the cache statistics.
+
+        Returns:
+            str: Summary of the cache statistics.
+        """
+        stats = self.stats()
+        lookups = stats["hits"] + stats["cluster_hits"] + stats["misses"]
+        reused = (stats["hits"] + stats["cluster_hits"]) / lookups if lookups else 0.0
+        return (
+            f"Level cache: {lookups} lookups, {stats['hits']} hits, {stats['cluster_hits']} cluster hits, "
+            f"{stats['misses']} misses ({reused:.0%} of clusterings skipped), {stats['evictions']} evictions. "
+            f"{stats['entries']} entries for {stats['symbols']} stocks."
+        )
+
+    def save(self, path: str) -> None:
+        """Write the entries to a JSON file, oldest first.
+
+        Args:
+            path (str): Path of the file.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as cache_file:
+            json.dump({"entries": [[list(key), list(levels)] for key, levels in self._entries.items()]}, cache_file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, max_entries: int = 20000) -> "LevelCache":
+        """Read a cache saved by save, or create an empty one if the file is missing or unreadable.
+
+        Args:
+            path (str): Path of the file.
+            max_entries (int, optional): Number of entries above which least recently used entries are evicted.
+                                         Defaults to 20000.
+
+        Returns:
+            LevelCache: Cache holding the saved entries.
+        """
+        cache = cls(max_entries)
+        try:
+            with open(path) as cache_file:
+                entries = json.load(cache_file)["entries"]
+        except (OSError, ValueError, KeyError):
+            return cache
+        for key, levels in entries:
+            cache._put(tuple(key), levels)
+        cache.counters["evictions"] = 0
+        return cache
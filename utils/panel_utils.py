@@ -0,0 +1,232 @@
+"""Columnar panel of stock data for whole universe vectorized analysis."""
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.stock_data_utils import get_cluster_levels
+from utils.streaming_utils import rsi_panel
+
+PANEL_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+class OHLCVPanel:
+    """Aligned OHLCV arrays of many stocks.
+
+    Every field is an array of shape (stocks, dates) indexed by the symbols and by the union
+    of the dates of all stocks. NaN marks a date on which a stock has no bar. Windowed
+    operations run over each stock's own bars, so their results match the per stock pipeline.
+    """
+
+    def __init__(self, symbols: list, dates: pd.DatetimeIndex, fields: dict):
+        """Create a panel from arrays.
+
+        Args:
+            symbols (list): Names of the stocks, one per row.
+            dates (pd.DatetimeIndex): Dates, one per column.
+            fields (dict): Arrays of shape (stocks, dates) keyed by field name.
+        """
+        self.symbols = list(symbols)
+        self.dates = dates
+        self.fields = fields
+        self._rows = {symbol: num for num, symbol in enumerate(self.symbols)}
+
+    @classmethod
+    def from_frames(cls, frames: dict, dtype: type = np.float64) -> "OHLCVPanel":
+        """Build a panel from one dataframe per stock.
+
+        Args:
+            frames (dict): Stock data keyed by stock name, as returned by get_stock_data_bulk.
+            dtype (type, optional): Float type of the arrays, np.float32 halves memory use at the cost of
+                                    precision. Defaults to np.float64.
+
+        Returns:
+            OHLCVPanel: Panel holding the OHLCV fields of every stock.
+        """
+        symbols = list(frames)
+        indexes = [frames[symbol].index for symbol in symbols]
+        tz = next((index.tz for index in indexes if len(index)), None)
+        stamps = [_to_utc_ns(index) for index in indexes]
+        all_stamps = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+        dates = pd.DatetimeIndex(pd.to_datetime(all_stamps, utc=True), name="Date")
+        if tz is not None:
+            dates = dates.tz_convert(tz)
+
+        fields = {field: np.full((len(symbols), len(dates)), np.nan, dtype=dtype) for field in PANEL_FIELDS}
+        for row, symbol in enumerate(symbols):
+            columns = np.searchsorted(all_stamps, stamps[row])
+            data_stock = frames[symbol]
+            for field in PANEL_FIELDS:
+                if field in data_stock:
+                    fields[field][row, columns] = data_stock[field].to_numpy(dtype=dtype)
+        return cls(symbols, dates, fields)
+
+    @property
+    def shape(self) -> tuple:
+        """Number of stocks and of dates."""
+        return len(self.symbols), len(self.dates)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the arrays of the panel."""
+        return sum(values.nbytes for values in self.fields.values()) + self.dates.nbytes
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """Get the array of one field."""
+        return self.fields[field]
+
+    def to_frame(self, symbol: str) -> pd.DataFrame:
+        """Get the data of one stock as a dataframe, like get_stock_data returns it.
+
+        Args:
+            symbol (str): Name of the stock.
+
+        Returns:
+            pd.DataFrame: OHLCV data on the dates the stock has a bar.
+        """
+        row = self._rows[symbol]
+        valid = ~np.isnan(self.fields["Close"][row])
+        return pd.DataFrame(
+            {field: values[row, valid] for field, values in self.fields.items()}, index=self.dates[valid]
+        )
+
+    def bar_counts(self) -> np.ndarray:
+        """Get the number of bars of every stock."""
+        return np.count_nonzero(~np.isnan(self.fields["Close"]), axis=1)
+
+    def packed(self, field: str) -> np.ndarray:
+        """Get a field with each stock's bars shifted right, so that column -1 holds every last bar.
+
+        Args:
+            field (str): Name of the field.
+
+        Returns:
+            np.ndarray: Array of shape (stocks, dates), NaN padded on the left.
+        """
+        return self.packed_fields([field])[:, 0]
+
+    def packed_fields(self, fields: Sequence[str]) -> np.ndarray:
+        """Get several fields packed like packed(), finding the dates of every stock once.
+
+        Args:
+            fields (Sequence[str]): Names of the fields.
+
+        Returns:
+            np.ndarray: Array of shape (stocks, fields, dates), NaN padded on the left.
+        """
+        valid = ~np.isnan(self.fields["Close"])
+        order = np.argsort(valid, axis=1, kind="stable")
+        padding = ~np.take_along_axis(valid, order, axis=1)
+        packed = np.stack([np.take_along_axis(self.fields[field], order, axis=1) for field in fields], axis=1)
+        packed[np.broadcast_to(padding[:, np.newaxis], packed.shape)] = np.nan
+        return packed
+
+    def packed_row(self, field: str, row: int) -> np.ndarray:
+        """Get the bars of one stock for a field, without missing dates."""
+        values = self.fields[field][row]
+        return values[~np.isnan(self.fields["Close"][row])]
+
+    def last_close(self) -> np.ndarray:
+        """Get the last closing price of every stock."""
+        return self.packed("Close")[:, -1]
+
+    def rsi(self) -> np.ndarray:
+        """Get the RSI of every stock, NaN on dates without a bar.
+
+        Returns:
+            np.ndarray: Array of shape (stocks, dates) with the values add_rsi computes per stock.
+        """
+        return rsi_panel(self.fields["Close"].astype(float))
+
+    def cluster_windows(self, field: str, period: int = 5) -> np.ndarray:
+        """Get the windowed maxima which get_cluster_max_prices and get_cluster_min_prices cluster.
+
+        Args:
+            field (str): 'High' for resistance or 'Low' for support levels.
+            period (int, optional): Window period for gathering prices. Defaults to 5.
+
+        Returns:
+            np.ndarray: Array of shape (stocks, dates - period - 1) in packed coordinates, NaN for
+                windows before a stock's first bar.
+        """
+        packed = self.packed(field)
+        num_windows = packed.shape[1] - period - 1
+        if num_windows <= 0:
+            return np.empty((packed.shape[0], 0), dtype=packed.dtype)
+        return sliding_window_view(packed, period, axis=1)[:, :num_windows].max(axis=2)
+
+    def levels(self, period: int = 5, backend: str = "sklearn") -> dict:
+        """Cluster the support and resistance levels of every stock.
+
+        The windowed maxima of all stocks are found at once, but the clustering runs one stock at
+        a time since every stock has its own frequent prices and clusters. Use prescreen_panel first
+        to leave out the stocks which cannot trigger a signal.
+
+        Args:
+            period (int, optional): Window period for gathering prices. Defaults to 5.
+            backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+
+        Returns:
+            dict: (support levels, resistance levels) keyed by stock name. Stocks for which no
+                  levels can be found are left out.
+        """
+        levels = {}
+        windows = {field: self.cluster_windows(field, period) for field in ("High", "Low")}
+        for row, symbol in enumerate(self.symbols):
+            try:
+                cluster_max_prices, cluster_min_prices = [
+                    get_cluster_levels(
+                        _drop_nan(windows[field][row]).astype(float),
+                        self.packed_row(field, row).astype(float),
+                        reduce,
+                        backend,
+                    )
+                    for field, reduce in (("High", np.maximum), ("Low", np.minimum))
+                ]
+            except ValueError:
+                continue
+            levels[symbol] = (cluster_min_prices, cluster_max_prices)
+        return levels
+
+    def signals(
+        self, levels: dict, within_support_percentage: float = 2, close: Optional[np.ndarray] = None
+    ) -> pd.DataFrame:
+        """Get buy and sell signals of every stock at once.
+
+        Args:
+            levels (dict): (support levels, resistance levels) keyed by stock name, as returned by levels().
+            within_support_percentage (float, optional): Distance from a level, in percent of the close,
+                                                         which triggers a signal. Defaults to 2.
+            close (np.ndarray, optional): Closing price of every stock. Defaults to the last close.
+
+        Returns:
+            pd.DataFrame: close, support, resistance, buy and sell columns indexed by stock name.
+        """
+        close = self.last_close() if close is None else close
+        support = np.array([levels[symbol][0][0] if symbol in levels else np.nan for symbol in self.symbols])
+        resistance = np.array([levels[symbol][1][-1] if symbol in levels else np.nan for symbol in self.symbols])
+        delta = close * (within_support_percentage / 100)
+        return pd.DataFrame(
+            {
+                "close": close,
+                "support": support,
+                "resistance": resistance,
+                "buy": (support > close - delta) & (support < close + delta),
+                "sell": (resistance > close - delta) & (resistance < close + delta),
+            },
+            index=pd.Index(self.symbols, name="Symbol"),
+        )
+
+
+def _to_utc_ns(index: pd.DatetimeIndex) -> np.ndarray:
+    """Get a date index as UTC nanosecond timestamps."""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC")
+    return index.as_unit("ns").asi8
+
+
+def _drop_nan(values: np.ndarray) -> np.ndarray:
+    """Get the values which are not NaN."""
+    return values[~np.isnan(values)]
@@ -1,21 +1,188 @@
 from reportlab.pdfgen import canvas
 import os
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from PIL import Image
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import cm
 
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+ROWS_PER_SUMMARY_PAGE = 40
+# Parts of this size stay within the 25 MB limit of most email providers once base64 encoded.
+MAX_PART_BYTES = 16*1024*1024
+
+def find_images(img_dir: str) -> List[str]:
+    """Find the images of a directory and of its per company subdirectories.
+
+    Args:
+        img_dir (str): Directory containing images, directly or in one subdirectory per company.
+
+    Returns:
+        List[str]: Full paths of the images, sorted.
+    """
+    images_list = []
+    for folder, _, files in os.walk(img_dir):
+        images_list.extend(os.path.join(folder, name) for name in files if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(images_list)
+
+def prepare_image(image_path: str, jpeg_path: str, max_width: Optional[int]=1000, quality: int=85) -> int:
+    """Scale down an image and save it as JPEG, which reportlab embeds in a PDF without decoding it.
+
+    Args:
+        image_path (str): Path of the image.
+        jpeg_path (str): Path of the JPEG file to write.
+        max_width (int, optional): Maximum width in pixels, the original width if None. Defaults to 1000.
+        quality (int, optional): JPEG quality. Defaults to 85.
+
+    Returns:
+        int: Size of the JPEG file in bytes.
+    """
+    with Image.open(image_path) as image:
+        image = image.convert("RGB")
+        if max_width is not None and image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        image.save(jpeg_path, format="JPEG", quality=quality)
+    return os.path.getsize(jpeg_path)
+
+def _iter_prepared_images(images_list: List[str], jpeg_dir: str, workers: int, max_width: Optional[int],
+                          quality: int) -> Iterator[Tuple[str, str, object]]:
+    """Prepare images in order, with at most 2*workers of them in flight.
+
+    Yields the path of each image, the path of its JPEG and the size of the JPEG or the error preparing it.
+    """
+    jobs = ((image_path, os.path.join(jpeg_dir, f"{num}.jpg")) for num, image_path in enumerate(images_list))
+    if workers <= 1:
+        for image_path, jpeg_path in jobs:
+            try:
+                yield image_path, jpeg_path, prepare_image(image_path, jpeg_path, max_width, quality)
+            except Exception as error:
+                yield image_path, jpeg_path, error
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for image_path, jpeg_path in jobs:
+            future = executor.submit(prepare_image, image_path, jpeg_path, max_width, quality)
+            pending.append((image_path, jpeg_path, future))
+            while len(pending) > 2 * workers:
+                yield _pop_image(pending)
+        while pending:
+            yield _pop_image(pending)
+
+def _pop_image(pending: deque) -> Tuple[str, str, object]:
+    """Wait for the oldest pending image and return its JPEG size or error."""
+    image_path, jpeg_path, future = pending.popleft()
+    try:
+        return image_path, jpeg_path, future.result()
+    except Exception as error:
+        return image_path, jpeg_path, error
+
+@contextmanager
+def _binary_streams() -> Iterator[None]:
+    """Embed the images and pages drawn within as binary rather than ASCII85, which is slower and a quarter larger.
+
+    reportlab reads the process wide rl_config.useA85 when an image is drawn, a page is shown and a PDF is saved,
+    so it is set around those calls only and restored after them.
+    """
+    use_a85, rl_config.useA85 = rl_config.useA85, 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = use_a85
+
+def draw_summary_pages(pdf_file: canvas.Canvas, buy_sell_stock: dict) -> None:
+    """Draw a table of the stocks with a buy or sell call.
+
+    Args:
+        pdf_file (canvas.Canvas): PDF to draw on.
+        buy_sell_stock (dict): Buy and sell lists keyed by company, as written to buy_sell.csv.
+    """
+    rows = [(company, ", ".join(map(str, calls["buy"])), ", ".join(map(str, calls["sell"])))
+            for company, calls in buy_sell_stock.items() if calls["buy"] or calls["sell"]]
+    _, height = A4
+    for start in range(0, max(len(rows), 1), ROWS_PER_SUMMARY_PAGE):
+        pdf_file.setFont("Helvetica-Bold", 14)
+        pdf_file.drawString(2*cm, height - 2*cm, f"Buy sell calls for {len(rows)} of {len(buy_sell_stock)} stocks")
+        y = height - 3.2*cm
+        for num, (company, buy, sell) in enumerate([("Company", "Buy", "Sell")] + rows[start:start + ROWS_PER_SUMMARY_PAGE]):
+            pdf_file.setFont("Helvetica-Bold" if num == 0 else "Helvetica", 10)
+            pdf_file.drawString(2*cm, y, company)
+            pdf_file.drawString(9*cm, y, buy)
+            pdf_file.drawString(14*cm, y, sell)
+            y -= 0.6*cm
+        pdf_file.showPage()
+
+def create_report(img_dir: str, pdf_file_path: str, buy_sell_stock: Optional[dict]=None, workers: int=1,
+                  max_part_bytes: int=MAX_PART_BYTES, max_width: Optional[int]=1000, quality: int=85,
+                  images_list: Optional[List[str]]=None) -> List[str]:
+    """Create a PDF report with a summary table and one page per chart.
+
+    Images are scaled down and encoded as JPEG in worker processes while earlier ones are drawn.
+    A PDF is only written to disk once complete, so the images of a part are held in memory
+    until then. When they would exceed max_part_bytes the report is split into numbered parts,
+    <name>_1.pdf, <name>_2.pdf and so on, which keeps memory bounded however many charts there are.
+    Every part should be sent on, send_email_to_people sends each in its own email.
+
+    Args:
+        img_dir (str): Directory containing images, directly or in one subdirectory per company.
+        pdf_file_path (str): Path where pdf file needs to be created.
+        buy_sell_stock (dict, optional): Buy and sell lists keyed by company for the summary page. Defaults to None.
+        workers (int, optional): Number of processes preparing images, 1 to prepare them in this process. Defaults to 1.
+        max_part_bytes (int, optional): Maximum size of the images of one PDF file. Defaults to 16 MB.
+        max_width (int, optional): Maximum width of the images in pixels, the original width if None. Defaults to 1000.
+        quality (int, optional): JPEG quality of the images. Defaults to 85.
+        images_list (List[str], optional): Images to add, in order, instead of every image of img_dir, which may
+                                           hold charts of earlier runs. Defaults to None.
+
+    Returns:
+        List[str]: Paths of the PDF files written.
+    """
+    stem, extension = os.path.splitext(pdf_file_path)
+    temporary_path = f"{pdf_file_path}.tmp"
+    written = []
+    with tempfile.TemporaryDirectory() as jpeg_dir:
+        pdf_file = canvas.Canvas(temporary_path)
+        if buy_sell_stock is not None:
+            with _binary_streams():
+                draw_summary_pages(pdf_file, buy_sell_stock)
+        part_bytes = 0
+        pages = 0
+        if images_list is None:
+            images_list = find_images(img_dir)
+        for image_path, jpeg_path, size in _iter_prepared_images(images_list, jpeg_dir, workers, max_width, quality):
+            if isinstance(size, Exception):
+                print(f"Could not add {image_path} to the report: {size}")
+                continue
+            if pages and part_bytes + size > max_part_bytes:
+                with _binary_streams():
+                    pdf_file.save()
+                written.append(f"{stem}_{len(written) + 1}{extension}")
+                os.replace(temporary_path, written[-1])
+                pdf_file = canvas.Canvas(temporary_path)
+                part_bytes = 0
+                pages = 0
+            with _binary_streams():
+                pdf_file.drawImage(jpeg_path, 0, 200, 20*cm, 18*cm)
+                pdf_file.showPage()
+            os.remove(jpeg_path)
+            part_bytes += size
+            pages += 1
+        with _binary_streams():
+            pdf_file.save()
+    written.append(f"{stem}_{len(written) + 1}{extension}" if written else pdf_file_path)
+    os.replace(temporary_path, written[-1])
+    return written
+
 def create_pdf_from_list_of_images(img_dir: str, pdf_file_path: str) -> None:
     """Create pdf from a list of images in a directory.
 
     Args:
-        img_dir (str): Directory containing images.
+        img_dir (str): Directory containing images, directly or in one subdirectory per company.
         pdf_file_path (str): Path where pdf file needs to be created.
     """
-    pdf_file = canvas.Canvas(pdf_file_path)
-    images_list = sorted(os.listdir(img_dir))
-    if len(images_list)>0:
-        for image_path in images_list:
-            try:
-                pdf_file.drawImage(image_path, 0, 200, 20*cm, 18*cm)
-                pdf_file.showPage()
-            except:
-                pass
-    pdf_file.save() 
\ No newline at end of file
+    create_report(img_dir, pdf_file_path)
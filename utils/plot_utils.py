@@ -1,4 +1,6 @@
 """Utils for plotting stock charts."""
+from typing import Optional, Sequence, Union
+
 import pandas as pd
 from plotly.subplots import make_subplots
 import plotly.graph_objs as go
@@ -16,53 +18,15 @@ def plot_support_resistance(
         company (str, optional): name of the company to which the stock belongs. Defaults to 'Company'.
 
     """
-    low_time = data_stock.index
-    low_px = label_sort_min[0]
-
-    high_time = data_stock.index
-    high_px = label_sort_max[1]
-
-    low_inner_time = data_stock.index
-    low_inner_px = label_sort_min[1]
-
-    high_inner_time = data_stock.index
-    high_inner_px = label_sort_max[0]
-
     layout = get_layout(title=company)
-
-    data = [
-        go.Candlestick(
-            x=data_stock.index,
-            open=data_stock["Open"],
-            high=data_stock["High"],
-            low=data_stock["Low"],
-            close=data_stock["Close"],
-            name="candlestick",
-        ),
-        go.Scatter(
-            x=data_stock.index,
-            y=[low_px for x in range(len(low_time))],
-            line=dict(color="firebrick", width=4),
-            name="Closest Support",
-        ),
-        go.Scatter(
-            x=data_stock.index,
-            y=[high_px for x in range(len(high_time))],
-            line=dict(color="royalblue", width=4),
-            name="Closest Resistance",
-        ),
-        go.Scatter(
-            x=data_stock.index,
-            y=[high_inner_px for x in range(len(high_inner_time))],
-            line=dict(color="royalblue", width=2),
-            name="Lower Resistance",
-        ),
-        go.Scatter(
-            x=data_stock.index,
-            y=[low_inner_px for x in range(len(low_inner_time))],
-            line=dict(color="firebrick", width=2),
-            name="Upper Support",
-        ),
+    data = get_data(data_stock)
+    x = data[0].x
+
+    data += [
+        get_level_trace(x, label_sort_min[0], "firebrick", 4, name="Closest Support"),
+        get_level_trace(x, label_sort_max[1], "royalblue", 4, name="Closest Resistance"),
+        get_level_trace(x, label_sort_max[0], "royalblue", 2, name="Lower Resistance"),
+        get_level_trace(x, label_sort_min[1], "firebrick", 2, name="Upper Support"),
     ]
     figSignal = go.Figure(data=data, layout=layout)
     figSignal.show()
@@ -90,9 +54,48 @@ def get_layout(title="Company Name") -> dict:
     return layout
 
 
+def get_x_axis(index: pd.DatetimeIndex) -> Union[list, pd.DatetimeIndex]:
+    """Get the x axis values of a chart in their most compact form.
+
+    Daily bars are plotted at midnight, so their dates are serialized as 'YYYY-MM-DD' rather
+    than as full timestamps with a timezone offset, which plotly ignores anyway.
+
+    Args:
+        index (pd.DatetimeIndex): Dates of the stock data.
+
+    Returns:
+        Union[list, pd.DatetimeIndex]: Dates as strings if they are all at midnight, else the index itself.
+    """
+    index = pd.DatetimeIndex(index)
+    if len(index) and (index == index.normalize()).all():
+        return list(index.strftime("%Y-%m-%d"))
+    return index
+
+
+def get_level_trace(x: Sequence, px: float, color: str, width: int, name: Optional[str] = None) -> go.Scatter:
+    """Get a horizontal line at a price level spanning the chart.
+
+    The line is drawn through its two end points only, instead of one point per bar.
+
+    Args:
+        x (Sequence): x axis values of the chart, as set on its candlestick trace.
+        px (float): Price of the level.
+        color (str): Line color.
+        width (int): Line width.
+        name (str, optional): Legend name of the level. Defaults to plotly's trace name.
+
+    Returns:
+        go.Scatter: Line trace of the level.
+    """
+    return go.Scatter(x=[x[0], x[-1]], y=[px, px], mode="lines", line=dict(color=color, width=width), name=name)
+
+
 def get_data(data_stock: pd.DataFrame) -> list:
     """Get data of as a candlestick figure.
 
+    The dates are converted by get_x_axis here only, the other traces of a chart reuse the x
+    values of the candlestick trace.
+
     Args:
         data_stock (pd.DataFrame): Stock data as a pandas dataframe.
 
@@ -102,7 +105,7 @@ def get_data(data_stock: pd.DataFrame) -> list:
     """
     data = [
         go.Candlestick(
-            x=data_stock.index,
+            x=get_x_axis(data_stock.index),
             open=data_stock["Open"],
             high=data_stock["High"],
             low=data_stock["Low"],
@@ -113,6 +116,35 @@ def get_data(data_stock: pd.DataFrame) -> list:
     return data
 
 
+def get_signal_figure(
+    cluster_min_prices: list, cluster_max_prices: list, data_stock: pd.DataFrame, data: list, layout: dict
+) -> go.Figure:
+    """Get the chart of a stock with its outer support resistance levels and RSI.
+
+    Args:
+        cluster_min_prices (list): List of min prices after clustering.
+        cluster_max_prices (list): List of max prices after clustering.
+        data_stock (pd.DataFrame): Dataframe containing stock data with an rsi column.
+        data (list): List containing plotly figures, the candlestick trace first.
+        layout (dict): Layout od the plotly figure.
+
+    Returns:
+        go.Figure: Candlesticks and levels on the first row, RSI on the second.
+
+    """
+    fig = go.Figure(data=data, layout=layout)
+    figSignal = make_subplots(rows=2, cols=1, figure=fig)
+    x = data[0].x
+    for px in cluster_max_prices[-2:]:
+        figSignal.add_trace(get_level_trace(x, px, "firebrick", 4), row=1, col=1)
+
+    for px in cluster_min_prices[:2]:
+        figSignal.add_trace(get_level_trace(x, px, "royalblue", 4), row=1, col=1)
+
+    figSignal.add_trace(go.Scatter(x=x, y=data_stock["rsi"], line=dict(color="orange", width=4)), row=2, col=1)
+    return figSignal
+
+
 def images_for_stocks_to_buy(
     close_last: float,
     delta: float,
@@ -139,34 +171,7 @@ def images_for_stocks_to_buy(
 
     """
     if cluster_min_prices[0] > (close_last - delta) and cluster_min_prices[0] < (close_last + delta):
-        fig = go.Figure(data=data, layout=layout)
-        figSignal = make_subplots(rows=2, cols=1, figure=fig)
-        for px in cluster_max_prices[-2:]:
-            figSignal.add_trace(
-                go.Scatter(
-                    x=data_stock.index,
-                    y=[px for _ in range(len(data_stock.index))],
-                    line=dict(color="firebrick", width=4),
-                ),
-                row=1,
-                col=1,
-            )
-
-        for px in cluster_min_prices[:2]:
-            figSignal.add_trace(
-                go.Scatter(
-                    x=data_stock.index,
-                    y=[px for _ in range(len(data_stock.index))],
-                    line=dict(color="royalblue", width=4),
-                ),
-                row=1,
-                col=1,
-            )
-
-        figSignal.add_trace(
-            go.Scatter(x=data_stock.index, y=data_stock["rsi"], line=dict(color="orange", width=4)), row=2, col=1
-        )
-
+        figSignal = get_signal_figure(cluster_min_prices, cluster_max_prices, data_stock, data, layout)
         figSignal.write_image("buy_sell_images/{}/BUY_{}_{}.png".format(company, end, close_last), engine="kaleido")
 
 
@@ -196,32 +201,5 @@ def images_for_stocks_to_sell(
 
     """
     if cluster_max_prices[-1] > (close_last - delta) and cluster_max_prices[-1] < (close_last + delta):
-        fig = go.Figure(data=data, layout=layout)
-        figSignal = make_subplots(rows=2, cols=1, figure=fig)
-        for px in cluster_max_prices[-2:]:
-            figSignal.add_trace(
-                go.Scatter(
-                    x=data_stock.index,
-                    y=[px for _ in range(len(data_stock.index))],
-                    line=dict(color="firebrick", width=4),
-                ),
-                row=1,
-                col=1,
-            )
-
-        for px in cluster_min_prices[:2]:
-            figSignal.add_trace(
-                go.Scatter(
-                    x=data_stock.index,
-                    y=[px for _ in range(len(data_stock.index))],
-                    line=dict(color="royalblue", width=4),
-                ),
-                row=1,
-                col=1,
-            )
-
-        figSignal.add_trace(
-            go.Scatter(x=data_stock.index, y=data_stock["rsi"], line=dict(color="orange", width=4)), row=2, col=1
-        )
-
+        figSignal = get_signal_figure(cluster_min_prices, cluster_max_prices, data_stock, data, layout)
         figSignal.write_image("buy_sell_images/{}/SELL_{}_{}.png".format(company, end, close_last), engine="kaleido")
@@ -0,0 +1,198 @@
+"""Per stock, per stage timing of analysis runs and machine readable run reports."""
+import csv
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+RUN_STAGE = "run"
+
+
+class StageTimer:
+    """Wall and CPU time of the stages of one task, such as the analysis of one stock.
+
+    CPU time is that of the calling thread, so stages timed in threads running side by side
+    do not count each other's work.
+    """
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage, adding to its previous time if it was already timed.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall_total, cpu_total = self.timings.get(name, (0.0, 0.0))
+            self.timings[name] = (
+                wall_total + time.perf_counter() - wall,
+                cpu_total + time.thread_time() - cpu,
+            )
+
+
+def timed_call(function: Callable, *args) -> Tuple[object, float, float]:
+    """Call a function and measure it, for work sent to another process.
+
+    Args:
+        function (Callable): Function to call.
+        *args: Arguments of the function.
+
+    Returns:
+        Tuple[object, float, float]: Result of the function, wall time and CPU time in seconds.
+    """
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = function(*args)
+    return result, time.perf_counter() - wall, time.thread_time() - cpu
+
+
+def peak_memory_mb() -> dict:
+    """Get the peak resident memory of this process and of its finished child processes.
+
+    Returns:
+        dict: Peak memory in MB of 'self' and 'children', empty where it cannot be measured.
+    """
+    if resource is None:
+        return {}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    }
+
+
+class RunProfiler:
+    """Collects stage timings and event counts of a run, per stock.
+
+    Timings and counts may be recorded from several threads. Work done by other processes is
+    timed there, with StageTimer or timed_call, and added with add_timings.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.timings = []
+        self.counters = defaultdict(Counter)
+        self._lock = threading.Lock()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, symbol: Optional[str], name: str) -> Iterator[None]:
+        """Time a stage of a stock.
+
+        Args:
+            symbol (str): Name of the stock, None for stages of the whole run.
+            name (str): Name of the stage.
+        """
+        timer = StageTimer()
+        try:
+            with timer.stage(name):
+                yield
+        finally:
+            self.add_timings(symbol, timer.timings)
+
+    def add_timings(self, symbol: Optional[str], timings: dict) -> None:
+        """Record stage timings measured elsewhere.
+
+        Args:
+            symbol (str): Name of the stock, None for stages of the whole run.
+            timings (dict): (wall time, CPU time) in seconds keyed by stage name.
+        """
+        with self._lock:
+            for name, (wall, cpu) in timings.items():
+                self.timings.append((symbol or RUN_STAGE, name, wall, cpu))
+
+    def count(self, symbol: Optional[str], name: str, n: int = 1) -> None:
+        """Count an event of a stock, such as a retry or a failure.
+
+        Args:
+            symbol (str): Name of the stock, None for events of the whole run.
+            name (str): Name of the event.
+            n (int, optional): Number of events. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[symbol or RUN_STAGE][name] += n
+
+    def report(self) -> dict:
+        """Get the run report.
+
+        Returns:
+            dict: Run totals, peak memory, per stage totals, event counts and per stock timings.
+        """
+        with self._lock:
+            timings = list(self.timings)
+            counters = {symbol: dict(counts) for symbol, counts in self.counters.items()}
+        stages = {}
+        symbols = defaultdict(dict)
+        for symbol, name, wall, cpu in timings:
+            stage = stages.setdefault(name, {"count": 0, "wall": 0.0, "cpu": 0.0, "max_wall": 0.0})
+            stage["count"] += 1
+            stage["wall"] += wall
+            stage["cpu"] += cpu
+            stage["max_wall"] = max(stage["max_wall"], wall)
+            symbol_wall, symbol_cpu = symbols[symbol].get(name, (0.0, 0.0))
+            symbols[symbol][name] = (symbol_wall + wall, symbol_cpu + cpu)
+        totals = Counter()
+        for counts in counters.values():
+            totals.update(counts)
+        return {
+            "started_at": self.started_at,
+            "wall": time.perf_counter() - self._wall,
+            "cpu": time.process_time() - self._cpu,
+            "peak_memory_mb": peak_memory_mb(),
+            "stages": stages,
+            "counters": dict(totals),
+            "symbols": {
+                symbol: {
+                    "stages": {name: {"wall": wall, "cpu": cpu} for name, (wall, cpu) in symbol_stages.items()},
+                    "counters": counters.get(symbol, {}),
+                }
+                for symbol, symbol_stages in symbols.items()
+            },
+        }
+
+    def write(self, json_path: str) -> Tuple[str, str]:
+        """Write the run report as JSON, and every timing as CSV next to it.
+
+        Args:
+            json_path (str): Path of the JSON report, the CSV file takes the same name with a .csv extension.
+
+        Returns:
+            Tuple[str, str]: Paths of the JSON and CSV files.
+        """
+        csv_path = os.path.splitext(json_path)[0] + ".csv"
+        with open(json_path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+        with self._lock:
+            timings = list(self.timings)
+        with open(csv_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["symbol", "stage", "wall", "cpu"])
+            writer.writerows(timings)
+        return json_path, csv_path
+
+    def summary(self) -> str:
+        """Get a table of the total time of every stage, for printing."""
+        report = self.report()
+        lines = [f"{'stage':20s} {'count':>6s} {'wall s':>9s} {'cpu s':>9s} {'max wall s':>11s}"]
+        for name, stage in report["stages"].items():
+            lines.append(
+                f"{name:20s} {stage['count']:6d} {stage['wall']:9.3f} {stage['cpu']:9.3f} {stage['max_wall']:11.3f}"
+            )
+        lines.append(f"run wall {report['wall']:.3f} s, cpu {report['cpu']:.3f} s, counts {report['counters']}")
+        return "\n".join(lines)
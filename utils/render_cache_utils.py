@@ -0,0 +1,237 @@
+"""Content addressed cache of rendered charts, so that charts whose content did not change are not rendered again."""
+import hashlib
+import os
+import shutil
+from typing import Iterable, List, Tuple
+
+IMAGE_FORMAT = "png"
+USED_SUFFIX = ".used"
+
+
+def get_chart_key(figure: str) -> str:
+    """Get the content address of a chart.
+
+    The figure JSON holds the plotted series, the levels and the layout, so two charts with the
+    same key render to the same image.
+
+    Args:
+        figure (str): Plotly figure as JSON.
+
+    Returns:
+        str: Hex digest of the figure and the image format.
+    """
+    digest = hashlib.sha256(figure.encode())
+    digest.update(IMAGE_FORMAT.encode())
+    return digest.hexdigest()
+
+
+def _replace_with_link(source: str, path: str) -> None:
+    """Make path a hard link to source, or a copy of it where links are not supported."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class RenderCache:
+    """Store of rendered images keyed by the content address of their chart.
+
+    Images are kept as <root>/<key[:2]>/<key>.png. The image files of a chart are hard links to
+    its cached image, so a chart found in the cache is written without rendering it, and the
+    same image written to several files, such as the buy and sell charts of a stock or the same
+    chart on successive runs, is stored once. The last use of a cached image is the modification
+    time of an empty <key>.used file next to it. It is not tracked on the image itself, whose
+    modification time is shared by every chart file linked to it.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 200 * 1024 * 1024):
+        """Create a cache rooted at a directory.
+
+        Args:
+            root (str): Directory in which the images are stored.
+            max_bytes (int, optional): Size of the cache above which least recently used images are evicted.
+                                       Defaults to 200 MB.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        # Size of the cached images, counted on the first add so that runs which only hit never list the cache.
+        self._bytes = None
+        os.makedirs(root, exist_ok=True)
+
+    def _image_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{IMAGE_FORMAT}")
+
+    @staticmethod
+    def _mark_used(image_path: str) -> None:
+        """Set the last use of a cached image to now."""
+        used_path = os.path.splitext(image_path)[0] + USED_SUFFIX
+        with open(used_path, "a"):
+            pass
+        os.utime(used_path)
+
+    def link(self, figure: str, paths: List[str]) -> int:
+        """Write the files of a chart from the cache, if its image is cached.
+
+        Args:
+            figure (str): Plotly figure as JSON.
+            paths (List[str]): Image files of the chart.
+
+        Returns:
+            int: Number of files written, 0 if the chart is not cached and must be rendered.
+        """
+        image_path = self._image_path(get_chart_key(figure))
+        if not os.path.exists(image_path):
+            self.counters["misses"] += 1
+            return 0
+        self._mark_used(image_path)
+        for path in paths:
+            if not self._same_file(image_path, path):
+                _replace_with_link(image_path, path)
+        self.counters["hits"] += 1
+        return len(paths)
+
+    def add(self, figure: str, paths: List[str]) -> None:
+        """Add the image of a rendered chart to the cache and link every file of the chart to it.
+
+        Args:
+            figure (str): Plotly figure as JSON.
+            paths (List[str]): Image files of the chart, already written.
+        """
+        if not paths:
+            return
+        image_path = self._image_path(get_chart_key(figure))
+        if self._bytes is None:
+            self._bytes = sum(size for _, size, _ in self._images())
+        if not os.path.exists(image_path):
+            _replace_with_link(paths[0], image_path)
+            self._bytes += os.path.getsize(image_path)
+        self._mark_used(image_path)
+        for path in paths:
+            if not self._same_file(image_path, path):
+                _replace_with_link(image_path, path)
+        if self._bytes > self.max_bytes:
+            self.evict()
+
+    @staticmethod
+    def _same_file(first: str, second: str) -> bool:
+        try:
+            return os.path.samefile(first, second)
+        except OSError:
+            return False
+
+    def _images(self) -> List[Tuple[float, int, str]]:
+        """Get every cached image as (last use time, size in bytes, path)."""
+        images = []
+        for folder in os.scandir(self.root):
+            if not folder.is_dir():
+                continue
+            stats = {}
+            for entry in os.scandir(folder.path):
+                try:
+                    stats[entry.name] = entry.stat()
+                except OSError:
+                    continue
+            for name, stat in stats.items():
+                key, extension = os.path.splitext(name)
+                if extension != f".{IMAGE_FORMAT}":
+                    continue
+                used = stats.get(key + USED_SUFFIX, stat)
+                images.append((used.st_mtime, stat.st_size, os.path.join(folder.path, name)))
+        return images
+
+    def evict(self) -> None:
+        """Remove least recently used images until the cache fits in max_bytes.
+
+        Chart files linked to an evicted image keep their content.
+        """
+        images = sorted(self._images())
+        total = sum(size for _, size, _ in images)
+        for _, size, path in images:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            try:
+                os.remove(os.path.splitext(path)[0] + USED_SUFFIX)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.counters["evictions"] += 1
+        self._bytes = total
+
+    def stats(self) -> dict:
+        """Get statistics of the cache.
+
+        Returns:
+            dict: Lookup counters plus the number of images and bytes on disk.
+        """
+        images = self._images()
+        stats = dict(self.counters)
+        stats["images"] = len(images)
+        stats["bytes"] = sum(size for _, size, _ in images)
+        return stats
+
+    def report(self) -> str:
+        """Get a human readable summary of the cache statistics.
+
+        Returns:
+            str: Summary of the cache statistics.
+        """
+        stats = self.stats()
+        return (
+            f"Render cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions. "
+            f"{stats['images']} images using {stats['bytes'] / 1024 / 1024:.1f} MB."
+        )
+
+
+def prune_charts(folder: str, keep: Iterable[str], max_bytes: int, extensions: Tuple[str, ...] = (".png",)) -> int:
+    """Remove the oldest chart files of an image folder until it fits in max_bytes.
+
+    Files linked to the same image are counted once and their age is the modification time of
+    that image, which is when it was rendered. Files in keep, the charts of the current run, are
+    never removed.
+
+    Args:
+        folder (str): Folder holding one image folder per stock.
+        keep (Iterable[str]): Paths of the chart files to keep.
+        max_bytes (int): Size of the folder above which old charts are removed.
+        extensions (Tuple[str, ...], optional): Extensions of the chart files. Defaults to ('.png',).
+
+    Returns:
+        int: Number of files removed.
+    """
+    keep = {os.path.abspath(path) for path in keep}
+    charts, sizes = [], {}
+    for directory, _, files in os.walk(folder):
+        for name in files:
+            if not name.lower().endswith(extensions):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            inode = (stat.st_dev, stat.st_ino)
+            sizes[inode] = stat.st_size
+            if os.path.abspath(path) not in keep:
+                charts.append((stat.st_mtime, path, inode))
+    total = sum(sizes.values())
+    links = {}
+    for _, _, inode in charts:
+        links[inode] = links.get(inode, 0) + 1
+    removed = 0
+    for _, path, inode in sorted(charts):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        removed += 1
+        links[inode] -= 1
+        # The space of an image is freed with the last of its files, unless a kept chart links to it.
+        if links[inode] == 0 and inode in sizes:
+            total -= sizes.pop(inode)
+    return removed
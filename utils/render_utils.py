@@ -0,0 +1,265 @@
+"""Batched rendering of stock charts through persistent Kaleido renderers.
+
+Plotly is imported by the functions building and rendering charts, so that runs which skip
+charts never load it.
+"""
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.profile_utils import RunProfiler, timed_call
+from utils.render_cache_utils import RenderCache
+
+RENDER_MODES = ("now", "defer", "skip")
+
+
+@dataclass
+class ChartJob:
+    """A chart to render and the files it is written to.
+
+    Attributes:
+        figure (str): Plotly figure as JSON.
+        paths (list): Image files the rendered chart is written to.
+        symbol (str): Name of the stock charted.
+    """
+
+    figure: str
+    paths: List[str] = field(default_factory=list)
+    symbol: str = ""
+
+
+def signal_chart_path(folder: str, company: str, signal: str, end: str, close_last: float) -> str:
+    """Get the image file of the buy or sell chart of a stock.
+
+    Args:
+        folder (str): Folder holding one image folder per company.
+        company (str): Name of the company.
+        signal (str): BUY or SELL.
+        end (str): End date of the data.
+        close_last (float): Last closing price of the stock.
+
+    Returns:
+        str: Path of the image.
+    """
+    return "{}/{}/{}_{}_{}.png".format(folder, company, signal, end, close_last)
+
+
+def signal_chart_job(
+    close_last: float,
+    delta: float,
+    cluster_min_prices: np.ndarray,
+    cluster_max_prices: np.ndarray,
+    data_stock: pd.DataFrame,
+    company: str,
+    data: list,
+    layout: dict,
+    end: str,
+    folder: str = "buy_sell_images",
+) -> Optional[ChartJob]:
+    """Get the chart job of a stock, which images_for_stocks_to_buy and images_for_stocks_to_sell would write.
+
+    The buy and sell charts of a stock are the same figure, so it is built once and written to
+    both files when both signals trigger.
+
+    Args:
+        close_last (float): Last closing price of the stock.
+        delta (float): Delta window for considering the min/max price.
+        cluster_min_prices (np.ndarray): Support levels, sorted.
+        cluster_max_prices (np.ndarray): Resistance levels, sorted.
+        data_stock (pd.DataFrame): Dataframe containing stock data with an rsi column.
+        company (str): Name of the company.
+        data (list): List containing plotly figures.
+        layout (dict): Layout of the plotly figure.
+        end (str): End date of the data.
+        folder (str, optional): Folder holding one image folder per company. Defaults to 'buy_sell_images'.
+
+    Returns:
+        Optional[ChartJob]: Chart job, None if neither signal triggers.
+    """
+    paths = []
+    if cluster_min_prices[0] > (close_last - delta) and cluster_min_prices[0] < (close_last + delta):
+        paths.append(signal_chart_path(folder, company, "BUY", end, close_last))
+    if cluster_max_prices[-1] > (close_last - delta) and cluster_max_prices[-1] < (close_last + delta):
+        paths.append(signal_chart_path(folder, company, "SELL", end, close_last))
+    if not paths:
+        return None
+    import plotly.io as pio
+
+    from utils.plot_utils import get_signal_figure
+
+    figure = get_signal_figure(cluster_min_prices, cluster_max_prices, data_stock, data, layout)
+    return ChartJob(pio.to_json(figure, validate=False), paths, company)
+
+
+def render_chart(job: ChartJob) -> int:
+    """Render a chart job with the renderer of this process and write its files.
+
+    Plotly starts the Kaleido renderer of a process on first use and keeps it for the life of the
+    process, so only the first chart of every worker pays for starting it. Every file is replaced
+    rather than written over, as it may be a hard link to an image of the render cache.
+
+    Args:
+        job (ChartJob): Chart to render.
+
+    Returns:
+        int: Number of files written.
+    """
+    import plotly.io as pio
+
+    image = pio.to_image(json.loads(job.figure), format="png", engine="kaleido", validate=False)
+    for path in job.paths:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "wb") as file:
+            file.write(image)
+        os.replace(path + ".tmp", path)
+    return len(job.paths)
+
+
+class ChartRenderer:
+    """Renders chart jobs as they come, in this process or across a pool of worker processes.
+
+    Every worker keeps one Kaleido renderer for all the charts it renders. At most 2*workers
+    charts are in flight at once. A chart which fails to render, including every chart in
+    flight when a worker crashes, is counted as a failure and the other charts carry on.
+    With a render cache, a chart whose image is cached is written from it without rendering,
+    and the image of every rendered chart is added to it.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        profiler: Optional[RunProfiler] = None,
+        on_done: Optional[Callable[[ChartJob, Optional[Exception]], None]] = None,
+        cache: Optional[RenderCache] = None,
+    ):
+        """Create the renderer.
+
+        Args:
+            workers (int, optional): Number of worker processes, 1 to render in this process. Defaults to 1.
+            profiler (RunProfiler, optional): Profiler timing the rendering of every chart. Defaults to None.
+            on_done (Callable, optional): Called with every chart once written, and the exception if it failed.
+                                          Defaults to None.
+            cache (RenderCache, optional): Cache of rendered images. Defaults to None.
+        """
+        self.workers = workers
+        self.profiler = profiler
+        self.on_done = on_done
+        self.cache = cache
+        self.charts = 0
+        self.images = 0
+        self.failures = 0
+        self.cached = 0
+        self._executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._pending = deque()
+
+    def submit(self, job: ChartJob) -> None:
+        """Render a chart job, waiting for older jobs if too many are in flight.
+
+        Args:
+            job (ChartJob): Chart to render.
+        """
+        self.charts += 1
+        try:
+            if self.cache is not None:
+                result = timed_call(self.cache.link, job.figure, job.paths)
+                if result[0]:
+                    self.cached += 1
+                    self._add_result(job, result, cached=True)
+                    return
+            if self._executor is None:
+                result = timed_call(render_chart, job)
+            else:
+                self._pending.append((job, self._executor.submit(timed_call, render_chart, job)))
+        except Exception as error:
+            self._add_failure(job, error)
+            return
+        if self._executor is None:
+            self._add_result(job, result)
+            return
+        while len(self._pending) > 2 * self.workers:
+            self._pop_result()
+
+    def _pop_result(self) -> None:
+        """Wait for the oldest chart in flight."""
+        job, future = self._pending.popleft()
+        try:
+            result = future.result()
+        except Exception as error:
+            self._add_failure(job, error)
+            return
+        self._add_result(job, result)
+
+    def _add_result(self, job: ChartJob, result: tuple, cached: bool = False) -> None:
+        """Count the images written for a chart, add them to the cache and record the rendering time."""
+        images, wall, cpu = result
+        self.images += images
+        if self.cache is not None and not cached:
+            try:
+                self.cache.add(job.figure, job.paths)
+            except OSError as error:
+                # The chart is written, so it only misses the cache.
+                print(f"Could not cache the chart of {job.symbol}: {error!r}")
+        if self.profiler is not None:
+            self.profiler.add_timings(job.symbol, {"write_image": (wall, cpu)})
+        if self.on_done is not None:
+            self.on_done(job, None)
+
+    def _add_failure(self, job: ChartJob, error: Exception) -> None:
+        """Count a chart which could not be rendered."""
+        self.failures += 1
+        print(f"Could not render the chart of {job.symbol}: {error!r}")
+        if self.profiler is not None:
+            self.profiler.count(job.symbol, "render_failures")
+        if self.on_done is not None:
+            self.on_done(job, error)
+
+    def close(self) -> None:
+        """Wait for every chart to be written and stop the workers."""
+        while self._pending:
+            self._pop_result()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def __enter__(self) -> "ChartRenderer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def save_chart_jobs(jobs: Iterable[ChartJob], path: str, append: bool = False) -> int:
+    """Write chart jobs to a JSON lines file to render them later.
+
+    Args:
+        jobs (Iterable[ChartJob]): Charts to render.
+        path (str): File to write.
+        append (bool, optional): Add the jobs to the ones already in the file. Defaults to False.
+
+    Returns:
+        int: Number of jobs written.
+    """
+    count = 0
+    with open(path, "a" if append else "w") as file:
+        for job in jobs:
+            file.write(json.dumps({"figure": job.figure, "paths": job.paths, "symbol": job.symbol}) + "\n")
+            count += 1
+    return count
+
+
+def load_chart_jobs(path: str) -> List[ChartJob]:
+    """Read chart jobs written by save_chart_jobs.
+
+    Args:
+        path (str): File to read.
+
+    Returns:
+        List[ChartJob]: Charts to render.
+    """
+    with open(path) as file:
+        return [ChartJob(**json.loads(line)) for line in file if line.strip()]
@@ -0,0 +1,131 @@
+"""Price arrays in shared memory, handed to worker processes by name instead of being pickled."""
+import os
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Segments attached by this process, kept open so that every task of a worker maps a segment once.
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Location of an array in a shared memory segment, cheap to send to a worker process.
+
+    Attributes:
+        name (str): Name of the segment.
+        rows (int): Number of rows of every array of the segment.
+        capacity (int): Number of columns the segment holds.
+        start (int): First column of the array.
+        stop (int): Column after the last column of the array.
+    """
+
+    name: str
+    rows: int
+    capacity: int
+    start: int
+    stop: int
+
+    def view(self) -> np.ndarray:
+        """Get the array as a read-only view of the segment, attaching to it on first use in this process.
+
+        Returns:
+            np.ndarray: Float array of shape (rows, stop - start).
+        """
+        segment = _ATTACHED.get(self.name)
+        if segment is None:
+            segment = _ATTACHED[self.name] = shared_memory.SharedMemory(name=self.name)
+        values = np.ndarray((self.rows, self.capacity), dtype=float, buffer=segment.buf)[:, self.start : self.stop]
+        values.flags.writeable = False
+        return values
+
+
+def detach(name: str) -> None:
+    """Close the mapping of a segment in this process, if it is attached.
+
+    Args:
+        name (str): Name of the segment.
+    """
+    segment = _ATTACHED.pop(name, None)
+    if segment is not None:
+        segment.close()
+
+
+class SharedOHLCStore:
+    """Packs the price arrays of many stocks into shared memory segments.
+
+    Every array is copied once into the current segment, next to the arrays added before it,
+    and a new segment is created when it is full. Workers get a SharedArray naming the segment
+    and attach to it once, so each task only sends a few integers and reads the prices in place.
+    close unlinks every segment; it must only be called once the workers are done with them.
+
+    The store must be created before the worker processes. Workers forked after it share the
+    resource tracker of this process, rather than starting their own, which would unlink the
+    segments they attached to when they exit.
+    """
+
+    def __init__(self, rows: int = 4, segment_bars: int = 262144):
+        """Create an empty store.
+
+        Args:
+            rows (int, optional): Number of rows of every array, 4 for OHLC arrays. Defaults to 4.
+            segment_bars (int, optional): Number of bars of a segment. Larger arrays get a segment of their own.
+                                          Defaults to 262144, 8 MB for OHLC arrays.
+        """
+        self.rows = rows
+        self.segment_bars = segment_bars
+        self.arrays: Dict[str, SharedArray] = {}
+        self._segments: List[Tuple[shared_memory.SharedMemory, np.ndarray]] = []
+        self._used = 0
+        if os.name == "posix":
+            resource_tracker.ensure_running()
+
+    def add(self, symbol: str, values: np.ndarray) -> SharedArray:
+        """Copy the prices of a stock into shared memory.
+
+        Args:
+            symbol (str): Name of the stock.
+            values (np.ndarray): Array of shape (rows, bars).
+
+        Returns:
+            SharedArray: Location of the prices, to send to workers.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.shape[0] != self.rows:
+            raise ValueError(f"Expected an array of {self.rows} rows, got shape {values.shape}")
+        bars = values.shape[1]
+        if not self._segments or self._used + bars > self._segments[-1][1].shape[1]:
+            capacity = max(self.segment_bars, bars, 1)
+            segment = shared_memory.SharedMemory(create=True, size=self.rows * capacity * 8)
+            self._segments.append((segment, np.ndarray((self.rows, capacity), dtype=float, buffer=segment.buf)))
+            self._used = 0
+        segment, segment_values = self._segments[-1]
+        segment_values[:, self._used : self._used + bars] = values
+        shared = SharedArray(segment.name, self.rows, segment_values.shape[1], self._used, self._used + bars)
+        self._used += bars
+        self.arrays[symbol] = shared
+        return shared
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the segments in bytes."""
+        return sum(segment.size for segment, _ in self._segments)
+
+    def close(self) -> None:
+        """Release and unlink every segment."""
+        # Drop the arrays over the segments first, as a segment cannot be closed while they exist.
+        segments = [segment for segment, _ in self._segments]
+        self._segments = []
+        self.arrays = {}
+        for segment in segments:
+            detach(segment.name)
+            segment.close()
+            segment.unlink()
+
+    def __enter__(self) -> "SharedOHLCStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -1,33 +1,151 @@
 import pandas as pd
 import numpy as np
+import time
+from collections import deque
+from numpy.lib.stride_tricks import sliding_window_view
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import yfinance as yf
-from sklearn.cluster import MeanShift
-import plotly.express as px
-from sklearn.cluster import Birch
+from typing import Iterator, Optional, Tuple
 
-def get_stock_data(stock_name: str, days: int=300, interval: str='d') -> pd.DataFrame:
+from utils.cluster_utils import mean_shift_labels, partition_labels
+from utils.data_source_utils import DataSource, YahooDataSource, is_transient_fetch_error
+from utils.profile_utils import RunProfiler
+
+def get_date_range(days: int) -> Tuple[str, str]:
+    """Get the start and end dates covering the past days.
+
+    Args:
+        days (int): Number of past days.
+
+    Returns:
+        Tuple[str, str]: Start and end dates formatted as YYYY-MM-DD.
+    """
+    end = datetime.today()
+    begin=end-pd.DateOffset(days)
+    return begin.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+def get_stock_data(stock_name: str, days: int=300, interval: str='d', source: Optional[DataSource]=None) -> pd.DataFrame:
     """Get stock data from yfinance api.
 
     Args:
         stock_name (str): Name of the stock whose historical data is needed.
         days (int, optional): Number of past days for which data is needed. Defaults to 300.
         interval (str, optional): Interval between data points. Defaults to 'd'.
+        source (DataSource, optional): Source to fetch the data from. Defaults to yahoo finance.
 
     Returns:
         pd.DataFrame: Dataframe containing past data for 
     """
-    end = datetime.today()
-    begin=end-pd.DateOffset(days)
-    st=begin.strftime('%Y-%m-%d') 
-    ed=end.strftime('%Y-%m-%d')
-
-    symbol = stock_name + '.NS'
-    ticker = yf.Ticker(symbol)
-    data_stock = ticker.history(start=st, end=ed, interval=interval) 
+    st, ed = get_date_range(days)
+    source = source or YahooDataSource()
+    data_stock = source.history(stock_name, start=st, end=ed, interval=interval)
     
     return data_stock
 
+def _get_stock_data_with_retry(stock_name: str, days: int, interval: str, source: DataSource,
+                               retries: int, backoff: float, profiler: Optional[RunProfiler]=None) -> pd.DataFrame:
+    """Get stock data, retrying failed requests with exponential backoff.
+
+    Only connection errors are retried, as a missing file or an unknown stock fails the same way
+    every time, and so are empty dataframes of sources which return them for failed requests.
+
+    Args:
+        stock_name (str): Name of the stock whose historical data is needed.
+        days (int): Number of past days for which data is needed.
+        interval (str): Interval between data points.
+        source (DataSource): Source to fetch the data from.
+        retries (int): Number of retries after the first failed attempt.
+        backoff (float): Seconds to wait before the first retry, doubled on every retry.
+        profiler (RunProfiler, optional): Profiler timing the fetch and counting retries. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Dataframe containing past data for the stock, empty if it still was after the retries.
+    """
+    for attempt in range(retries + 1):
+        try:
+            if profiler is None:
+                data_stock = get_stock_data(stock_name, days=days, interval=interval, source=source)
+            else:
+                with profiler.stage(stock_name, 'fetch'):
+                    data_stock = get_stock_data(stock_name, days=days, interval=interval, source=source)
+        except Exception as error:
+            if attempt == retries or not is_transient_fetch_error(error):
+                raise
+        else:
+            if attempt == retries or not (data_stock.empty and source.retry_empty):
+                return data_stock
+        if profiler is not None:
+            profiler.count(stock_name, 'retries')
+        time.sleep(backoff * 2**attempt)
+
+def iter_stock_data_bulk(symbols: list, days: int=300, interval: str='d', max_workers: int=8,
+                         retries: int=3, backoff: float=1.0, source: Optional[DataSource]=None,
+                         profiler: Optional[RunProfiler]=None) -> Iterator[Tuple[str, pd.DataFrame, Optional[Exception]]]:
+    """Fetch stock data for many stocks concurrently, yielding results in input order.
+
+    At most max_workers requests are in flight and at most 2*max_workers results are held
+    ahead of the consumer, so the caller can analyse a stock while the next ones are fetched.
+
+    Args:
+        symbols (list): Names of the stocks whose historical data is needed.
+        days (int, optional): Number of past days for which data is needed. Defaults to 300.
+        interval (str, optional): Interval between data points. Defaults to 'd'.
+        max_workers (int, optional): Number of concurrent requests. Defaults to 8.
+        retries (int, optional): Number of retries per stock after a failed request. Defaults to 3.
+        backoff (float, optional): Seconds to wait before the first retry, doubled on every retry. Defaults to 1.
+        source (DataSource, optional): Source to fetch the data from. Defaults to yahoo finance.
+        profiler (RunProfiler, optional): Profiler timing every fetch and counting retries and failures. Defaults to None.
+
+    Yields:
+        Tuple[str, pd.DataFrame, Optional[Exception]]: Stock name, its data (None on failure) and the
+            exception raised by the last attempt (None on success).
+    """
+    source = source or YahooDataSource()
+    symbols = list(symbols)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        next_symbol = 0
+        while pending or next_symbol < len(symbols):
+            while next_symbol < len(symbols) and len(pending) < 2 * max_workers:
+                symbol = symbols[next_symbol]
+                future = executor.submit(_get_stock_data_with_retry, symbol, days, interval, source, retries, backoff,
+                                         profiler)
+                pending.append((symbol, future))
+                next_symbol += 1
+            symbol, future = pending.popleft()
+            try:
+                yield symbol, future.result(), None
+            except Exception as error:
+                if profiler is not None:
+                    profiler.count(symbol, 'fetch_failures')
+                yield symbol, None, error
+
+def get_stock_data_bulk(symbols: list, days: int=300, interval: str='d', max_workers: int=8,
+                        retries: int=3, backoff: float=1.0, source: Optional[DataSource]=None) -> dict:
+    """Get stock data for many stocks concurrently.
+
+    Args:
+        symbols (list): Names of the stocks whose historical data is needed.
+        days (int, optional): Number of past days for which data is needed. Defaults to 300.
+        interval (str, optional): Interval between data points. Defaults to 'd'.
+        max_workers (int, optional): Number of concurrent requests. Defaults to 8.
+        retries (int, optional): Number of retries per stock after a failed request. Defaults to 3.
+        backoff (float, optional): Seconds to wait before the first retry, doubled on every retry. Defaults to 1.
+        source (DataSource, optional): Source to fetch the data from. Defaults to yahoo finance.
+
+    Returns:
+        dict: Dataframes keyed by stock name. Stocks whose requests failed on every attempt are left out.
+    """
+    data = {}
+    for symbol, data_stock, error in iter_stock_data_bulk(symbols, days=days, interval=interval,
+                                                          max_workers=max_workers, retries=retries,
+                                                          backoff=backoff, source=source):
+        if error is None:
+            data[symbol] = data_stock
+        else:
+            print("Could not fetch data for", symbol, ":", error)
+    return data
+
 def get_dates_for_backtesting(num_periods: int, days: int=200) -> list:
     """Get list of start and end dates for backtesting the buy sell strategy.
 
@@ -55,16 +173,20 @@ def add_rsi(data_stock: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Stock data updated with RSI values.
     """
-    data_stock['delta'] = data_stock['Close'].diff()
-    data_stock['advance'] = data_stock['delta'][data_stock['delta']>0]
-    data_stock['decline'] = -1*data_stock['delta'][-1*data_stock['delta']>0]
-    data_stock = data_stock.replace(np.nan, 0)
-    data_stock['advance_SMA_14'] = data_stock['advance'].rolling(window=14).mean()
-    data_stock['decline_SMA_14'] = data_stock['decline'].rolling(window=14).mean()
-    data_stock['rs'] = data_stock['advance_SMA_14']/data_stock['decline_SMA_14']
-    data_stock['rsi'] = np.subtract([100]*len(data_stock['rs']),list(100/(1 + (data_stock['rs']))))
-    data_stock = data_stock.replace(np.nan, 0)   
-    return data_stock
+    delta = np.diff(data_stock['Close'].to_numpy(dtype=float), prepend=np.nan)
+    advance = np.where(delta>0, delta, 0.0)
+    decline = np.where(-1*delta>0, -1*delta, 0.0)
+    advance_sma = pd.Series(advance).rolling(window=14).mean().to_numpy()
+    decline_sma = pd.Series(decline).rolling(window=14).mean().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = advance_sma/decline_sma
+        rsi = 100 - 100/(1 + rs)
+    columns = {
+        'delta': delta, 'advance': advance, 'decline': decline,
+        'advance_SMA_14': advance_sma, 'decline_SMA_14': decline_sma, 'rs': rs, 'rsi': rsi,
+    }
+    columns = {name: np.where(np.isnan(values), 0.0, values) for name, values in columns.items()}
+    return data_stock.fillna(0).assign(**columns)
 
 def avg_daily_change(data: pd.DataFrame) -> np.ndarray:
     """Get the average of the stock price.
@@ -84,136 +206,228 @@ def get_chart(stock_data: pd.DataFrame) -> None:
     Args:
         stock_data (pd.DataFrame): Historical stock prices data.
     """
+    import plotly.express as px
+
     fig = px.line(stock_data, x=stock_data.index, y="Close")
     fig.show()
 
-def support_resistance(data: pd.DataFrame, period: int=30) -> tuple:
+def windowed_extrema(values: np.ndarray, period: int, num_windows: int, kind: str='max') -> np.ndarray:
+    """Get the maximum or minimum of consecutive windows of prices.
+
+    Window i covers values[i:i+period]. All windows are reduced at once over a strided
+    view of the array, without copying the prices.
+
+    Args:
+        values (np.ndarray): Prices, oldest first.
+        period (int): Number of prices in each window.
+        num_windows (int): Number of windows, starting from the first price.
+        kind (str, optional): 'max' or 'min'. Defaults to 'max'.
+
+    Returns:
+        np.ndarray: Float array with the extremum of each window.
+    """
+    values = np.asarray(values, dtype=float)
+    if num_windows <= 0:
+        return np.empty(0)
+    windows = sliding_window_view(values, period)[:num_windows]
+    return windows.max(axis=1) if kind == 'max' else windows.min(axis=1)
+
+def support_resistance(data: pd.DataFrame, period: int=30, backend: str='sklearn') -> tuple:
     """Get support resistance values for a stock.
 
     Args:
         data (pd.DataFrame): Historical stock data.
         period (int, optional): Period of days to consider values for getting support price. Defaults to 30.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
 
     Returns:
         tuple: tuple of two lists containing sorted support and resistance values.
     """
-    max_prices_win30 = []
-    min_prices_win30 = []
-    for i in range((len(data['Close'])-period-1)):
-        max_prices_win30 = np.append(max_prices_win30, [max(data['High'][i:period+i])])
-        min_prices_win30 = np.append(min_prices_win30, [min(data['Low'][i:period+i])])  
+    num_windows = len(data['Close'])-period-1
+    max_prices_win30 = windowed_extrema(data['High'].to_numpy(), period, num_windows, kind='max')
+    min_prices_win30 = windowed_extrema(data['Low'].to_numpy(), period, num_windows, kind='min')
     
     max_prices_win30 = np.reshape(max_prices_win30,(-1,1))
     min_prices_win30 = np.reshape(min_prices_win30,(-1,1))
     
-    clustering_max = MeanShift(bandwidth=period).fit(max_prices_win30)
-    clustering_min = MeanShift(bandwidth=period).fit(min_prices_win30)
-    label_sort_max = {}
-    label_sort_min = {}
-    labels_max = clustering_max.labels_
-    labels_min = clustering_min.labels_
-    for i in range(max(labels_max)+1):
-        label_sort_max[i] = []
-    for i in range(len(labels_max)):
-        label_sort_max[labels_max[i]] = np.append(label_sort_max[labels_max[i]], max_prices_win30[i,0]) 
-    label_sort_max = {k: v for k, v in label_sort_max.items()} 
-    
-    for i in range(max(labels_min)+1):
-        label_sort_min[i] = []
-    for i in range(len(labels_min)):
-        label_sort_min[labels_min[i]] = np.append(label_sort_min[labels_min[i]], min_prices_win30[i,0]) 
-    label_sort_min = {k: v for k, v in label_sort_min.items()}
+    labels_max = mean_shift_labels(max_prices_win30, bandwidth=period, backend=backend)
+    labels_min = mean_shift_labels(min_prices_win30, bandwidth=period, backend=backend)
+    label_sort_max = _group_by_label(max_prices_win30[:,0], labels_max)
+    label_sort_min = _group_by_label(min_prices_win30[:,0], labels_min)
     
     return label_sort_max, label_sort_min
 
-def get_cluster_max_prices(data: pd.DataFrame, period: int=5) -> list:
+def _group_by_label(values: np.ndarray, labels: np.ndarray) -> dict:
+    """Group values by cluster label with a single stable sort.
+
+    Args:
+        values (np.ndarray): Values which were clustered.
+        labels (np.ndarray): Cluster label of each value.
+
+    Returns:
+        dict: Values of each label from 0 to the largest label, in their original order.
+    """
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    present, starts = np.unique(labels[order], return_index=True)
+    groups = np.split(np.asarray(values, dtype=float)[order], starts[1:])
+    label_sort = {i: [] for i in range(max(labels)+1)}
+    label_sort.update(zip(present.tolist(), groups))
+    return label_sort
+
+def _frequent_prices(prices: np.ndarray, labels: np.ndarray, min_count: int=5) -> np.ndarray:
+    """Get the prices repeated at least min_count times within their cluster.
+
+    Sorting by label and then by price turns every run of equal (label, price) pairs into a
+    contiguous block, so all repeat counts come from one lexsort.
+
+    Args:
+        prices (np.ndarray): Windowed extrema of the prices.
+        labels (np.ndarray): Cluster label of each price.
+        min_count (int, optional): Minimum number of repeats. Defaults to 5.
+
+    Returns:
+        np.ndarray: Frequent prices, sorted.
+    """
+    order = np.lexsort((prices, labels))
+    sorted_prices = prices[order]
+    sorted_labels = np.asarray(labels)[order]
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (sorted_prices[1:] != sorted_prices[:-1]) | (sorted_labels[1:] != sorted_labels[:-1])
+    starts = np.flatnonzero(new_run)
+    counts = np.diff(np.append(starts, len(order)))
+    return np.sort(sorted_prices[starts][counts >= min_count])
+
+def _first_occurrence(values: np.ndarray, prices: np.ndarray) -> np.ndarray:
+    """Get the position of the first occurrence of each price in a price series.
+
+    Args:
+        values (np.ndarray): Price series, oldest first.
+        prices (np.ndarray): Prices which occur in the series.
+
+    Returns:
+        np.ndarray: Index into values of the first occurrence of each price.
+    """
+    unique, first_index = np.unique(values, return_index=True)
+    return first_index[np.searchsorted(unique, prices)]
+
+def get_frequent_prices(prices_win: np.ndarray, values: np.ndarray, n_clusters: int=5, backend: str='sklearn') -> np.ndarray:
+    """Get the frequent windowed maxima of prices, which get_cluster_levels clusters into levels.
+
+    Args:
+        prices_win (np.ndarray): Windowed maxima of the prices.
+        values (np.ndarray): Prices the windows were taken over, oldest first.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+
+    Returns:
+        np.ndarray: Frequent prices, ordered by price, then by the date the price was first seen.
+    """
+    labels = partition_labels(prices_win, n_clusters=n_clusters, backend=backend)
+
+    prices = _frequent_prices(prices_win, labels)
+    first_seen = _first_occurrence(values, prices)
+    return prices[np.lexsort((first_seen, prices))]
+
+def cluster_frequent_prices(prices: np.ndarray, reduce: np.ufunc, bandwidth: float=10, backend: str='sklearn') -> np.ndarray:
+    """Cluster frequent prices into support or resistance levels.
+
+    Args:
+        prices (np.ndarray): Frequent prices, as returned by get_frequent_prices.
+        reduce (np.ufunc): np.maximum or np.minimum, used to pick the level of each cluster.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the prices. Defaults to 10.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+
+    Returns:
+        np.ndarray: Sorted price level of each cluster.
+    """
+    labels = mean_shift_labels(prices, bandwidth=bandwidth, backend=backend)
+
+    label_sort = _group_by_label(prices, labels)
+    return np.sort([reduce.reduce(v) for v in label_sort.values()])
+
+def get_cluster_levels(prices_win: np.ndarray, values: np.ndarray, reduce: np.ufunc, backend: str='sklearn',
+                       n_clusters: int=5, bandwidth: float=10) -> np.ndarray:
+    """Cluster windowed maxima of prices into support or resistance levels.
+
+    Args:
+        prices_win (np.ndarray): Windowed maxima of the prices.
+        values (np.ndarray): Prices the windows were taken over, oldest first.
+        reduce (np.ufunc): np.maximum or np.minimum, used to pick the level of each cluster.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+    Returns:
+        np.ndarray: Sorted price level of each cluster.
+    """
+    prices = get_frequent_prices(prices_win, values, n_clusters, backend)
+    return cluster_frequent_prices(prices, reduce, bandwidth, backend)
+
+def get_windowed_prices(data: pd.DataFrame, column: str, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the windowed maxima of a price column, which the levels are clustered from.
+
+    Args:
+        data (pd.DataFrame): Historical stock price.
+        column (str): Column of prices.
+        period (int): Window period for gathering prices.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Windowed maxima and the prices they were taken over.
+    """
+    values = data[column].to_numpy(dtype=float)
+    prices_win = windowed_extrema(values, period, len(data['Close'])-period-1, kind='max')
+    return prices_win, values
+
+def _get_cluster_prices(data: pd.DataFrame, column: str, period: int, reduce: np.ufunc, backend: str,
+                        n_clusters: int=5, bandwidth: float=10) -> np.ndarray:
+    """Cluster the frequent windowed maxima of a price column into levels.
+
+    Args:
+        data (pd.DataFrame): Historical stock price.
+        column (str): Column of prices whose windowed maxima are clustered.
+        period (int): Window period for gathering prices.
+        reduce (np.ufunc): np.maximum or np.minimum, used to pick the level of each cluster.
+        backend (str): Clustering backend, 'sklearn' or 'numpy'.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
+
+    Returns:
+        np.ndarray: Sorted price level of each cluster.
+    """
+    prices_win, values = get_windowed_prices(data, column, period)
+    return get_cluster_levels(prices_win, values, reduce, backend, n_clusters, bandwidth)
+
+def get_cluster_max_prices(data: pd.DataFrame, period: int=5, backend: str='sklearn', n_clusters: int=5,
+                           bandwidth: float=10) -> list:
     """Get the max prices after clustering.
 
     Args:
         data (pd.DataFrame): Historical stock price.
         period (int, optional): Window period for gathering prices. Defaults to 5.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
 
     Returns:
         list: List of max prices after clustering.
     """
-    max_prices_win30 = np.asarray([max(data['High'][i:period+i]) for i in range(len(data['Close'])-period-1)])
-    max_prices_win30 = np.reshape(max_prices_win30,(-1,1))
-    brc = Birch(n_clusters=5)
-    brc.fit(max_prices_win30)
-    clustering_max = brc.predict(max_prices_win30)
-
-    label_sort_max = {}
-    labels_max = clustering_max
-    for i in range(max(labels_max)+1):
-        label_sort_max[i] = []
-    for i in range(len(labels_max)):
-        label_sort_max[labels_max[i]] = np.append(label_sort_max[labels_max[i]], max_prices_win30[i,0]) 
-    label_sort_max = {k: v for k, v in label_sort_max.items()} 
-
-    c = []
-    for key in list(label_sort_max.keys()):
-        items = label_sort_max[key]
-        unique, frequency = np.unique(items, return_counts=True)
-        e = sorted(np.array(unique)[np.array(frequency)>4])
-        for price in e:
-            c.append([price, list(data.index)[np.argwhere(list(data['High'])==price)[0][0]]])        
-    c = np.array(sorted(c))
-    clustering = MeanShift(bandwidth=10).fit(c[:,0].reshape(-1,1))
-    labels_dmax = clustering.labels_
-
-    label_sort_max = {}
-    c_new = []
-    labels_max = labels_dmax
-    for i in range(max(labels_max)+1):
-        label_sort_max[i] = []
-    for i in range(len(labels_max)):
-        label_sort_max[labels_max[i]] = np.append(label_sort_max[labels_max[i]], c[i,0]) 
-    c_new = np.array(sorted([max(v) for k, v in label_sort_max.items()]))
-    
-    return c_new
+    return _get_cluster_prices(data, 'High', period, np.maximum, backend, n_clusters, bandwidth)
 
-def get_cluster_min_prices(data: pd.DataFrame, period: int=5) -> list:
+def get_cluster_min_prices(data: pd.DataFrame, period: int=5, backend: str='sklearn', n_clusters: int=5,
+                           bandwidth: float=10) -> list:
     """Get the min prices after clustering.
 
+    The clustered prices are the maxima of windows over the Low prices.
+
     Args:
         data (pd.DataFrame): Historical stock price.
         period (int, optional): Window period for gathering prices. Defaults to 5.
+        backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        n_clusters (int, optional): Number of clusters the windowed maxima are partitioned into. Defaults to 5.
+        bandwidth (float, optional): Bandwidth of the mean shift clustering of the frequent prices. Defaults to 10.
 
     Returns:
         list: List of min prices after clustering.
     """
-    min_prices_win30 = np.asarray([max(data['Low'][i:period+i]) for i in range(len(data['Close'])-period-1)])
-    min_prices_win30 = np.reshape(min_prices_win30,(-1,1))
-    brc = Birch(n_clusters=5)
-    brc.fit(min_prices_win30)
-    Birch(n_clusters=5)
-    clustering_min = brc.predict(min_prices_win30) 
-
-    label_sort_min = {}
-    labels_min = clustering_min
-    for i in range(max(labels_min)+1):
-        label_sort_min[i] = []
-    for i in range(len(labels_min)):
-        label_sort_min[labels_min[i]] = np.append(label_sort_min[labels_min[i]], min_prices_win30[i,0]) 
-    label_sort_min = {k: v for k, v in label_sort_min.items()}
-
-    d = []
-    for key in list(label_sort_min.keys()):
-        items = label_sort_min[key]
-        unique, frequency = np.unique(items, return_counts=True)
-        e = sorted(np.array(unique)[np.array(frequency)>4])
-        for price in e:
-            d.append([price, list(data.index)[np.argwhere(list(data['Low'])==price)[0][0]]])
-    d = np.array(sorted(d))
-    clustering = MeanShift(bandwidth=10).fit(d[:,0].reshape(-1,1))
-    labels_dmin = clustering.labels_
-
-    label_sort_min = {}
-    d_new = []
-    labels_min = labels_dmin
-    for i in range(max(labels_min)+1):
-        label_sort_min[i] = []
-    for i in range(len(labels_min)):
-        label_sort_min[labels_min[i]] = np.append(label_sort_min[labels_min[i]], d[i,0]) 
-    d_new = np.array(sorted([min(v) for k, v in label_sort_min.items()]))
-    return d_new
+    return _get_cluster_prices(data, 'Low', period, np.minimum, backend, n_clusters, bandwidth)
@@ -0,0 +1,264 @@
+"""SQLite store of the signals and levels of every run, for queries over their history."""
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis_utils import SymbolResult
+
+SIGNAL_KINDS = ("buy", "sell")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_at TEXT NOT NULL,
+    days INTEGER,
+    period INTEGER,
+    within_support_percentage REAL,
+    cluster_backend TEXT
+);
+CREATE TABLE IF NOT EXISTS signals (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    symbol TEXT NOT NULL,
+    date TEXT,
+    close REAL,
+    rsi REAL,
+    support REAL,
+    resistance REAL,
+    buy INTEGER NOT NULL DEFAULT 0,
+    sell INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (run_id, symbol)
+);
+CREATE INDEX IF NOT EXISTS signals_symbol_date ON signals (symbol, date);
+CREATE INDEX IF NOT EXISTS signals_buy_date ON signals (date) WHERE buy = 1;
+CREATE INDEX IF NOT EXISTS signals_sell_date ON signals (date) WHERE sell = 1;
+CREATE TABLE IF NOT EXISTS levels (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    symbol TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS levels_symbol_run ON levels (symbol, run_id);
+"""
+
+
+class SignalStore:
+    """Appends the result of every stock of every run to a SQLite database.
+
+    A run gets a row in runs with its timestamp and parameters. Every stock of the run gets a
+    row in signals with the date of its last bar, its close, last RSI, lowest support, highest
+    resistance and buy and sell flags, and one row in levels per support and resistance level.
+    Signals are indexed by stock and date, and buy and sell signals by date, so the history of
+    a stock or the recent signals of all stocks are read without scanning the tables.
+
+    Rows are buffered and written in one transaction per batch_size stocks. Adding a stock to a
+    run again replaces its signal and levels.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500):
+        """Open or create a store.
+
+        Args:
+            path (str): Path of the SQLite database.
+            batch_size (int, optional): Number of stocks buffered before they are written. Defaults to 500.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        # Readers are not blocked by a run writing to the store.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self._signals = []
+        # Levels of every buffered stock, keyed by run and stock so that adding a stock again replaces them.
+        self._levels = {}
+
+    def start_run(
+        self,
+        days: Optional[int] = None,
+        period: Optional[int] = None,
+        within_support_percentage: Optional[float] = None,
+        cluster_backend: Optional[str] = None,
+        run_at: Optional[str] = None,
+    ) -> int:
+        """Record a new run.
+
+        Args:
+            days (int, optional): Number of past days analysed. Defaults to None.
+            period (int, optional): Window period for gathering prices. Defaults to None.
+            within_support_percentage (float, optional): Distance from a level, in percent of the close,
+                                                         which triggers a signal. Defaults to None.
+            cluster_backend (str, optional): Clustering backend. Defaults to None.
+            run_at (str, optional): Timestamp of the run, now if None. Defaults to None.
+
+        Returns:
+            int: Id of the run.
+        """
+        run_at = run_at or datetime.now().isoformat(timespec="seconds")
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (run_at, days, period, within_support_percentage, cluster_backend) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (run_at, days, period, within_support_percentage, cluster_backend),
+            )
+        return cursor.lastrowid
+
+    def add_result(self, run_id: int, result: SymbolResult, date: Optional[pd.Timestamp] = None) -> None:
+        """Add the result of a stock to a run.
+
+        Args:
+            run_id (int): Id of the run, as returned by start_run.
+            result (SymbolResult): Result of the analysis of the stock.
+            date (pd.Timestamp, optional): Date of the last bar analysed, None if the stock has no data. Defaults to None.
+        """
+        date = None if date is None else pd.Timestamp(date).strftime("%Y-%m-%d")
+        levels = self._levels[(run_id, result.symbol)] = []
+        if result.error is not None:
+            self._signals.append((run_id, result.symbol, date, None, None, None, None, 0, 0, result.error))
+        else:
+            rsi = float(result.rsi[-1]) if len(result.rsi) else None
+            self._signals.append(
+                (
+                    run_id,
+                    result.symbol,
+                    date,
+                    float(result.close_last),
+                    None if rsi is None or np.isnan(rsi) else rsi,
+                    float(result.cluster_min_prices[0]) if len(result.cluster_min_prices) else None,
+                    float(result.cluster_max_prices[-1]) if len(result.cluster_max_prices) else None,
+                    int(bool(result.buy)),
+                    int(bool(result.sell)),
+                    None,
+                )
+            )
+            for kind, prices in (("support", result.cluster_min_prices), ("resistance", result.cluster_max_prices)):
+                levels.extend((run_id, result.symbol, kind, float(price)) for price in prices)
+        if len(self._signals) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered stocks, replacing the levels already stored for them in the same run."""
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO signals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._signals
+            )
+            self.connection.executemany("DELETE FROM levels WHERE run_id = ? AND symbol = ?", self._levels)
+            self.connection.executemany(
+                "INSERT INTO levels VALUES (?, ?, ?, ?)", (row for levels in self._levels.values() for row in levels)
+            )
+        self._signals = []
+        self._levels = {}
+
+    def latest_run(self) -> Optional[int]:
+        """Get the id of the latest run, None if the store is empty."""
+        return self.connection.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+
+    def query(self, sql: str, parameters: tuple = ()) -> pd.DataFrame:
+        """Run a query on the store.
+
+        Args:
+            sql (str): SQL query.
+            parameters (tuple, optional): Parameters of the query. Defaults to ().
+
+        Returns:
+            pd.DataFrame: Rows of the result.
+        """
+        self.flush()
+        return pd.read_sql_query(sql, self.connection, params=parameters)
+
+    def signals(
+        self, kind: str = "buy", days: Optional[int] = 30, symbol: Optional[str] = None, latest: bool = False
+    ) -> pd.DataFrame:
+        """Get the buy or sell signals of recent dates.
+
+        The same signal is found by every run made on the same data, so with latest set only the
+        latest run of every stock and date is kept.
+
+        Args:
+            kind (str, optional): 'buy' or 'sell'. Defaults to 'buy'.
+            days (int, optional): Number of past days, all dates if None. Defaults to 30.
+            symbol (str, optional): Name of a stock, all stocks if None. Defaults to None.
+            latest (bool, optional): Keep only the latest run of every stock and date. Defaults to False.
+
+        Returns:
+            pd.DataFrame: Signals with the stock, the date of its last bar, the run and the levels, newest first.
+        """
+        if kind not in SIGNAL_KINDS:
+            raise ValueError(f"Unknown signal kind {kind}, expected one of {SIGNAL_KINDS}")
+        conditions = [f"s.{kind} = 1"]
+        parameters = []
+        if days is not None:
+            conditions.append("s.date >= ?")
+            parameters.append((datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d"))
+        if symbol is not None:
+            conditions.append("s.symbol = ?")
+            parameters.append(symbol)
+        if latest:
+            conditions.append(
+                "s.run_id = (SELECT MAX(l.run_id) FROM signals l WHERE l.symbol = s.symbol AND l.date = s.date)"
+            )
+        return self.query(
+            "SELECT s.symbol, s.date, r.run_at, s.run_id, s.close, s.rsi, s.support, s.resistance "
+            "FROM signals s JOIN runs r ON r.run_id = s.run_id "
+            f"WHERE {' AND '.join(conditions)} ORDER BY s.date DESC, s.symbol, s.run_id DESC",
+            tuple(parameters),
+        )
+
+    def level_history(self, symbol: str) -> pd.DataFrame:
+        """Get the support and resistance levels of a stock in every run.
+
+        Args:
+            symbol (str): Name of the stock.
+
+        Returns:
+            pd.DataFrame: Levels with the run, the date of the last bar and the kind of the level, oldest first.
+        """
+        return self.query(
+            "SELECT l.run_id, r.run_at, s.date, l.kind, l.price "
+            "FROM levels l JOIN runs r ON r.run_id = l.run_id "
+            "JOIN signals s ON s.run_id = l.run_id AND s.symbol = l.symbol "
+            "WHERE l.symbol = ? ORDER BY l.run_id, l.kind, l.price",
+            (symbol,),
+        )
+
+    def run_results(self, run_id: Optional[int] = None) -> pd.DataFrame:
+        """Get the results of every stock of a run.
+
+        Args:
+            run_id (int, optional): Id of the run, the latest if None. Defaults to None.
+
+        Returns:
+            pd.DataFrame: One row per stock, in the order they were added.
+        """
+        run_id = self.latest_run() if run_id is None else run_id
+        return self.query("SELECT * FROM signals WHERE run_id = ? ORDER BY rowid", (run_id,))
+
+    def export_buy_sell_csv(self, path: str, run_id: Optional[int] = None) -> None:
+        """Write the signals of a run in the format of buy_sell.csv.
+
+        Args:
+            path (str): CSV file to write.
+            run_id (int, optional): Id of the run, the latest if None. Defaults to None.
+        """
+        results = self.run_results(run_id)
+        buy_sell_stock = {
+            row.symbol: {
+                "buy": [row.close] if row.buy else [],
+                "sell": [row.close] if row.sell else [],
+            }
+            for row in results.itertuples()
+        }
+        pd.DataFrame.from_dict(buy_sell_stock, orient="index").to_csv(path)
+
+    def close(self) -> None:
+        """Write the buffered stocks and close the database."""
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> "SignalStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
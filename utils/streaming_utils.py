@@ -0,0 +1,236 @@
+"""Incremental RSI and support resistance state for intraday scans."""
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utils.level_cache_utils import LevelCache
+from utils.stock_data_utils import get_cluster_levels
+
+RSI_WINDOW = 14
+
+
+class _RollingMean:
+    """Rolling means of several series, updated one value at a time.
+
+    Reproduces the arithmetic of pandas' rolling(window).mean() so that results are bit for bit
+    equal: a Kahan compensated running sum with separate compensation for added and removed
+    values, an exact result for runs of equal values, and results clipped to zero when the sign
+    of every value in the window rules out the other sign.
+    """
+
+    def __init__(self, n_series: int, window: int):
+        self.window = window
+        self.buffer = np.zeros((n_series, window))
+        self.count = np.zeros(n_series, dtype=np.int64)
+        self.total = np.zeros(n_series)
+        self.compensation_add = np.zeros(n_series)
+        self.compensation_remove = np.zeros(n_series)
+        self.negative = np.zeros(n_series, dtype=np.int64)
+        self.same = np.zeros(n_series, dtype=np.int64)
+        self.last = np.full(n_series, np.nan)
+
+    def take(self, rows: np.ndarray) -> "_RollingMean":
+        """Get a copy of the state of some of the series."""
+        state = _RollingMean(0, self.window)
+        for name in ("buffer", "count", "total", "compensation_add", "compensation_remove", "negative", "same", "last"):
+            setattr(state, name, getattr(self, name)[rows].copy())
+        return state
+
+    def update(self, values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Append one value to each of the given series and get their rolling means.
+
+        Args:
+            values (np.ndarray): New value of each updated series.
+            rows (np.ndarray): Index of each updated series.
+
+        Returns:
+            np.ndarray: Rolling mean of each updated series, NaN until the window is full.
+        """
+        count = self.count[rows]
+        slot = count % self.window
+
+        full = count >= self.window
+        removed_rows = rows[full]
+        removed = self.buffer[removed_rows, slot[full]]
+        y = -removed - self.compensation_remove[removed_rows]
+        t = self.total[removed_rows] + y
+        self.compensation_remove[removed_rows] = t - self.total[removed_rows] - y
+        self.total[removed_rows] = t
+        self.negative[removed_rows] -= np.signbit(removed)
+
+        y = values - self.compensation_add[rows]
+        t = self.total[rows] + y
+        self.compensation_add[rows] = t - self.total[rows] - y
+        self.total[rows] = t
+        self.negative[rows] += np.signbit(values)
+        self.same[rows] = np.where(values == self.last[rows], self.same[rows] + 1, 1)
+        self.last[rows] = values
+        self.buffer[rows, slot] = values
+        self.count[rows] = count + 1
+
+        nobs = np.minimum(count + 1, self.window)
+        mean = self.total[rows] / nobs
+        mean = np.where((self.negative[rows] == 0) & (mean < 0), 0.0, mean)
+        mean = np.where((self.negative[rows] == nobs) & (mean > 0), 0.0, mean)
+        mean = np.where(self.same[rows] >= nobs, values, mean)
+        return np.where(count + 1 >= self.window, mean, np.nan)
+
+
+class RollingRSI:
+    """RSI of a set of stocks, updated in constant time per new bar.
+
+    Gives the same values as add_rsi on the full history: the first bar of a stock has an RSI
+    of 0, as do bars before the 14 bar averages are complete or without any price change.
+    """
+
+    def __init__(self, n_symbols: int = 1, window: int = RSI_WINDOW):
+        """Create the RSI state.
+
+        Args:
+            n_symbols (int, optional): Number of stocks tracked. Defaults to 1.
+            window (int, optional): Number of bars averaged. Defaults to 14.
+        """
+        self.previous_close = np.full(n_symbols, np.nan)
+        self.advance = _RollingMean(n_symbols, window)
+        self.decline = _RollingMean(n_symbols, window)
+
+    def take(self, rows: np.ndarray) -> "RollingRSI":
+        """Get a copy of the state of some of the stocks, to update them on their own.
+
+        Args:
+            rows (np.ndarray): Index of each stock to copy.
+
+        Returns:
+            RollingRSI: State of the stocks, in the order of rows.
+        """
+        state = RollingRSI(0, window=self.advance.window)
+        state.previous_close = self.previous_close[rows].copy()
+        state.advance = self.advance.take(rows)
+        state.decline = self.decline.take(rows)
+        return state
+
+    def update(self, close: np.ndarray, valid: Optional[np.ndarray] = None) -> np.ndarray:
+        """Add one bar for every stock and get the new RSI values.
+
+        Args:
+            close (np.ndarray): Closing price of the new bar of each stock.
+            valid (np.ndarray, optional): Boolean mask of stocks which have a new bar. Defaults to all stocks.
+
+        Returns:
+            np.ndarray: RSI of each stock, NaN for stocks without a new bar.
+        """
+        close = np.atleast_1d(np.asarray(close, dtype=float))
+        rows = np.arange(len(close)) if valid is None else np.flatnonzero(valid)
+        delta = close[rows] - self.previous_close[rows]
+        self.previous_close[rows] = close[rows]
+        advance = np.where(delta > 0, delta, 0.0)
+        decline = np.where(-1 * delta > 0, -1 * delta, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = self.advance.update(advance, rows) / self.decline.update(decline, rows)
+            rsi = 100 - 100 / (1 + rs)
+        result = np.full(len(close), np.nan)
+        result[rows] = np.where(np.isnan(rsi), 0.0, rsi)
+        return result
+
+
+def rsi_panel(close: np.ndarray, window: int = RSI_WINDOW) -> np.ndarray:
+    """Compute the RSI of many stocks at once.
+
+    Args:
+        close (np.ndarray): Closing prices of shape (stocks, bars), oldest first. NaN marks a
+                            missing bar, which is skipped as if the stock had no row for it.
+        window (int, optional): Number of bars averaged. Defaults to 14.
+
+    Returns:
+        np.ndarray: RSI of shape (stocks, bars), NaN where bars are missing.
+    """
+    close = np.atleast_2d(np.asarray(close, dtype=float))
+    state = RollingRSI(close.shape[0], window=window)
+    rsi = np.empty_like(close)
+    for bar in range(close.shape[1]):
+        rsi[:, bar] = state.update(close[:, bar], valid=~np.isnan(close[:, bar]))
+    return rsi
+
+
+class StreamingLevels:
+    """Windowed extrema of one stock kept up to date bar by bar.
+
+    The maxima of High and Low over windows of period bars are maintained with monotonic
+    deques in amortised constant time per bar, so support resistance levels can be clustered
+    at any point without rescanning the history.
+    """
+
+    def __init__(self, period: int = 5, max_bars: Optional[int] = None, backend: str = "sklearn"):
+        """Create the level state.
+
+        Args:
+            period (int, optional): Window period for gathering prices. Defaults to 5.
+            max_bars (int, optional): Number of most recent bars kept, all of them if None. Defaults to None.
+            backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+        """
+        self.period = period
+        self.backend = backend
+        num_windows = None if max_bars is None else max(max_bars - period + 1, 0)
+        self.highs = deque(maxlen=max_bars)
+        self.lows = deque(maxlen=max_bars)
+        self.high_maxima = deque(maxlen=num_windows)
+        self.low_maxima = deque(maxlen=num_windows)
+        self._bars = 0
+        self._high_window = deque()
+        self._low_window = deque()
+
+    @staticmethod
+    def _push(window: deque, bar: int, value: float, period: int) -> float:
+        """Add a value to a monotonic window and get the maximum of the window."""
+        while window and window[-1][1] <= value:
+            window.pop()
+        window.append((bar, value))
+        if window[0][0] <= bar - period:
+            window.popleft()
+        return window[0][1]
+
+    def update(self, high: float, low: float) -> None:
+        """Add one bar.
+
+        Args:
+            high (float): High price of the bar.
+            low (float): Low price of the bar.
+        """
+        self.highs.append(high)
+        self.lows.append(low)
+        high_max = self._push(self._high_window, self._bars, high, self.period)
+        low_max = self._push(self._low_window, self._bars, low, self.period)
+        self._bars += 1
+        if self._bars >= self.period:
+            self.high_maxima.append(high_max)
+            self.low_maxima.append(low_max)
+
+    def levels(self, level_cache: Optional[LevelCache] = None, symbol: str = "") -> Tuple[np.ndarray, np.ndarray]:
+        """Cluster the current windowed extrema into support and resistance levels.
+
+        Args:
+            level_cache (LevelCache, optional): Cache the levels are looked up in and added to, None to always
+                                                cluster. Defaults to None.
+            symbol (str, optional): Name of the stock, which keys its levels in level_cache. Defaults to ''.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Support and resistance levels, as returned by
+                get_cluster_min_prices and get_cluster_max_prices on the kept bars.
+        """
+        num_windows = len(self.highs) - self.period - 1
+        if num_windows <= 0:
+            raise ValueError("Not enough bars to find support resistance levels.")
+        high_maxima = np.fromiter(self.high_maxima, dtype=float, count=len(self.high_maxima))[:num_windows]
+        low_maxima = np.fromiter(self.low_maxima, dtype=float, count=len(self.low_maxima))[:num_windows]
+        if level_cache is None:
+            cluster_max_prices = get_cluster_levels(high_maxima, np.asarray(self.highs), np.maximum, self.backend)
+            cluster_min_prices = get_cluster_levels(low_maxima, np.asarray(self.lows), np.minimum, self.backend)
+        else:
+            cluster_max_prices = level_cache.get_cluster_levels(
+                symbol, high_maxima, np.asarray(self.highs), np.maximum, self.backend
+            )
+            cluster_min_prices = level_cache.get_cluster_levels(
+                symbol, low_maxima, np.asarray(self.lows), np.minimum, self.backend
+            )
+        return cluster_min_prices, cluster_max_prices
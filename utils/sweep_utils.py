@@ -0,0 +1,253 @@
+"""Parameter sweep of the buy sell signals, sharing the work common to many settings."""
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.analysis_utils import get_buy_sell_signals
+from utils.backtest_utils import get_window_bounds, summarise_backtest
+from utils.stock_data_utils import cluster_frequent_prices, get_frequent_prices, windowed_extrema
+
+SWEEP_PARAMETERS = ("days", "period", "within_support_percentage", "n_clusters", "bandwidth")
+
+
+def get_grid(
+    days: Sequence[int],
+    period: Sequence[int],
+    within_support_percentage: Sequence[float],
+    n_clusters: Sequence[int],
+    bandwidth: Sequence[float],
+) -> List[tuple]:
+    """Get every combination of the parameter values.
+
+    Args:
+        days (Sequence[int]): Numbers of past days analysed.
+        period (Sequence[int]): Window periods for gathering prices.
+        within_support_percentage (Sequence[float]): Distances from a level, in percent of the close, that trigger a signal.
+        n_clusters (Sequence[int]): Numbers of clusters the windowed maxima are partitioned into. Equal prices always
+                                    share a partition, so the frequent prices and the signals do not depend on it.
+        bandwidth (Sequence[float]): Bandwidths of the mean shift clustering of the frequent prices.
+
+    Returns:
+        List[tuple]: Combinations, with the values in the order of SWEEP_PARAMETERS.
+    """
+    return list(itertools.product(days, period, within_support_percentage, n_clusters, bandwidth))
+
+
+def _plan_grid(grid: Sequence[tuple]) -> Dict[tuple, Dict[float, List[Tuple[float, int]]]]:
+    """Nest the combinations by the stage of the analysis each parameter first changes.
+
+    Returns (within support percentage, combination number) pairs keyed by bandwidth, keyed by
+    (days, period). The frequent prices are the prices repeated enough within their partition, and
+    equal prices always share a partition, so they are the same for every n_clusters and the
+    combinations differing only in n_clusters share all their work.
+    """
+    plan = {}
+    for combination, (days, period, within_support_percentage, _, bandwidth) in enumerate(grid):
+        plan.setdefault((days, period), {}).setdefault(bandwidth, []).append((within_support_percentage, combination))
+    return plan
+
+
+def sweep_stock(
+    hlc: np.ndarray,
+    bounds: Dict[int, np.ndarray],
+    grid: Sequence[tuple],
+    horizons: Sequence[int],
+    cluster_backend: str = "sklearn",
+) -> List[tuple]:
+    """Evaluate the signals of a stock for every combination of parameters over many windows of its history.
+
+    Every stage is computed once for all the combinations which share its parameters: the
+    windowed maxima once per period over the whole history, the frequent prices once per
+    window and period, and the levels once per bandwidth on top of them. n_clusters changes
+    nothing, see _plan_grid, and the percentage only changes the comparison of the close with
+    the levels.
+
+    Args:
+        hlc (np.ndarray): Array of shape (3, bars) holding High, Low and Close prices, oldest first.
+        bounds (Dict[int, np.ndarray]): Window bounds of every number of days, as returned by get_window_bounds.
+        grid (Sequence[tuple]): Combinations of parameters, as returned by get_grid.
+        horizons (Sequence[int]): Numbers of bars after the last bar of a window at which returns are measured.
+        cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+
+    Returns:
+        List[tuple]: (combination number, window number, close, buy, sell, return at each horizon) of every
+            evaluated window.
+    """
+    high, low, close = hlc
+    num_windows = {period: max(len(close) - period + 1, 0) for period in {combination[1] for combination in grid}}
+    maxima = {
+        period: (windowed_extrema(high, period, count, kind="max"), windowed_extrema(low, period, count, kind="max"))
+        for period, count in num_windows.items()
+    }
+
+    records = []
+    for (days, period), bandwidths in _plan_grid(grid).items():
+        high_maxima, low_maxima = maxima[period]
+        for num, (first, stop) in enumerate(bounds[days]):
+            if stop - first - period - 1 <= 0:
+                continue
+            try:
+                frequent_high = get_frequent_prices(
+                    high_maxima[first : stop - period - 1], high[first:stop], backend=cluster_backend
+                )
+                frequent_low = get_frequent_prices(
+                    low_maxima[first : stop - period - 1], low[first:stop], backend=cluster_backend
+                )
+            except ValueError:
+                continue
+            close_last = close[stop - 1]
+            returns = [
+                close[stop - 1 + horizon] / close_last - 1 if stop - 1 + horizon < len(close) else np.nan
+                for horizon in horizons
+            ]
+            for bandwidth, percentages in bandwidths.items():
+                try:
+                    cluster_max_prices = cluster_frequent_prices(frequent_high, np.maximum, bandwidth, cluster_backend)
+                    cluster_min_prices = cluster_frequent_prices(frequent_low, np.minimum, bandwidth, cluster_backend)
+                except ValueError:
+                    continue
+                for within_support_percentage, combination in percentages:
+                    buy, sell = get_buy_sell_signals(
+                        close_last, cluster_min_prices, cluster_max_prices, within_support_percentage
+                    )
+                    records.append((combination, num, close_last, bool(buy), bool(sell), *returns))
+    return records
+
+
+def sweep_stocks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    evaluation_dates: Sequence,
+    grid: Sequence[tuple],
+    horizons: Sequence[int] = (5, 20),
+    workers: int = 1,
+    cluster_backend: str = "sklearn",
+) -> pd.DataFrame:
+    """Backtest the signals of many stocks on many dates for every combination of parameters.
+
+    Each stock is fetched once, for the longest number of days of the grid, and all its
+    combinations are evaluated in one task so that they share their intermediate results.
+    Stocks are spread over the worker processes.
+
+    Args:
+        stock_data (Iterable): (stock name, full history, fetch error) tuples, as yielded by iter_stock_data_bulk.
+        evaluation_dates (Sequence): Dates on which the analysis is run.
+        grid (Sequence[tuple]): Combinations of parameters, as returned by get_grid.
+        horizons (Sequence[int], optional): Numbers of bars after the evaluation at which returns are measured.
+                                            Defaults to (5, 20).
+        workers (int, optional): Number of worker processes, 1 to run serially. Defaults to 1.
+        cluster_backend (str, optional): Clustering backend, 'sklearn' or 'numpy'. Defaults to 'sklearn'.
+
+    Returns:
+        pd.DataFrame: One row per combination, evaluated stock and date with the parameters, the close,
+            buy and sell signals and the returns at each horizon.
+    """
+    evaluation_dates = list(evaluation_dates)
+    grid = [tuple(combination) for combination in grid]
+    columns = ["symbol", "date", "close", "buy", "sell"] + [f"return_{horizon}" for horizon in horizons]
+    frames = []
+    for symbol, result in _run_tasks(stock_data, evaluation_dates, grid, horizons, workers, cluster_backend):
+        if isinstance(result, Exception):
+            print(f"Could not sweep {symbol}: {result}")
+            continue
+        frame = pd.DataFrame.from_records(result, columns=["combination", "date"] + columns[2:])
+        frame.insert(0, "symbol", symbol)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=list(SWEEP_PARAMETERS) + columns)
+
+    evaluations = pd.concat(frames, ignore_index=True)
+    evaluations["date"] = np.asarray(evaluation_dates, dtype=object)[evaluations["date"].to_numpy()]
+    parameters = pd.DataFrame(grid, columns=list(SWEEP_PARAMETERS))
+    evaluations = pd.concat(
+        [parameters.iloc[evaluations.pop("combination").to_numpy()].reset_index(drop=True), evaluations], axis=1
+    )
+    return evaluations[list(SWEEP_PARAMETERS) + columns]
+
+
+def _iter_tasks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    evaluation_dates: list,
+    grid: Sequence[tuple],
+    horizons: Sequence[int],
+) -> Iterator[Tuple[str, Optional[np.ndarray], object]]:
+    """Get (stock name, prices, window bounds of every number of days or fetch error) of every stock.
+
+    Every task only gets the bars its windows and the returns after them need.
+    """
+    all_days = sorted({combination[0] for combination in grid})
+    for symbol, data_stock, error in stock_data:
+        if error is not None:
+            yield symbol, None, error
+            continue
+        bounds = {days: get_window_bounds(data_stock.index, evaluation_dates, days) for days in all_days}
+        first = min(days_bounds[:, 0].min() for days_bounds in bounds.values())
+        stop = min(
+            max(days_bounds[:, 1].max() for days_bounds in bounds.values()) + max(horizons, default=0),
+            len(data_stock),
+        )
+        hlc = data_stock[["High", "Low", "Close"]].to_numpy(dtype=float).T[:, first:stop].copy()
+        yield symbol, hlc, {days: days_bounds - first for days, days_bounds in bounds.items()}
+
+
+def _run_tasks(
+    stock_data: Iterable[Tuple[str, pd.DataFrame, Optional[Exception]]],
+    evaluation_dates: list,
+    grid: List[tuple],
+    horizons: Sequence[int],
+    workers: int,
+    cluster_backend: str,
+) -> Iterator[Tuple[str, object]]:
+    """Run the sweep of every stock, yielding (stock name, records or error) in stock order."""
+    tasks = _iter_tasks(stock_data, evaluation_dates, grid, horizons)
+    arguments = (grid, tuple(horizons), cluster_backend)
+    if workers <= 1:
+        for symbol, hlc, bounds in tasks:
+            yield symbol, bounds if hlc is None else sweep_stock(hlc, bounds, *arguments)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for symbol, hlc, bounds in tasks:
+            pending.append((symbol, bounds if hlc is None else executor.submit(sweep_stock, hlc, bounds, *arguments)))
+            while len(pending) > 2 * workers:
+                yield _pop_task(pending)
+        while pending:
+            yield _pop_task(pending)
+
+
+def _pop_task(pending: deque) -> Tuple[str, object]:
+    """Wait for the oldest pending stock and return it."""
+    symbol, result = pending.popleft()
+    if not isinstance(result, Exception):
+        try:
+            result = result.result()
+        except Exception as error:
+            result = error
+    return symbol, result
+
+
+def summarise_sweep(evaluations: pd.DataFrame, horizons: Sequence[int] = (5, 20)) -> pd.DataFrame:
+    """Get signal counts, hit rates and returns of the buy and sell signals of every combination.
+
+    Args:
+        evaluations (pd.DataFrame): Evaluations as returned by sweep_stocks.
+        horizons (Sequence[int], optional): Horizons the evaluations hold returns for. Defaults to (5, 20).
+
+    Returns:
+        pd.DataFrame: One row per combination, indexed by the parameters, with the statistics of
+            summarise_backtest prefixed by buy_ and sell_.
+    """
+    rows = {}
+    for parameters, group in evaluations.groupby(list(SWEEP_PARAMETERS), sort=True):
+        summary = summarise_backtest(group, horizons)
+        row = {"evaluations": len(group)}
+        for signal, statistics in summary.drop(columns="evaluations").to_dict(orient="index").items():
+            row.update({f"{signal.lower()}_{name}": value for name, value in statistics.items()})
+        rows[parameters] = row
+    summary = pd.DataFrame.from_dict(rows, orient="index")
+    summary.index = pd.MultiIndex.from_tuples(summary.index, names=list(SWEEP_PARAMETERS))
+    return summary